@@ -48,6 +48,9 @@ import time
 
 import numpy as num
 
+# the number of trials whose pdf factors recompute() gathers at a time
+_RECOMPUTE_CHUNK = 256
+
 def getinf(x):
     return num.nonzero( num.isinf( num.atleast_1d(x) ) )
 
@@ -183,7 +186,8 @@ class QuestObject(object):
 
         This was converted from the Psychtoolbox's QuestMean function.
         """
-        return self.tGuess + num.sum(self.pdf*self.x)/num.sum(self.pdf)
+        cdf,moments = self._pdfSummaries()
+        return self.tGuess + moments[0]/cdf[-1]
 
     def mode(self):
         """Mode of Quest posterior pdf.
@@ -194,7 +198,8 @@ class QuestObject(object):
 
         This was converted from the Psychtoolbox's QuestMode function.
         """
-        iMode = num.argsort(self.pdf)[-1]
+        self._pdfSummaries()
+        iMode = self._pdfMode
         p=self.pdf[iMode]
         t=self.x[iMode]+self.tGuess
         return t,p
@@ -243,7 +248,7 @@ class QuestObject(object):
         """
         if quantileOrder is None:
             quantileOrder = self.quantileOrder
-        p = num.cumsum(self.pdf)
+        p = self._pdfSummaries()[0]
         if len(getinf(p[-1])[0]):
             raise RuntimeError('pdf is not finite')
         if p[-1]==0:
@@ -261,8 +266,9 @@ class QuestObject(object):
         Get the sd of the threshold distribution.
 
         This was converted from the Psychtoolbox's QuestSd function."""
-        p=num.sum(self.pdf)
-        sd=math.sqrt(num.sum(self.pdf*self.x**2)/p-(num.sum(self.pdf*self.x)/p)**2)
+        cdf,moments = self._pdfSummaries()
+        p=cdf[-1]
+        sd=math.sqrt(moments[1]/p-(moments[0]/p)**2)
         return sd
 
     def simulate(self,tTest,tActual):
@@ -330,25 +336,51 @@ class QuestObject(object):
         if len(getinf(self.pdf)[0]):
             raise RuntimeError('prior pdf is not finite')
 
-        # recompute the pdf from the historical record of trials
-        for intensity, response in zip(self.intensity,self.response):
-            inten = max(-1e10,min(1e10,intensity)) # make intensity finite
-            ii = len(self.pdf) + self.i-round((inten-self.tGuess)/self.grain)-1
-            if ii[0]<0:
-                ii = ii-ii[0]
-            if ii[-1]>=self.s2.shape[1]:
-                ii = ii+self.s2.shape[1]-ii[-1]-1
-            iii = ii.astype(num.int_)
-            if not num.allclose(ii,iii):
-                raise ValueError('truncation error')
-            self.pdf = self.pdf*self.s2[response,iii]
-            if self.normalizePdf and k%100==0:
-                self.pdf = self.pdf/num.sum(self.pdf) # avoid underflow; keep the pdf normalized
+        # recompute the pdf from the historical record of trials, all at
+        # once: the log pdf is the log prior plus, for every trial, the log
+        # of the slice of s2 picked out by its response and intensity
+        if len(self.intensity):
+            inten = num.clip(num.asarray(self.intensity,dtype=float),-1e10,1e10) # make intensities finite
+            response = num.asarray(self.response,dtype=num.int_)
+            nPdf = len(self.pdf)
+            offsets = nPdf-1+self.i[0]-num.round((inten-self.tGuess)/self.grain)
+            offsets = num.clip(offsets,0,self.s2.shape[1]-nPdf).astype(num.int_)
+            cols = num.arange(nPdf)
+            with num.errstate(divide='ignore'):
+                logS2 = num.log(self.s2)
+                logPdf = num.log(self.pdf)
+            for start in range(0,len(offsets),_RECOMPUTE_CHUNK):
+                stop = start+_RECOMPUTE_CHUNK
+                ii = offsets[start:stop,None]+cols
+                logPdf += logS2[response[start:stop,None],ii].sum(axis=0)
+            if self.normalizePdf:
+                logPdf -= logPdf.max() # avoid underflow
+            self.pdf = num.exp(logPdf)
         if self.normalizePdf:
             self.pdf = self.pdf/num.sum(self.pdf) # avoid underflow; keep the pdf normalized
         if len(getinf(self.pdf)[0]):
             raise RuntimeError('prior pdf is not finite')
 
+    def _pdfChanged(self):
+        """Update the summaries of the pdf that mean(), sd(), mode() and
+        quantile() use, so they needn't sum the pdf on every call."""
+        self._pdfSummarised = self.pdf
+        self._pdfCdf = num.cumsum(self.pdf)
+        self._pdfMoments = num.array([num.dot(self.pdf,self.x),num.dot(self.pdf,self.x**2)])
+        iMode = int(num.argmax(self.pdf))
+        if num.count_nonzero(self.pdf == self.pdf[iMode]) > 1:
+            # tied maxima (e.g. a flat prior): pick the one argsort does, as
+            # mode() always has
+            iMode = int(num.argsort(self.pdf)[-1])
+        self._pdfMode = iMode
+
+    def _pdfSummaries(self):
+        # summarise the pdf again once it has been replaced (by update(),
+        # recompute() or assigning q.pdf), or if loaded from an old file
+        if getattr(self,'_pdfSummarised',None) is not self.pdf:
+            self._pdfChanged()
+        return self._pdfCdf,self._pdfMoments
+
     def update(self,intensity,response):
         """Update Quest posterior pdf.
 
@@ -7,9 +7,12 @@ from pkg_resources import parse_version
 
 from .base import DataHandler
 from .experiment import ExperimentHandler
+from .columnar import ColumnStore
 from .trial import TrialHandler, TrialHandler2, TrialHandlerExt, TrialType
 from .staircase import (StairHandler, QuestHandler, PsiHandler,
                         MultiStairHandler)
+from .simulation import (simulateStairs, simulateQuest, simulatePsi,
+                         WeibullObserver, CumNormalObserver)
 
 from .utils import (checkValidFilePath, isValidVariableName, importTrialTypes,
                     sliceFromString, indicesFromString, importConditions,
@@ -524,8 +524,10 @@ class DataHandler(_ComparisonMixin, dict):
             self.addDataType(thisType)
         if position is None:
             # 'ran' is always the first thing to update
-            repN = sum(self['ran'][self.trials.thisIndex])
-            if thisType != 'ran':
+            repN = self._getRanCount(self.trials.thisIndex)
+            if thisType == 'ran':
+                self._ranCounts[self.trials.thisIndex] += 1
+            else:
                 # because it has already been updated
                 repN -= 1
             # make a list where 1st digit is trial number
@@ -548,6 +550,18 @@ class DataHandler(_ComparisonMixin, dict):
         # insert the value
         self[thisType][position[0], int(position[1])] = value
 
+    def _getRanCount(self, thisIndex):
+        """Returns how many times 'ran' has been added (without a position)
+        for condition `thisIndex`. Counted as we go, rather than summing the
+        'ran' array on every call, so that it costs the same on every trial.
+        """
+        if '_ranCounts' not in self.__dict__:
+            # initialise from any data we have (e.g. from an older file)
+            ran = np.ma.filled(self['ran'], 0)
+            self._ranCounts = ran.reshape(len(ran), -1).sum(axis=1)
+            self._ranCounts = self._ranCounts.astype(int)
+        return int(self._ranCounts[thisIndex])
+
     def _convertToObjectArray(self, thisType):
         """Convert this datatype from masked numeric array to unmasked
         object array
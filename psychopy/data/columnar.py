@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Append-only, column-oriented storage for trial data.
+
+Each data name gets its own NumPy buffer which grows geometrically, so
+adding a row is amortised O(1) and saving a file formats whole columns at
+once rather than walking every cell of every entry.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from builtins import str
+from builtins import object
+from builtins import range
+import numpy as np
+import pandas as pd
+
+# the smallest buffer allocated for a new column
+_MIN_CAPACITY = 16
+
+
+def _kindOf(value):
+    """Return the typed buffer dtype suited to `value` (or `object`).
+
+    Only types whose `str()` is preserved exactly by the buffer are given a
+    typed column, so files written from a column match those written from
+    the original values. None starts a float column (as NaN), as pandas
+    treats it as a missing number.
+    """
+    if value is None:
+        return np.float64
+    valueType = type(value)
+    if valueType in (bool, np.bool_):
+        return np.bool_
+    if valueType in (float, np.float64):
+        return np.float64
+    if valueType in (int, np.int64):
+        if -2**63 <= value < 2**63:
+            return np.int64
+    return object
+
+
+def formatCell(value):
+    """Return the text for one cell of a wide-format data file; quoted if
+    it contains a comma or newline.
+    """
+    cell = str(value)
+    if ',' in cell or '\n' in cell:
+        return u'"%s"' % cell
+    return cell
+
+
+class Column(object):
+    """A single growable, typed column of values with a missing-value mask.
+
+    A column of ints that receives a float (or None) is promoted to float64
+    rather than object, as pandas would make it. The rows whose original
+    values a float can't stand for exactly (ints, and None stored as NaN)
+    are kept in `exact`, so rows and files still show the original values.
+    """
+
+    def __init__(self, dtype, capacity=_MIN_CAPACITY):
+        self.dtype = dtype
+        self.values = np.empty(capacity, dtype=dtype)
+        self.present = np.zeros(capacity, dtype=bool)
+        self.exact = {}  # row: original value (float64 columns only)
+
+    @property
+    def capacity(self):
+        return len(self.values)
+
+    def _grow(self, minCapacity):
+        newCapacity = max(self.capacity * 2, minCapacity, _MIN_CAPACITY)
+        values = np.empty(newCapacity, dtype=self.dtype)
+        values[:self.capacity] = self.values
+        present = np.zeros(newCapacity, dtype=bool)
+        present[:self.capacity] = self.present
+        self.values, self.present = values, present
+
+    def _toObject(self):
+        """Fall back to an object buffer (e.g. when a column receives a
+        value of a different type than it was created with)
+        """
+        values = np.empty(self.capacity, dtype=object)
+        # tolist() hands back native Python scalars
+        values[self.present] = self.values[self.present].tolist()
+        for row, value in self.exact.items():
+            values[row] = value
+        self.values = values
+        self.dtype = object
+        self.exact = {}
+
+    def _toFloat(self):
+        """Promote an int column to float64, keeping the original ints
+        """
+        rows = np.flatnonzero(self.present)
+        self.exact = dict(zip(rows.tolist(), self.values[rows].tolist()))
+        self.values = self.values.astype(np.float64)
+        self.dtype = np.float64
+
+    def set(self, row, value):
+        if row >= self.capacity:
+            self._grow(row + 1)
+        kind = _kindOf(value)
+        if self.dtype is not object and kind is not self.dtype:
+            if self.dtype is np.int64 and kind is np.float64:
+                self._toFloat()
+            elif not (self.dtype is np.float64 and kind is np.int64):
+                self._toObject()
+        if self.dtype is np.float64:
+            if value is None:
+                self.exact[row] = value
+                value = np.nan
+            elif type(value) in (float, np.float64):
+                self.exact.pop(row, None)
+            else:
+                self.exact[row] = value
+        self.values[row] = value
+        self.present[row] = True
+
+    def unset(self, row):
+        """Make the value at `row` missing"""
+        if row < self.capacity:
+            self.present[row] = False
+            self.exact.pop(row, None)
+
+
+class ColumnStore(object):
+    """An append-only table of entries, stored as one :class:`Column` per
+    data name.
+
+    Behaves like a list of dicts for reading (`len()`, indexing,
+    iteration and `append()`) so it can stand in for
+    `ExperimentHandler.entries`, but the data live in NumPy buffers.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.names = []  # in order of first appearance
+        self.nRows = 0
+
+    def __len__(self):
+        return self.nRows
+
+    def __iter__(self):
+        for row in range(self.nRows):
+            yield self.getRow(row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.getRow(row) for row in range(self.nRows)[index]]
+        if index < 0:
+            index += self.nRows
+        if not 0 <= index < self.nRows:
+            raise IndexError('ColumnStore index out of range')
+        return self.getRow(index)
+
+    def __eq__(self, other):
+        if not isinstance(other, ColumnStore):
+            return list(self) == other
+        return (self.nRows == other.nRows and
+                set(self.names) == set(other.names) and
+                list(self) == list(other))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def append(self, entry):
+        """Add an entry (a dict of name: value) as the next row.
+        """
+        self.setRow(self.nRows, entry)
+
+    def setRow(self, row, entry):
+        """Set the values of `row` (an existing row or the next one) from
+        the dict `entry`. Names missing from `entry` become missing values.
+        """
+        if row > self.nRows:
+            raise IndexError('ColumnStore rows must be added in order')
+        if row < self.nRows:
+            for name in self.names:
+                if name not in entry:
+                    self.columns[name].unset(row)
+        for name, value in entry.items():
+            if name not in self.columns:
+                self.columns[name] = Column(_kindOf(value),
+                                            max(_MIN_CAPACITY, row + 1))
+                self.names.append(name)
+            self.columns[name].set(row, value)
+        self.nRows = max(self.nRows, row + 1)
+
+    def getRow(self, row):
+        """Rebuild the entry at `row` as a dict (of native Python values
+        where the column is typed).
+        """
+        entry = {}
+        for name in self.names:
+            col = self.columns[name]
+            if row < col.capacity and col.present[row]:
+                if row in col.exact:
+                    value = col.exact[row]
+                elif col.dtype is object:
+                    value = col.values[row]
+                else:
+                    value = col.values[row].item()
+                entry[name] = value
+        return entry
+
+    def getColumn(self, name):
+        """Return a (values, present) pair of arrays for the data `name`,
+        each with one element per row. Values are views on the buffer
+        where possible, so treat them as read-only.
+        """
+        n = self.nRows
+        col = self.columns[name]
+        if col.capacity < n:
+            col._grow(n)
+        return col.values[:n], col.present[:n]
+
+    def formatColumn(self, name, delim=','):
+        """Return a list with the `str()` of every value in the column
+        (quoted where it contains a comma or newline), and '' for rows
+        where the value is missing.
+        """
+        n = self.nRows
+        if name not in self.columns:
+            return [''] * n
+        values, present = self.getColumn(name)
+        if values.dtype == object:
+            cells = np.array([str(v) for v in values[present]], dtype=object)
+            if len(cells):
+                needQuote = np.fromiter(
+                    ((',' in c or '\n' in c) for c in cells),
+                    dtype=bool, count=len(cells))
+                cells[needQuote] = ['"%s"' % c for c in cells[needQuote]]
+        else:
+            # numeric and bool str()s never contain a comma or newline
+            cells = values[present].astype(str).astype(object)
+        out = np.full(n, '', dtype=object)
+        out[present] = cells
+        for row, value in self.columns[name].exact.items():
+            if row < n:
+                out[row] = formatCell(value)
+        return out.tolist()
+
+    def writeDelimited(self, f, names, delim=',', matrixOnly=False,
+                       extraEntries=()):
+        """Write the store to an open file `f` in wide (one row per entry)
+        format, exactly as `ExperimentHandler.saveAsWideText` lays it out.
+
+        `extraEntries` are dicts appended after the stored rows (e.g. an
+        entry that has not yet been committed with nextEntry()).
+        """
+        if not matrixOnly:
+            f.write(u''.join(u'%s%s' % (name, delim) for name in names))
+            f.write('\n')
+        if not names:
+            f.write('\n' * (self.nRows + len(extraEntries)))
+            return
+        cols = [self.formatColumn(name, delim) for name in names]
+        for entry in extraEntries:
+            for name, cells in zip(names, cols):
+                if name in entry:
+                    cells.append(formatCell(entry[name]))
+                else:
+                    cells.append('')
+        lines = [delim.join(row) for row in zip(*cols)]
+        if lines:
+            f.write((delim + '\n').join(lines) + delim + '\n')
+
+    def to_dataframe(self, names=None):
+        """Return the data as a :class:`pandas.DataFrame`.
+
+        Columns without missing values that hold numeric or bool data are
+        passed to pandas as views on the underlying buffers (no copy), so
+        the frame should be treated as read-only. As for a frame built from
+        a list of dicts, missing values are NaN (so integer columns with
+        missing values become float columns).
+        """
+        if names is None:
+            names = self.names
+        data = {}
+        for name in names:
+            if name not in self.columns:
+                data[name] = np.full(self.nRows, np.nan)
+                continue
+            values, present = self.getColumn(name)
+            exact = self.columns[name].exact
+            if (len(exact) == self.nRows and present.all() and
+                    all(value is None for value in exact.values())):
+                # pandas only makes a column of None numeric if some are
+                # missing altogether
+                data[name] = np.full(self.nRows, None, dtype=object)
+            elif present.all():
+                data[name] = values
+            elif values.dtype in (np.float64, np.int64):
+                filled = values.astype(np.float64)
+                filled[~present] = np.nan
+                data[name] = filled
+            else:
+                filled = values.astype(object)
+                filled[~present] = np.nan
+                data[name] = filled
+        return pd.DataFrame(data, columns=list(names), copy=False)
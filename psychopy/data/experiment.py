@@ -10,12 +10,17 @@ import sys
 import copy
 import pickle
 import atexit
+from collections import OrderedDict
+
+import pandas as pd
 
 from psychopy import logging
 from psychopy.tools.filetools import (openOutputFile, genDelimiter,
                                       genFilenameFromDelimiter)
 from .utils import checkValidFilePath
 from .base import _ComparisonMixin
+from .columnar import ColumnStore
+from .streaming import WideTextStreamWriter
 
 
 class ExperimentHandler(_ComparisonMixin):
@@ -39,7 +44,9 @@ class ExperimentHandler(_ComparisonMixin):
                  savePickle=True,
                  saveWideText=True,
                  dataFileName='',
-                 autoLog=True):
+                 autoLog=True,
+                 columnar=False,
+                 streamWideText=False):
         """
         :parameters:
 
@@ -74,6 +81,21 @@ class ExperimentHandler(_ComparisonMixin):
             saveWideText : True (default) or False
 
             autoLog : True (default) or False
+
+            columnar : True or False (default)
+                Store entries in typed NumPy column buffers
+                (a :class:`~psychopy.data.columnar.ColumnStore`) rather than
+                a list of dicts. This uses far less memory and time for
+                long sessions and allows :meth:`to_dataframe`. `entries`
+                can still be indexed and iterated as dicts.
+
+            streamWideText : True or False (default)
+                Append each entry to `dataFileName + '.csv'` as soon as
+                :meth:`nextEntry` is called (the writing happens on a
+                background thread) so the data survive a crash. Columns in
+                that file are in order of first appearance until
+                :meth:`close` rewrites it in the usual layout (if
+                `saveWideText` is True).
         """
         self.loops = []
         self.loopsUnfinished = []
@@ -89,7 +111,10 @@ class ExperimentHandler(_ComparisonMixin):
         self.saveWideText = saveWideText
         self.dataFileName = dataFileName
         self.thisEntry = {}
-        self.entries = []  # chronological list of entries
+        if columnar:
+            self.entries = ColumnStore()
+        else:
+            self.entries = []  # chronological list of entries
         self._paramNamesSoFar = []
         self.dataNames = []  # names of all the data (eg. resp.keys)
         self.autoLog = autoLog
@@ -100,6 +125,14 @@ class ExperimentHandler(_ComparisonMixin):
         else:
             # fail now if we fail at all!
             checkValidFilePath(dataFileName, makeValid=True)
+        self._streamWriter = None
+        if streamWideText:
+            if dataFileName in ['', None]:
+                logging.warning('ExperimentHandler streamWideText needs a '
+                                'dataFileName. Data will not be streamed')
+            else:
+                self._streamWriter = WideTextStreamWriter(
+                    dataFileName + '.csv', delim=',')
         atexit.register(self.close)
 
     def __del__(self):
@@ -231,8 +264,20 @@ class ExperimentHandler(_ComparisonMixin):
         if type(self.extraInfo) == dict:
             this.update(self.extraInfo)
         self.entries.append(this)
+        if self._streamWriter is not None:
+            self._streamWriter.append(this, self._getColumnNames())
         self.thisEntry = {}
 
+    def _getColumnNames(self):
+        """Names of the columns for a wide-format file, in order: loop
+        parameters, data names, then extraInfo names.
+        """
+        names = self._getAllParamNames()
+        names.extend(self.dataNames)
+        # names from the extraInfo dictionary
+        names.extend(self._getExtraInfo()[0])
+        return names
+
     def getAllEntries(self):
         """Fetches a copy of all the entries including a final (orphan) entry
         if that exists. This allows entries to be saved even if nextEntry() is
@@ -241,7 +286,7 @@ class ExperimentHandler(_ComparisonMixin):
         :return: copy (not pointer) to entries
         """
         # check for orphan final data (not committed as a complete entry)
-        entries = copy.copy(self.entries)
+        entries = list(self.entries)
         if self.thisEntry:  # thisEntry is not empty
             entries.append(self.thisEntry)
         return entries
@@ -306,13 +351,21 @@ class ExperimentHandler(_ComparisonMixin):
                            fileCollisionMethod=fileCollisionMethod,
                            encoding=encoding)
 
-        names = self._getAllParamNames()
-        names.extend(self.dataNames)
-        # names from the extraInfo dictionary
-        names.extend(self._getExtraInfo()[0])
+        names = self._getColumnNames()
         # sort names if requested
         if sortColumns:
             names.sort()
+        if isinstance(self.entries, ColumnStore):
+            # format whole columns at once
+            extra = [self.thisEntry] if self.thisEntry else []
+            self.entries.writeDelimited(f, names, delim=delim,
+                                        matrixOnly=matrixOnly,
+                                        extraEntries=extra)
+            if f != sys.stdout:
+                f.close()
+            logging.info('saved data to %r' % f.name)
+            return
+
         # write a header line
         if not matrixOnly:
             for heading in names:
@@ -336,6 +389,20 @@ class ExperimentHandler(_ComparisonMixin):
             f.close()
         logging.info('saved data to %r' % f.name)
 
+    def to_dataframe(self):
+        """Returns the entries (including an orphan final entry, if any) as
+        a :class:`pandas.DataFrame` with columns in the same order as
+        :meth:`saveAsWideText`.
+
+        For a columnar handler, complete numeric columns are views on the
+        stored buffers (no copy), so treat the frame as read-only.
+        """
+        # drop duplicates while keeping order
+        names = list(OrderedDict.fromkeys(self._getColumnNames()))
+        if isinstance(self.entries, ColumnStore) and not self.thisEntry:
+            return self.entries.to_dataframe(names)
+        return pd.DataFrame(self.getAllEntries(), columns=names)
+
     def saveAsPickle(self, fileName, fileCollisionMethod='rename'):
         """Basically just saves a copy of self (with data) to a pickle file.
 
@@ -359,9 +426,11 @@ class ExperimentHandler(_ComparisonMixin):
         # https://groups.google.com/d/msg/psychopy-dev/Z4m_UX88q8U/UGuh1eeyjMEJ
         savePickle = self.savePickle
         saveWideText = self.saveWideText
+        streamWriter = self._streamWriter  # holds a thread and open file
 
         self.savePickle = False
         self.saveWideText = False
+        self._streamWriter = None
 
         origEntries = self.entries
         self.entries = self.getAllEntries()
@@ -380,15 +449,27 @@ class ExperimentHandler(_ComparisonMixin):
         self.entries = origEntries  # revert list of completed entries post-save
         self.savePickle = savePickle
         self.saveWideText = saveWideText
+        self._streamWriter = streamWriter
         
     def close(self):
+        streamWriter = getattr(self, '_streamWriter', None)
+        if streamWriter is not None:
+            # write any orphan final entry too
+            if self.thisEntry:
+                streamWriter.append(self.thisEntry, self._getColumnNames())
+            streamWriter.close()
+            self._streamWriter = None
         if self.dataFileName not in ['', None]:
             if self.autoLog:
                 msg = 'Saving data for %s ExperimentHandler' % self.name
                 logging.debug(msg)
             if self.savePickle:
                 self.saveAsPickle(self.dataFileName)
-            if self.saveWideText:
+            if self.saveWideText and streamWriter is not None:
+                # replace the streamed file with the standard layout
+                self.saveAsWideText(streamWriter.fileName,
+                                    fileCollisionMethod='overwrite')
+            elif self.saveWideText:
                 self.saveAsWideText(self.dataFileName + '.csv')
         self.abort()
         self.autoLog = False
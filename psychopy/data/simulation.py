@@ -0,0 +1,614 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Batch simulation of staircases, for piloting their parameters.
+
+Rather than stepping one handler per simulated observer, each function
+here runs N independent staircases in lock-step: the QUEST pdfs are the
+rows of one matrix, the Psi posteriors the rows of another and the
+up-down staircases are a set of state vectors, so every trial is a few
+NumPy operations for all N at once.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from builtins import object
+from builtins import range
+import multiprocessing
+
+import numpy as np
+from scipy import stats
+
+from psychopy.contrib.quest import QuestObject
+from psychopy.contrib.psi import FastPsiObject
+
+# up-down staircase directions
+_START, _UP, _DOWN = 0, 1, -1
+
+
+class WeibullObserver(object):
+    """Simulated observers with the Weibull psychometric function that
+    QUEST assumes, i.e. the probability of response 1 at intensity `x`
+    (in log units) is::
+
+        delta*gamma + (1-delta)*(1-(1-gamma)*exp(-10**(beta*(x-t+xOffset))))
+
+    with `xOffset` chosen so that the probability is `pThreshold` at the
+    observer's threshold `t`.
+
+    `thresholds` may be a single value or an array with one value per
+    staircase. Instances can be passed to the simulate functions as their
+    `observer` (and are picklable, so can be sent to worker processes).
+    """
+
+    def __init__(self, thresholds, beta=3.5, delta=0.01, gamma=0.5,
+                 pThreshold=0.82):
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.beta = beta
+        self.delta = delta
+        self.gamma = gamma
+        self.pThreshold = pThreshold
+        guess = delta * gamma
+        missed = 1 - (pThreshold - guess) / (1 - delta)
+        self.xOffset = np.log10(-np.log(missed / (1 - gamma))) / beta
+
+    def __call__(self, intensities, index):
+        """Return the probability of response 1 to `intensities` for the
+        staircases numbered `index`
+        """
+        t = self.thresholds
+        if t.ndim:
+            t = t[index]
+        x = intensities - t + self.xOffset
+        return (self.delta * self.gamma + (1 - self.delta) *
+                (1 - (1 - self.gamma) * np.exp(-10 ** (self.beta * x))))
+
+
+class CumNormalObserver(object):
+    """Simulated observers with the cumulative normal psychometric
+    function of the Psi method, with location `alpha` and slope `beta`
+    (single values or one per staircase).
+
+    For a Yes/No task (`expectedMin=0`) the probability of response 1 is
+    `delta/2 + (1-delta)*cdf(x)`, for 2-AFC (`expectedMin=0.5`) it is
+    `delta/2 + (1-delta)*(0.5 + 0.5*cdf(x))`.
+    """
+
+    def __init__(self, alpha, beta, delta=0, expectedMin=0.5):
+        self.alpha = np.asarray(alpha, dtype=float)
+        self.beta = np.asarray(beta, dtype=float)
+        self.delta = delta
+        self.expectedMin = expectedMin
+
+    def __call__(self, intensities, index):
+        """Return the probability of response 1 to `intensities` for the
+        staircases numbered `index`
+        """
+        alpha, beta = self.alpha, self.beta
+        if alpha.ndim:
+            alpha = alpha[index]
+        if beta.ndim:
+            beta = beta[index]
+        p = stats.norm.cdf(intensities, alpha, beta)
+        if self.expectedMin == 0.5:
+            p = 0.5 + 0.5 * p
+        return p * (1 - self.delta) + self.delta / 2
+
+
+class SimulationResult(object):
+    """The trial histories and final estimates of a batch of simulated
+    staircases. Every attribute has one row (or element) per staircase:
+
+        intensities : (nStaircases, maxTrials) array of the intensity of
+            each trial, NaN after a staircase has finished
+
+        responses : (nStaircases, maxTrials) array of the responses
+            (0 or 1), -1 after a staircase has finished
+
+        nTrials : the number of trials each staircase ran
+
+        finished : whether each staircase met its stopping rule (rather
+            than running out of trials)
+
+        thresholds : the threshold estimate of each staircase
+
+        estimates : a dict of further estimates (see the simulate
+            functions for what each provides)
+    """
+
+    def __init__(self, intensities, responses, nTrials, finished,
+                 thresholds, estimates=None):
+        self.intensities = intensities
+        self.responses = responses
+        self.nTrials = nTrials
+        self.finished = finished
+        self.thresholds = thresholds
+        self.estimates = estimates or {}
+
+    def __len__(self):
+        return len(self.thresholds)
+
+    @classmethod
+    def concatenate(cls, results):
+        """Join the results of several batches into one
+        """
+        results = list(results)
+        if len(results) == 1:
+            return results[0]
+        width = max(r.intensities.shape[1] for r in results)
+        estimates = {}
+        for name in results[0].estimates:
+            values = [r.estimates[name] for r in results]
+            if values[0].ndim == 2:
+                values = _padColumns(values, np.nan)
+            estimates[name] = np.concatenate(values)
+        return cls(
+            np.concatenate(_padColumns([r.intensities for r in results],
+                                       np.nan, width)),
+            np.concatenate(_padColumns([r.responses for r in results],
+                                       -1, width)),
+            np.concatenate([r.nTrials for r in results]),
+            np.concatenate([r.finished for r in results]),
+            np.concatenate([r.thresholds for r in results]),
+            estimates)
+
+
+def _padColumns(arrays, fill, width=None):
+    """Pad 2D arrays with `fill` to the same number of columns
+    """
+    if width is None:
+        width = max(a.shape[1] for a in arrays)
+    padded = []
+    for a in arrays:
+        if a.shape[1] < width:
+            extra = np.full((a.shape[0], width - a.shape[1]), fill,
+                            dtype=a.dtype)
+            a = np.hstack([a, extra])
+        padded.append(a)
+    return padded
+
+
+def _trimHistory(intensities, responses, nTrials):
+    """Drop the columns after the longest staircase finished
+    """
+    width = int(nTrials.max()) if len(nTrials) else 0
+    return intensities[:, :width], responses[:, :width]
+
+
+def _runJob(job):
+    batchFunc, start, stop, seed, kwargs = job
+    rng = np.random.RandomState(seed)
+    return batchFunc(np.arange(start, stop), rng, **kwargs)
+
+
+def _simulate(batchFunc, nStaircases, nProcesses, seed, kwargs):
+    """Split the staircases into one batch per process (each with its own
+    random seed drawn from `seed`) and join the results.
+    """
+    nBatches = max(1, min(nProcesses, nStaircases))
+    seeds = np.random.RandomState(seed).randint(2**31 - 1, size=nBatches)
+    bounds = np.linspace(0, nStaircases, nBatches + 1).astype(int)
+    jobs = [(batchFunc, bounds[n], bounds[n + 1], seeds[n], kwargs)
+            for n in range(nBatches)]
+    if nBatches == 1:
+        return _runJob(jobs[0])
+    pool = multiprocessing.Pool(nBatches)
+    try:
+        results = pool.map(_runJob, jobs)
+    finally:
+        pool.close()
+        pool.join()
+    return SimulationResult.concatenate(results)
+
+
+def simulateStairs(nStaircases, observer, startVal, nReversals=None,
+                   stepSizes=4, nTrials=0, nUp=1, nDown=3,
+                   applyInitialRule=True, stepType='db', minVal=None,
+                   maxVal=None, maxTrials=1000, nAverage=6,
+                   nProcesses=1, seed=None):
+    """Simulate `nStaircases` up-down staircases, each following the rules
+    of :class:`~psychopy.data.StairHandler` with the same arguments.
+
+    :Parameters:
+
+        observer : a callable `observer(intensities, index)` returning
+            the probability of response 1 (correct) to each of
+            `intensities`, which were presented to the staircases numbered
+            `index` (so observers can differ between staircases), e.g.
+            :class:`WeibullObserver`. It must be picklable (a module-level
+            function or class instance) if `nProcesses` > 1.
+
+        maxTrials : staircases that haven't finished after this many
+            trials are stopped (and marked as not `finished`)
+
+        nAverage : the threshold of each staircase is taken as the mean
+            intensity at its last `nAverage` reversals
+
+        nProcesses : the number of processes to split the staircases
+            across
+
+        seed : seed for the simulated responses. The same seed and
+            `nProcesses` give the same results.
+
+    Returns a :class:`SimulationResult`, whose `estimates` has
+    'reversalIntensities' (an array padded with NaN) and 'nReversals'.
+    """
+    try:
+        stepSizes = list(stepSizes)
+    except TypeError:
+        stepSizes = [stepSizes]
+    if nReversals is None or nReversals < len(stepSizes):
+        nReversals = len(stepSizes)
+    kwargs = dict(observer=observer, startVal=startVal,
+                  nReversals=nReversals, stepSizes=stepSizes,
+                  nTrials=nTrials or 0, nUp=nUp, nDown=nDown,
+                  applyInitialRule=applyInitialRule, stepType=stepType,
+                  minVal=minVal, maxVal=maxVal, maxTrials=maxTrials,
+                  nAverage=nAverage)
+    return _simulate(_stairsBatch, nStaircases, nProcesses, seed, kwargs)
+
+
+def _stairsBatch(index, rng, observer, startVal, nReversals, stepSizes,
+                 nTrials, nUp, nDown, applyInitialRule, stepType, minVal,
+                 maxVal, maxTrials, nAverage):
+    n = len(index)
+    stepSizes = np.asarray(stepSizes, dtype=float)
+    intensity = np.full(n, startVal, dtype=float)
+    stepSize = np.full(n, stepSizes[0])
+    counter = np.zeros(n, dtype=int)  # correct (+) / incorrect (-) run
+    lastResponse = np.full(n, -1, dtype=int)
+    direction = np.full(n, _START, dtype=int)
+    nRev = np.zeros(n, dtype=int)
+    initialRule = np.zeros(n, dtype=bool)
+    active = np.ones(n, dtype=bool)
+    finished = np.zeros(n, dtype=bool)
+    nDone = np.zeros(n, dtype=int)
+    intensities = np.full((n, maxTrials), np.nan)
+    responses = np.full((n, maxTrials), -1, dtype=np.int8)
+    reversals = np.full((n, maxTrials), np.nan)
+
+    for trialN in range(maxTrials):
+        rows = np.flatnonzero(active)
+        if not len(rows):
+            break
+        x = intensity[rows]
+        intensities[rows, trialN] = x
+        correct = rng.random_sample(len(rows)) < observer(x, index[rows])
+        responses[rows, trialN] = correct
+        nDone[rows] = trialN + 1
+
+        # count the run of correct/incorrect responses
+        onRun = lastResponse[rows] == correct
+        count = counter[rows]
+        count = np.where(correct, np.where(onRun, count + 1, 1),
+                         np.where(onRun, count - 1, -1))
+        lastResponse[rows] = correct
+
+        # the direction, as StairHandler.calculateNextIntensity
+        rev = nRev[rows]
+        initial = applyInitialRule & (rev == 0)
+        goDown = np.where(initial, correct, count >= nDown)
+        goUp = np.where(initial, ~correct, count <= -nUp)
+        dirn = direction[rows]
+        reversal = (goDown & (dirn == _UP)) | (goUp & (dirn == _DOWN))
+        direction[rows] = np.where(goDown, _DOWN, np.where(goUp, _UP, dirn))
+        reversals[rows[reversal], rev[reversal]] = x[reversal]
+        ruleFlag = initialRule[rows] | (reversal & initial)
+        rev += reversal
+        nRev[rows] = rev
+
+        done = (rev >= nReversals) & (trialN + 1 >= nTrials)
+        finished[rows[done]] = True
+        active[rows[done]] = False
+
+        step = stepSize[rows]
+        if len(stepSizes) > 1:
+            newStep = stepSizes[np.minimum(rev, len(stepSizes) - 1)]
+            step = np.where(reversal, newStep, step)
+            stepSize[rows] = step
+
+        # the step, with the initial 1-up 1-down rule applied first
+        initialStep = applyInitialRule & ((rev == 0) | ruleFlag)
+        initialRule[rows] = ruleFlag & ~initialStep
+        dec = np.where(initialStep, correct, count >= nDown)
+        inc = np.where(initialStep, ~correct, count <= -nUp)
+        if stepType == 'db':
+            factor = 10.0 ** (step / 20.0)
+            x = np.where(inc, x * factor, np.where(dec, x / factor, x))
+        elif stepType == 'log':
+            factor = 10.0 ** step
+            x = np.where(inc, x * factor, np.where(dec, x / factor, x))
+        elif stepType == 'lin':
+            x = np.where(inc, x + step, np.where(dec, x - step, x))
+        if maxVal is not None:
+            x = np.where(inc & (x > maxVal), maxVal, x)
+        if minVal is not None:
+            x = np.where(dec & (x < minVal), minVal, x)
+        intensity[rows] = x
+        counter[rows] = np.where(inc | dec, 0, count)
+
+    intensities, responses = _trimHistory(intensities, responses, nDone)
+    reversals = reversals[:, :max(int(nRev.max()) if n else 0, 1)]
+    # mean of the last nAverage reversals
+    cols = np.arange(reversals.shape[1])
+    recent = (cols >= nRev[:, None] - nAverage) & (cols < nRev[:, None])
+    with np.errstate(invalid='ignore'):
+        thresholds = (np.where(recent, reversals, 0).sum(axis=1) /
+                      recent.sum(axis=1))
+    return SimulationResult(intensities, responses, nDone, finished,
+                            thresholds, {'reversalIntensities': reversals,
+                                         'nReversals': nRev})
+
+
+def simulateQuest(nStaircases, tActual, startVal, startValSd,
+                  pThreshold=0.82, nTrials=None, stopInterval=None,
+                  method='quantile', beta=3.5, delta=0.01, gamma=0.5,
+                  grain=0.01, range=None, minVal=None, maxVal=None,
+                  observer=None, maxTrials=1000, nProcesses=1, seed=None):
+    """Simulate `nStaircases` QUEST staircases, each choosing intensities
+    as :class:`~psychopy.data.QuestHandler` does with the same arguments.
+    The pdfs of all the staircases are kept as the rows of one matrix.
+
+    :Parameters:
+
+        tActual : the threshold of the simulated observers (one value, or
+            one per staircase). Responses follow QUEST's own psychometric
+            function (see :class:`WeibullObserver`) unless an `observer`
+            is given.
+
+        observer : optional callable `observer(intensities, index)`, as
+            for :func:`simulateStairs`
+
+        maxTrials : the most trials run when `nTrials` is None (i.e. when
+            `stopInterval` decides when to stop)
+
+        nProcesses, seed : as for :func:`simulateStairs`
+
+    Returns a :class:`SimulationResult`. The `thresholds` are the means of
+    the final pdfs; `estimates` also has the 'sd', 'mode' and 'quantile'
+    (at the QUEST quantile order) of each.
+    """
+    if nTrials is None and stopInterval is None:
+        raise ValueError('simulateQuest needs nTrials and/or stopInterval')
+    if observer is None:
+        observer = WeibullObserver(tActual, beta=beta, delta=delta,
+                                   gamma=gamma, pThreshold=pThreshold)
+    if nTrials is not None:
+        maxTrials = nTrials
+    kwargs = dict(observer=observer, startVal=startVal,
+                  startValSd=startValSd, pThreshold=pThreshold,
+                  nTrials=nTrials, stopInterval=stopInterval, method=method, beta=beta,
+                  delta=delta, gamma=gamma, grain=grain, tableRange=range,
+                  minVal=minVal, maxVal=maxVal, maxTrials=maxTrials)
+    return _simulate(_questBatch, nStaircases, nProcesses, seed, kwargs)
+
+
+def _questQuantile(pdf, x, quantileOrder):
+    """QuestObject.quantile() for each row of `pdf` (without tGuess)
+    """
+    nRows, nCols = pdf.shape
+    rows = np.arange(nRows)
+    cdf = np.cumsum(pdf, axis=1)
+    target = quantileOrder * cdf[:, -1]
+    # the first point reaching the target...
+    right = (cdf < target[:, None]).sum(axis=1)
+    right = np.minimum(right, nCols - 1)
+    # ...and the last point before it where the pdf is nonzero (points
+    # with zero pdf are dropped from the interpolation, as in QUEST)
+    left = np.maximum(right - 1, 0)
+    zero = (pdf[rows, left] == 0) & (left > 0)
+    if zero.any():
+        cols = np.arange(nCols)
+        lastNonzero = np.maximum.accumulate(
+            np.where(pdf[zero] != 0, cols, 0), axis=1)
+        left[zero] = lastNonzero[np.arange(zero.sum()), left[zero]]
+    cLeft = cdf[rows, left]
+    cRight = cdf[rows, right]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = np.clip((target - cLeft) / (cRight - cLeft), 0, 1)
+    frac = np.where(right == left, 1, frac)
+    return x[left] + frac * (x[right] - x[left])
+
+
+def _questEstimates(pdf, x):
+    total = pdf.sum(axis=1)
+    mean = pdf.dot(x) / total
+    sd = np.sqrt(pdf.dot(x**2) / total - mean**2)
+    mode = x[np.argmax(pdf, axis=1)]
+    return mean, sd, mode
+
+
+def _questBatch(index, rng, observer, startVal, startValSd, pThreshold,
+                nTrials, stopInterval, method, beta, delta, gamma, grain,
+                tableRange, minVal, maxVal, maxTrials):
+    n = len(index)
+    quest = QuestObject(startVal, startValSd, pThreshold, beta, delta,
+                        gamma, grain=grain, range=tableRange)
+    x = quest.x
+    tGuess = quest.tGuess
+    s2 = quest.s2
+    nPdf = len(quest.pdf)
+    maxOffset = s2.shape[1] - nPdf
+    cols = np.arange(nPdf)
+    pdf = np.tile(quest.pdf, (n, 1))
+
+    intensity = np.full(n, startVal, dtype=float)
+    active = np.ones(n, dtype=bool)
+    finished = np.zeros(n, dtype=bool)
+    nDone = np.zeros(n, dtype=int)
+    intensities = np.full((n, maxTrials), np.nan)
+    responses = np.full((n, maxTrials), -1, dtype=np.int8)
+
+    for trialN in range(maxTrials):
+        rows = np.flatnonzero(active)
+        if not len(rows):
+            break
+        inten = intensity[rows]
+        intensities[rows, trialN] = inten
+        response = (observer(inten, index[rows]) >
+                    rng.random_sample(len(rows))).astype(int)
+        responses[rows, trialN] = response
+        nDone[rows] = trialN + 1
+
+        # QuestObject.update() for every row at once: each pdf is
+        # multiplied by a slice of the s2 table, offset by its intensity
+        inten = np.clip(inten, -1e10, 1e10)
+        offset = nPdf - 1 + quest.i[0] - np.round((inten - tGuess) / grain)
+        offset = np.clip(offset, 0, maxOffset).astype(int)
+        block = pdf if len(rows) == n else pdf[rows]  # a view if possible
+        block *= s2[response[:, None], offset[:, None] + cols]
+        # keep the pdfs normalized (which doesn't change the estimates)
+        block /= block.sum(axis=1)[:, None]
+        if block is not pdf:
+            pdf[rows] = block
+
+        # as QuestHandler._checkFinished
+        done = np.zeros(len(rows), dtype=bool)
+        if nTrials is not None and trialN + 1 >= nTrials:
+            done[:] = True
+        elif stopInterval is not None:
+            low = _questQuantile(block, x, 0.05)
+            high = _questQuantile(block, x, 0.95)
+            done = abs(high - low) < stopInterval
+        finished[rows[done]] = True
+        if trialN + 1 >= maxTrials:
+            done[:] = True
+        active[rows[done]] = False
+
+        if done.all():
+            continue
+        if done.any():
+            rows, block = rows[~done], block[~done]
+        if method == 'mean':
+            nextVal = _questEstimates(block, x)[0]
+        elif method == 'mode':
+            nextVal = _questEstimates(block, x)[2]
+        else:
+            nextVal = _questQuantile(block, x, quest.quantileOrder)
+        nextVal = nextVal + tGuess
+        if maxVal is not None:
+            nextVal = np.minimum(nextVal, maxVal)
+        if minVal is not None:
+            nextVal = np.maximum(nextVal, minVal)
+        intensity[rows] = nextVal
+
+    intensities, responses = _trimHistory(intensities, responses, nDone)
+    mean, sd, mode = _questEstimates(pdf, x)
+    quantile = _questQuantile(pdf, x, quest.quantileOrder)
+    return SimulationResult(intensities, responses, nDone, finished,
+                            mean + tGuess, {'sd': sd, 'mode': mode + tGuess,
+                                            'quantile': quantile + tGuess})
+
+
+def simulatePsi(nStaircases, nTrials, intensRange, alphaRange, betaRange,
+                intensPrecision, alphaPrecision, betaPrecision, delta,
+                trueAlpha=None, trueBeta=None, stepType='lin',
+                expectedMin=0.5, prior=None, thresh=None, observer=None,
+                dtype='float64', nProcesses=1, seed=None):
+    """Simulate `nStaircases` Psi staircases, each choosing intensities as
+    :class:`~psychopy.data.PsiHandler` does with the same arguments. The
+    posteriors are kept (in the log domain) as the rows of one matrix,
+    and the expected entropies of every staircase are found with one
+    matrix product per trial.
+
+    :Parameters:
+
+        trueAlpha, trueBeta : the location and slope of the simulated
+            observers (one value, or one per staircase), see
+            :class:`CumNormalObserver`. Not needed if an `observer` is
+            given.
+
+        thresh : if given, the `thresholds` are the intensities giving
+            this probability of response 1 (as
+            :func:`PsiHandler.estimateThreshold`), otherwise they are the
+            location (alpha) estimates
+
+        observer : optional callable `observer(intensities, index)`, as
+            for :func:`simulateStairs`
+
+        dtype : 'float64' or 'float32' for the posteriors
+
+        nProcesses, seed : as for :func:`simulateStairs`
+
+    Returns a :class:`SimulationResult` whose `estimates` has the 'alpha'
+    and 'beta' estimates of each staircase.
+    """
+    if expectedMin not in [0, 0.5]:
+        raise NotImplementedError(
+            'Currently, only Yes/No and 2-AFC designs are '
+            'supported. Please specify either `expectedMin=0` '
+            '(Yes/No) or `expectedMin=0.5` (2-AFC).')
+    if observer is None:
+        if trueAlpha is None or trueBeta is None:
+            raise ValueError('simulatePsi needs trueAlpha and trueBeta, '
+                             'or an observer')
+        observer = CumNormalObserver(trueAlpha, trueBeta, delta=delta,
+                                     expectedMin=expectedMin)
+    kwargs = dict(observer=observer, nTrials=nTrials,
+                  psiArgs=(intensRange, alphaRange, betaRange,
+                           intensPrecision, alphaPrecision, betaPrecision),
+                  delta=delta, stepType=stepType, twoAFC=expectedMin == 0.5,
+                  prior=prior, thresh=thresh, dtype=dtype)
+    return _simulate(_psiBatch, nStaircases, nProcesses, seed, kwargs)
+
+
+def _psiPosterior(logPost, out):
+    """Normalised posteriors (in `out`) from rows of log10 posteriors
+    """
+    np.power(10, logPost - logPost.max(axis=1)[:, None], out=out)
+    out /= out.sum(axis=1)[:, None]
+    return out
+
+
+def _psiBatch(index, rng, observer, nTrials, psiArgs, delta, stepType,
+              twoAFC, prior, thresh, dtype):
+    n = len(index)
+    # one FastPsiObject provides the grid and the tables shared by all
+    psi = FastPsiObject(*psiArgs, delta=delta, stepType=stepType,
+                        TwoAFC=twoAFC, prior=prior, dtype=dtype)
+    nX = len(psi.x)
+    weightsT = np.ascontiguousarray(psi._weights.T)  # (nLambda, 2*nX)
+    # (response, x, lambda) so each update is a contiguous row
+    logProbResponse = np.ascontiguousarray(
+        psi._logProbResponse.transpose(0, 2, 1))
+    logPost = np.tile(psi._logProbLambda, (n, 1))
+    post = np.empty_like(logPost)
+
+    intensities = np.empty((n, nTrials))
+    responses = np.empty((n, nTrials), dtype=np.int8)
+    for trialN in range(nTrials):
+        # FastPsiObject.update() for every row at once
+        _psiPosterior(logPost, post)
+        products = post.dot(weightsT)
+        p1 = products[:, :nX]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pLogP = np.nan_to_num(p1 * np.log10(p1))
+            pLogP += np.nan_to_num((1 - p1) * np.log10(1 - p1))
+            pLogP -= products[:, nX:]
+            postLogPost = np.nansum(post * np.log10(post), axis=1)
+        pLogP -= postLogPost[:, None]
+        xIndex = np.argmin(pLogP, axis=1)
+
+        x = psi.x[xIndex]
+        intensities[:, trialN] = x
+        response = (rng.random_sample(n) < observer(x, index)).astype(int)
+        responses[:, trialN] = response
+        logPost += logProbResponse[response, xIndex]
+        logPost -= logPost.max(axis=1)[:, None]
+
+    _psiPosterior(logPost, post)
+    post = post.reshape((n, len(psi.alpha), len(psi.beta)))
+    alpha = post.sum(axis=2).dot(psi.alpha)
+    beta = post.sum(axis=1).dot(psi.beta)
+    if thresh is None:
+        thresholds = alpha
+    elif twoAFC:
+        thresholds = stats.norm.ppf((2 * thresh - 1) / (1 - delta),
+                                    alpha, beta)
+    else:
+        thresholds = stats.norm.ppf((thresh - delta / 2) / (1 - delta),
+                                    alpha, beta)
+    nDone = np.full(n, nTrials, dtype=int)
+    return SimulationResult(intensities, responses, nDone,
+                            np.ones(n, dtype=bool), thresholds,
+                            {'alpha': alpha, 'beta': beta})
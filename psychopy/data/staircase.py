@@ -25,7 +25,7 @@ from psychopy import logging
 from psychopy.tools.filetools import openOutputFile, genDelimiter
 from psychopy.tools.fileerrortools import handleFileCollision
 from psychopy.contrib.quest import QuestObject
-from psychopy.contrib.psi import PsiObject
+from psychopy.contrib.psi import PsiObject, FastPsiObject
 from .base import _BaseTrialHandler, _ComparisonMixin
 from .utils import _getExcelCellName
 
@@ -1054,6 +1054,12 @@ class PsiObject_(PsiObject, _ComparisonMixin):
     pass
 
 
+class FastPsiObject_(FastPsiObject, _ComparisonMixin):
+    """A FastPsiObject that implements the == and != operators.
+    """
+    pass
+
+
 class PsiHandler(StairHandler):
     """Handler to implement the "Psi" adaptive psychophysical method
     (Kontsevich & Tyler, 1999).
@@ -1102,7 +1108,10 @@ class PsiHandler(StairHandler):
                  prior=None,
                  fromFile=False,
                  extraInfo=None,
-                 name=''):
+                 name='',
+                 engine='classic',
+                 engineDtype='float64',
+                 engineThreads=1):
         """Initializes the handler and creates an internal Psi Object for
         grid approximation.
 
@@ -1175,6 +1184,23 @@ class PsiHandler(StairHandler):
                 Optional name for the PsiHandler used in PsychoPy's built-in
                 logging system.
 
+            engine  (str)
+                'classic' (default) recomputes the full posterior for every
+                response and candidate intensity on each trial. 'fast' uses
+                :class:`~psychopy.contrib.psi.FastPsiObject`, which chooses
+                the same intensities with preallocated buffers, a
+                log-domain posterior and a single matrix product per trial;
+                much quicker for fine grids.
+
+            engineDtype (str)
+                'float64' (default) or 'float32' for the 'fast' engine.
+                float32 halves memory use but may occasionally choose a
+                neighbouring intensity.
+
+            engineThreads   (int)
+                With the 'fast' engine, split each trial's computation
+                across this many threads (default 1).
+
         :Raises:
 
             NotImplementedError
@@ -1204,10 +1230,20 @@ class PsiHandler(StairHandler):
                 prior = None
 
         twoAFC = True if expectedMin == 0.5 else False
-        self._psi = PsiObject_(
-            intensRange, alphaRange, betaRange, intensPrecision,
-            alphaPrecision, betaPrecision, delta=delta,
-            stepType=stepType, TwoAFC=twoAFC, prior=prior)
+        if engine == 'classic':
+            self._psi = PsiObject_(
+                intensRange, alphaRange, betaRange, intensPrecision,
+                alphaPrecision, betaPrecision, delta=delta,
+                stepType=stepType, TwoAFC=twoAFC, prior=prior)
+        elif engine == 'fast':
+            self._psi = FastPsiObject_(
+                intensRange, alphaRange, betaRange, intensPrecision,
+                alphaPrecision, betaPrecision, delta=delta,
+                stepType=stepType, TwoAFC=twoAFC, prior=prior,
+                dtype=engineDtype, nThreads=engineThreads)
+        else:
+            raise ValueError("PsiHandler engine should be 'classic' or "
+                             "'fast', not %r" % engine)
 
         self._psi.update(None)
 
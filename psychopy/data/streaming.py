@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Incremental (streaming) writing of wide-format data files.
+
+Each completed entry is handed to a background thread which appends it to
+the data file and flushes, so the data survive a crash without the frame
+loop ever waiting on the disk.
+"""
+
+from __future__ import absolute_import, print_function
+
+from builtins import object
+import os
+import io
+import shutil
+import threading
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+from psychopy import logging
+from psychopy.tools.filetools import openOutputFile
+from .columnar import formatCell
+
+_STOP = object()  # sentinel telling the writer thread to finish
+# os.replace is atomic on all platforms but only exists in Python 3
+_replace = getattr(os, 'replace', os.rename)
+
+
+class WideTextStreamWriter(object):
+    """Appends entries (dicts) to a wide-format text file as they arrive.
+
+    Rows are formatted and written on a background thread. Columns keep
+    the order in which they first appeared. When an entry arrives with a
+    name that was not in the header yet, the new column is added to the
+    end and the header line is replaced (by copying the file, without
+    parsing it, to a temporary file that then replaces the original). The
+    file on disk is therefore always a valid data file for the entries
+    written so far; earlier rows just have fewer cells.
+
+    :usage:
+
+        writer = WideTextStreamWriter('data.csv')
+        writer.append({'rt': 0.5}, names=['rt'])
+        writer.close()  # waits for all pending rows to be written
+
+    """
+
+    def __init__(self, fileName, delim=',', encoding='utf-8',
+                 fileCollisionMethod='rename', fsync=False):
+        """
+        :Parameters:
+
+            fileName : the file to write (opened immediately)
+
+            delim : the column delimiter
+
+            encoding : the encoding used for the file
+
+            fileCollisionMethod : passed to
+                :func:`~psychopy.tools.fileerrortools.handleFileCollision`
+
+            fsync : if True, also ask the OS to commit each row to disk
+                (survives a power cut, not just a crash of Python)
+        """
+        self.delim = delim
+        self.encoding = encoding
+        self.fsync = fsync
+        f = openOutputFile(fileName, append=False,
+                           fileCollisionMethod=fileCollisionMethod,
+                           encoding=encoding)
+        self.fileName = f.name
+        self._file = f
+        self._names = []  # columns in the file, in order of appearance
+        self.nWritten = 0
+        self.nRewrites = 0
+        self.error = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run,
+                                        name='WideTextStreamWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def nPending(self):
+        """Number of entries queued but not yet written"""
+        return self._queue.qsize()
+
+    def append(self, entry, names):
+        """Queue `entry` (a dict that won't be modified afterwards) to be
+        written. Any of its names not yet in the file are added in the
+        order they have in `names`. Returns immediately.
+        """
+        self._queue.put((entry, list(names)))
+
+    def flush(self):
+        """Block until all queued entries have been written"""
+        self._queue.join()
+
+    def close(self):
+        """Write any pending entries and close the file"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        if self.error is not None:
+            logging.error('Streaming data to %s failed: %s'
+                          % (self.fileName, self.error))
+        else:
+            logging.info('saved data to %r' % self.fileName)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if self.error is None:
+                    self._write(*item)
+            except Exception as err:
+                # keep draining the queue so that flush()/close() don't hang
+                self.error = err
+            finally:
+                self._queue.task_done()
+
+    def _formatRow(self, entry):
+        cells = [formatCell(entry[name]) if name in entry else u''
+                 for name in self._names]
+        return self.delim.join(cells) + self.delim + u'\n'
+
+    def _write(self, entry, names):
+        newNames = [name for name in names
+                    if name in entry and name not in self._names]
+        newNames.extend(name for name in entry
+                        if name not in self._names and name not in newNames)
+        if newNames or self.nWritten == 0:
+            self._names.extend(newNames)
+            self._replaceHeader()
+        self._file.write(self._formatRow(entry))
+        self._commit(self._file)
+        self.nWritten += 1
+
+    def _header(self):
+        return u''.join(u'%s%s' % (name, self.delim)
+                        for name in self._names) + u'\n'
+
+    def _replaceHeader(self):
+        """Copy the file with a new header line (via a temporary file that
+        then replaces the original). Rows are copied as they are, so earlier
+        rows simply have fewer cells than the new header.
+        """
+        self._file.close()
+        tmpName = self.fileName + '.tmp'
+        with io.open(self.fileName, 'r', encoding=self.encoding) as old:
+            with io.open(tmpName, 'w', encoding=self.encoding) as tmp:
+                old.readline()  # discard the previous header
+                tmp.write(self._header())
+                shutil.copyfileobj(old, tmp)
+                self._commit(tmp)
+        _replace(tmpName, self.fileName)
+        self._file = io.open(self.fileName, 'a', encoding=self.encoding)
+        self.nRewrites += 1
+
+    def _commit(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
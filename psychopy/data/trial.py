@@ -22,6 +22,7 @@ from psychopy.tools.filetools import (openOutputFile, genDelimiter,
                                       genFilenameFromDelimiter)
 from .utils import importConditions
 from .base import _BaseTrialHandler, DataHandler
+from .columnar import ColumnStore
 
 
 class TrialType(dict):
@@ -370,10 +371,18 @@ class TrialHandler(_BaseTrialHandler):
         # check that we don't go out of bounds for either positive or negative
         if n > self.nRemaining or self.thisN + n < 0:
             return None
-        seqs = np.array(self.sequenceIndices).transpose().flat
-        condIndex = seqs[self.thisN + n]
+        # sequenceIndices[trialN][repN] is run one repeat at a time
+        trialN, repN = self._seqPosition(self.thisN + n)
+        condIndex = self.sequenceIndices[trialN][repN]
         return self.trialList[condIndex]
 
+    def _seqPosition(self, thisN):
+        """Returns the (trialN, repN) position in `sequenceIndices` of the
+        trial that runs at overall position `thisN`
+        """
+        nPerRep = len(self.sequenceIndices)
+        return thisN % nPerRep, thisN // nPerRep
+
     def getEarlierTrial(self, n=-1):
         """Returns the condition information from n trials previously.
         Useful for comparisons in n-back tasks. Returns 'None' if trying
@@ -858,8 +867,6 @@ class TrialHandler2(_BaseTrialHandler):
         self.nReps = int(nReps)
         self.nTotal = self.nReps * len(self.trialList)
         self.nRemaining = self.nTotal  # subtract 1 each trial
-        self.remainingIndices = []
-        self.prevIndices = []
         self.method = method
         self.thisRepN = 0  # records which repetition or pass we are on
         self.thisTrialN = -1  # records trial number within this repetition
@@ -870,9 +877,14 @@ class TrialHandler2(_BaseTrialHandler):
         self.extraInfo = extraInfo
         self.seed = seed
         self._rng = np.random.RandomState(seed=seed)
+        # the condition index of every trial, in the order they will run
+        self.sequenceIndices = self._createSequence()
+        # number of times each condition has run so far (for fullRandom)
+        self._repCounts = [0] * len(self.trialList)
 
         # store a list of dicts, convert to pandas DataFrame on access
         self._data = []
+        self._dataVersion = 0  # incremented whenever _data changes
 
         self.originPath, self.origin = self.getOriginPathAndFile(originPath)
         self._exp = None  # the experiment handler that owns me!
@@ -933,18 +945,65 @@ class TrialHandler2(_BaseTrialHandler):
         other_copy = copy.deepcopy(other)
         del self_copy._rng, other_copy._rng
 
+        # nor the cached copy of the data in DataFrame form
+        self_copy.__dict__.pop('_dataCache', None)
+        other_copy.__dict__.pop('_dataCache', None)
+
         result = super(TrialHandler2, self_copy).__eq__(other_copy)
         return result
 
+    def _createSequence(self):
+        """Pre-generates the condition index of every trial, in the order
+        they will be presented, so that fetching the next (or any future or
+        earlier) trial is a single lookup.
+
+        Random numbers are drawn in the same order as when the sequence was
+        generated one repeat at a time, so a given seed gives the same
+        sequence as before.
+        """
+        indices = list(range(len(self.trialList)))
+        if self.method == 'fullRandom':
+            sequence = indices * self.nReps
+            self._rng.shuffle(sequence)
+        elif self.method == 'random':
+            sequence = []
+            for thisRep in range(self.nReps):
+                thisRepSeq = list(indices)
+                self._rng.shuffle(thisRepSeq)  # shuffle in-place
+                sequence.extend(thisRepSeq)
+        elif self.method == 'sequential':
+            sequence = indices * self.nReps
+        else:
+            sequence = []
+        return sequence
+
     @property
     def data(self):
         """Returns a pandas DataFrame of the trial data so far
         Read only attribute - you can't directly modify TrialHandler.data
 
         Note that data are stored internally as a list of dictionaries,
-        one per trial. These are converted to a DataFrame on access.
+        one per trial. These are copied, as they arrive, into a
+        :class:`~psychopy.data.columnar.ColumnStore` from which the
+        DataFrame is made, so each access only converts the trials added
+        (or data added to the current trial) since the previous one. Each
+        access returns a new DataFrame, independent of the store and of
+        those returned before.
         """
-        return pd.DataFrame(self._data)
+        cache = self.__dict__.get('_dataCache')
+        if cache is None:
+            cache = self._dataCache = {'store': ColumnStore(),
+                                       'version': None, 'frame': None}
+        version = getattr(self, '_dataVersion', None)  # None if old file
+        if version is None or cache['version'] != version:
+            store = cache['store']
+            # rows before the current trial don't change once it has ended
+            # but the last row stored may have been current at the time
+            for row in range(max(store.nRows - 1, 0), len(self._data)):
+                store.setRow(row, self._data[row])
+            cache['frame'] = store.to_dataframe()
+            cache['version'] = version
+        return cache['frame'].copy()
 
     def __next__(self):
         """Advances to next trial and returns it.
@@ -970,47 +1029,34 @@ class TrialHandler2(_BaseTrialHandler):
         self.thisTrialN += 1  # number of trial this pass
         self.thisN += 1  # number of trial in total
         self.nRemaining -= 1
-        if self.thisIndex is not None:
-            self.prevIndices.append(self.thisIndex)
-
-        # thisRepN has exceeded nReps
-        if self.remainingIndices == []:
-            # we've just started, or just starting a new repeat
-            sequence = list(range(len(self.trialList)))
-            if (self.method == 'fullRandom' and
-                        self.thisN < (self.nReps * len(self.trialList))):
-                # we've only just started on a fullRandom sequence
-                sequence *= self.nReps
-                self._rng.shuffle(sequence)
-                self.remainingIndices = sequence
-            elif (self.method in ('sequential', 'random') and
-                          self.thisRepN < self.nReps):
-                # start a new repetition
-                self.thisTrialN = 0
-                self.thisRepN += 1
-                if self.method == 'random':
-                    self._rng.shuffle(sequence)  # shuffle in-place
-                self.remainingIndices = sequence
-            else:
-                # we've finished
-                self.finished = True
-                self._terminate()  # raises Stop (code won't go beyond here)
+
+        if self.thisN >= len(self.sequenceIndices):
+            # we've finished
+            self.finished = True
+            self._terminate()  # raises Stop (code won't go beyond here)
+        elif (self.method in ('sequential', 'random') and
+                  self.thisN % len(self.trialList) == 0):
+            # start a new repetition
+            self.thisTrialN = 0
+            self.thisRepN += 1
 
         # fetch the trial info
         if len(self.trialList) == 0:
             self.thisIndex = 0
             self.thisTrial = {}
         else:
-            self.thisIndex = self.remainingIndices.pop(0)
+            self.thisIndex = self.sequenceIndices[self.thisN]
             # if None then use empty dict
             thisTrial = self.trialList[self.thisIndex] or {}
             self.thisTrial = copy.copy(thisTrial)
         # for fullRandom check how many times this has come up before
         if self.method == 'fullRandom':
-            self.thisRepN = self.prevIndices.count(self.thisIndex)
+            self.thisRepN = self._repCounts[self.thisIndex]
+            self._repCounts[self.thisIndex] += 1
 
         # update data structure with new info
         self._data.append(self.thisTrial)  # update the data list of dicts
+        self._dataVersion += 1
         self.addData('thisN', self.thisN)
         self.addData('thisTrialN', self.thisTrialN)
         self.addData('thisRepN', self.thisRepN)
@@ -1029,8 +1075,7 @@ class TrialHandler2(_BaseTrialHandler):
         # offsets:
         if n > self.nRemaining or self.thisN + n < 0:
             return None
-        seqs = np.array(self.sequenceIndices).transpose().flat
-        condIndex = seqs[self.thisN + n]
+        condIndex = self.sequenceIndices[self.thisN + n]
         return self.trialList[condIndex]
 
     def getEarlierTrial(self, n=-1):
@@ -1160,6 +1205,7 @@ class TrialHandler2(_BaseTrialHandler):
         self_copy = copy.deepcopy(self)
         self_copy._rng_state = self_copy._rng.get_state()
         del self_copy._rng
+        self_copy.__dict__.pop('_dataCache', None)
 
         r = (super(TrialHandler2, self_copy)
              .saveAsJson(fileName=fileName,
@@ -1177,6 +1223,7 @@ class TrialHandler2(_BaseTrialHandler):
             self.columns.append(thisType)
         # save the actual value in a data dict
         self.thisTrial[thisType] = value
+        self._dataVersion += 1
         if self.getExp() is not None:
             # update the experiment handler too
             self.getExp().addData(thisType, value)
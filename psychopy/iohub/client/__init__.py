@@ -13,6 +13,7 @@ import subprocess
 import json
 import signal
 from weakref import proxy
+from operator import itemgetter
 
 import psutil
 
@@ -284,6 +285,7 @@ class ioHubConnection(object):
         self._iohub_server_config = None
         self._shutdown_attempted = False
         self._cv_order = None
+        self._sharedEvents = None
 
         self.iohub_status = self._startServer(ioHubConfig, ioHubConfigAbsPath)
         if self.iohub_status != 'OK':
@@ -360,7 +362,10 @@ class ioHubConnection(object):
         """
         r = None
         if device_label is None:
-            events = self._sendToHubServer(('GET_EVENTS',))[1]
+            if self._sharedEvents:
+                events = self._getSharedEvents()
+            else:
+                events = self._sendToHubServer(('GET_EVENTS',))[1]
             if events is None:
                 r = self.allEvents
             else:
@@ -414,6 +419,8 @@ class ioHubConnection(object):
         if device_label.lower() == 'all':
             self.allEvents = []
             self._sendToHubServer(('RPC', 'clearEventBuffer', [True, ]))
+            if self._sharedEvents:
+                self._sharedEvents.clear()
             try:
                 self.getDevice('keyboard')._clearLocalEvents()
             except:
@@ -421,6 +428,8 @@ class ioHubConnection(object):
         elif device_label in [None, '', False]:
             self.allEvents = []
             self._sendToHubServer(('RPC', 'clearEventBuffer', [False, ]))
+            if self._sharedEvents:
+                self._sharedEvents.clear()
             try:
                 self.getDevice('keyboard')._clearLocalEvents()
             except:
@@ -793,6 +802,25 @@ class ioHubConnection(object):
         r = self._sendToHubServer(('RPC', 'flushIODataStoreFile'))
         return r
 
+    def getDataStoreWriteStats(self):
+        """Get statistics on how the ioDataStore is keeping up with writing
+        events to disk.
+
+        Args:
+            None
+
+        Returns:
+            dict: rows_written, chunks_written, write_time (sec.),
+            write_rate (events written per sec. of write_time),
+            staged_rows (events waiting to be handed to the writer),
+            backlog_rows and backlog_chunks (handed over but not yet
+            written), max_backlog_rows and errors; or None if the
+            ioDataStore is not enabled.
+
+        """
+        r = self._sendToHubServer(('RPC', 'getDataStoreWriteStats'))
+        return r[2]
+
     def startCustomTasklet(self, task_name, task_class_path, **class_kwargs):
         """
         Instruct the iohub server to start running a custom tasklet given
@@ -973,6 +1001,9 @@ class ioHubConnection(object):
             self._server_process.terminate()
             return "ioHub startup failed."
 
+        if self._iohub_server_config.get('event_transport') == 'shared_memory':
+            self._attachSharedEvents()
+
         # <<<<< Done starting iohub subprocess
 
         ioHubConnection.ACTIVE_CONNECTION = proxy(self)
@@ -1024,6 +1055,29 @@ class ioHubConnection(object):
 
         # # <<<< Finished wait for iohub server ready signal ....
 
+    def _attachSharedEvents(self):
+        """Map the ring buffers the ioHub Server writes events to, so
+        getEvents() can read them without a UDP request."""
+        path = self._sendToHubServer(('RPC', 'getSharedEventBufferPath'))[2]
+        if not path:
+            print2err('Warning: the ioHub Server has no shared memory event '
+                      'buffer; events will be received over UDP.')
+            return
+        from ..shmem import SharedEventBuffer
+        self._sharedEvents = SharedEventBuffer.attach(path)
+
+    def _getSharedEvents(self):
+        """Read new events from the shared memory event buffer, plus any
+        the ioHub Server could not write to it (which it keeps in its global
+        event buffer, for a UDP GET_EVENTS request)."""
+        events = self._sharedEvents.read()
+        if self._sharedEvents.hasFallbackEvents():
+            udp_events = self._sendToHubServer(('GET_EVENTS',))[1]
+            if udp_events:
+                events.extend(udp_events)
+                events.sort(key=itemgetter(DeviceEvent.EVENT_HUB_TIME_INDEX))
+        return events or None
+
     def _createDeviceList(self, monitor_devices_config):
         """Create client side iohub device views.
         """
@@ -1245,6 +1299,9 @@ class ioHubConnection(object):
 
             self._shutdown_attempted = True
             TimeoutError = psutil.TimeoutExpired
+            if self._sharedEvents:
+                self._sharedEvents.close()
+                self._sharedEvents = None
             try:
                 self.udp_client.sendTo(('STOP_IOHUB_SERVER',))
                 self.udp_client.close()
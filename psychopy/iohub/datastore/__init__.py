@@ -8,13 +8,17 @@ from __future__ import division, absolute_import, print_function
 
 import os
 import atexit
+import threading
+from functools import wraps
 import numpy as np
 from builtins import str
 from builtins import object
 from pkg_resources import parse_version
-from ..server import DeviceEvent
+from ..server import DeviceEvent, getTime
 from ..constants import EventConstants
 from ..errors import ioHubError, printExceptionDetailsToStdErr, print2err
+from .staging import StagingBuffer, StagedWriter
+from .util import indexEventTable
 
 
 import tables
@@ -66,6 +70,16 @@ SCHEMA_AUTHORS = 'Sol Simpson'
 SCHEMA_MODIFIED_DATE = 'November 24th, 2016'
 
 
+def _lockedFileAccess(method):
+    """Run a DataStoreFile method while holding the file lock, so it doesn't
+    use the file at the same time as the background writer."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._fileLock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class DataStoreFile(object):
     def __init__(self, fileName, folderPath, fmode='a', iohub_settings=None):
         self.fileName = fileName
@@ -83,6 +97,17 @@ class DataStoreFile(object):
         self.flushCounter = self.settings.get('flush_interval', 32)
         self._eventCounter = 0
 
+        # Events are staged per table and appended in chunks of
+        # staging_buffer_size rows, or after staging_interval seconds.
+        self._stagingSize = self.settings.get('staging_buffer_size', 1024)
+        self._stagingInterval = self.settings.get('staging_interval', 0.25)
+        self._staging = dict()
+        self._fileLock = threading.RLock()
+        self._writer = StagedWriter(self._fileLock, self._flushTables,
+                                    self.flushCounter,
+                                    self.settings.get('background_writes',
+                                                      True))
+
         self.TABLES = dict()
         self._eventGroupMappings = dict()
         self.emrtFile = open_file(self.filePath, mode=fmode)
@@ -95,6 +120,7 @@ class DataStoreFile(object):
         else:
             self.loadTableMappings()
 
+    @_lockedFileAccess
     def buildOutTemplate(self):
         self.emrtFile.title = DATA_FILE_TITLE
         self.emrtFile.FILE_VERSION = FILE_VERSION
@@ -123,7 +149,7 @@ class DataStoreFile(object):
             'data_collection',
             title='Data Collected using the ioHub Event Framework.'
         )
-        self.flush()
+        self._flushTables()
 
         getattr(self.emrtFile, create_group)(
             self.emrtFile.root.data_collection,
@@ -136,7 +162,7 @@ class DataStoreFile(object):
             'condition_variables',
             title="Experiment Session DV and IV's Values."
         )
-        self.flush()
+        self._flushTables()
 
 
         self.TABLES['EXPERIMENT_METADETA'] = getattr(self.emrtFile, create_table)(
@@ -151,7 +177,7 @@ class DataStoreFile(object):
             SessionMetaData,
             title='Information About Sessions Saved to This ioHub DataStore File.'
         )
-        self.flush()
+        self._flushTables()
 
         getattr(self.emrtFile, create_group)(self.emrtFile.root.data_collection.events, 'experiment', title='Experiment Device Events.')
         getattr(self.emrtFile, create_group)(self.emrtFile.root.data_collection.events, 'keyboard', title='Keyboard Device Events.')
@@ -162,7 +188,7 @@ class DataStoreFile(object):
         getattr(self.emrtFile, create_group)(self.emrtFile.root.data_collection.events, 'eyetracker', title='EyeTracker Device Events.')
         getattr(self.emrtFile, create_group)(self.emrtFile.root.data_collection.events, 'mcu', title='MCU Device Events.')
         getattr(self.emrtFile, create_group)(self.emrtFile.root.data_collection.events, 'serial', title='Serial Interface Events.')
-        self.flush()
+        self._flushTables()
 
     @staticmethod
     def eventTableLabel2ClassName(event_table_label):
@@ -173,6 +199,7 @@ class DataStoreFile(object):
             'Event').split('_')
         return ''.join([t[0].upper() + t[1:] for t in tokens])
 
+    @_lockedFileAccess
     def groupNodeForEvent(self, event_cls):
         evt_group_label = event_cls.PARENT_DEVICE.DEVICE_TYPE_STRING.lower()
         datevts_node = self.emrtFile.root.data_collection.events
@@ -187,6 +214,7 @@ class DataStoreFile(object):
                                       title=egtitle)
             return datevts_node._f_get_child(evt_group_label)
 
+    @_lockedFileAccess
     def updateDataStoreStructure(self, device_instance, event_class_dict):
         dfilter = tables.Filters(
             complevel=0,
@@ -207,7 +235,7 @@ class DataStoreFile(object):
                             (device_instance.__class__.__name__,
                              ),
                             filters=dfilter.copy())
-                        self.flush()
+                        self._flushTables()
                     except tables.NodeError:
                         self.TABLES[event_table_label] = self.groupNodeForEvent(event_cls)._f_get_child(self.eventTableLabel2ClassName(event_table_label))
                     except Exception as e:
@@ -245,6 +273,7 @@ class DataStoreFile(object):
                             self.eventTableLabel2ClassName(event_table_label)))
                     print2err('----------------------------------------------')
 
+    @_lockedFileAccess
     def addClassMapping(self,ioClass,ctable):
         names = [
             x['class_id'] for x in self.TABLES['CLASS_TABLE_MAPPINGS'].where(
@@ -257,8 +286,9 @@ class DataStoreFile(object):
             trow['class_name'] = ioClass.__name__
             trow['table_path']  = ctable._v_pathname
             trow.append()
-            self.flush()
+            self._flushTables()
 
+    @_lockedFileAccess
     def createOrUpdateExperimentEntry(self,experimentInfoList):
         experiment_metadata = self.TABLES['EXPERIMENT_METADETA']
         result = [row for row in experiment_metadata.iterrows() if row[
@@ -274,9 +304,10 @@ class DataStoreFile(object):
         self.active_experiment_id = max_id + 1
         experimentInfoList[0] = self.active_experiment_id
         experiment_metadata.append([experimentInfoList, ])
-        self.flush()
+        self._flushTables()
         return self.active_experiment_id
 
+    @_lockedFileAccess
     def createExperimentSessionEntry(self, sessionInfoDict):
         session_metadata = self.TABLES['SESSION_METADETA']
         max_id = 0
@@ -294,9 +325,10 @@ class DataStoreFile(object):
             sessionInfoDict['user_variables']
         )
         session_metadata.append([values, ])
-        self.flush()
+        self._flushTables()
         return self.active_session_id
 
+    @_lockedFileAccess
     def initConditionVariableTable(
             self, experiment_id, session_id, np_dtype):
         expcv_table = None
@@ -334,6 +366,7 @@ class DataStoreFile(object):
         return True
 
 
+    @_lockedFileAccess
     def extendConditionVariableTable(self, experiment_id, session_id, data):
         if self._EXP_COND_DTYPE is None:
             return False
@@ -371,6 +404,7 @@ class DataStoreFile(object):
             return False
         return True
 
+    @_lockedFileAccess
     def checkIfSessionCodeExists(self, sessionCode):
         if self.emrtFile:
             sessionsForExperiment = self.emrtFile.root.data_collection.session_meta_data.where(
@@ -387,13 +421,9 @@ class DataStoreFile(object):
                 return False
             etype = event[DeviceEvent.EVENT_TYPE_ID_INDEX]
             eventClass = EventConstants.getClass(etype)
-            etable = self.TABLES[eventClass.IOHUB_DATA_TABLE]
             event[DeviceEvent.EVENT_EXPERIMENT_ID_INDEX] = self.active_experiment_id
             event[DeviceEvent.EVENT_SESSION_ID_INDEX] = self.active_session_id
-
-            np_array = np.array([tuple(event), ], dtype=eventClass.NUMPY_DTYPE)
-            etable.append(np_array)
-            self.bufferedFlush()
+            self._stageRows(eventClass, (tuple(event),))
         except Exception:
             print2err("Error saving event: ", event)
             printExceptionDetailsToStdErr()
@@ -407,23 +437,50 @@ class DataStoreFile(object):
 
             etype = event[DeviceEvent.EVENT_TYPE_ID_INDEX]
             eventClass = EventConstants.getClass(etype)
-            etable = self.TABLES[eventClass.IOHUB_DATA_TABLE]
 
             np_events = []
             for event in events:
                 event[DeviceEvent.EVENT_EXPERIMENT_ID_INDEX] = self.active_experiment_id
                 event[DeviceEvent.EVENT_SESSION_ID_INDEX] = self.active_session_id
                 np_events.append(tuple(event))
-
-            np_array = np.array(np_events, dtype=eventClass.NUMPY_DTYPE)
-            #ioHub.print2err('np_array:',np_array)
-            etable.append(np_array)
-            self.bufferedFlush(len(np_events))
+            self._stageRows(eventClass, np_events)
         except ioHubError as e:
             print2err(e)
         except Exception:
             printExceptionDetailsToStdErr()
 
+    def _stageRows(self, eventClass, rows):
+        """Copy rows (tuples) for eventClass into the staging buffer of its
+        table, handing each buffer that fills up to the writer."""
+        table_label = eventClass.IOHUB_DATA_TABLE
+        staging = self._staging.get(table_label)
+        if staging is None:
+            staging = StagingBuffer(self.TABLES[table_label],
+                                    eventClass.NUMPY_DTYPE,
+                                    self._stagingSize)
+            self._staging[table_label] = staging
+        now = getTime()
+        for row in rows:
+            if staging.append(row, now):
+                self._writer.submit(staging)
+
+    def flushStaleBuffers(self):
+        """Hand staged events that have waited staging_interval seconds or
+        more to the writer. Called regularly by the ioHub Server, so events
+        reach the file even when they arrive slowly."""
+        now = getTime()
+        for staging in self._staging.values():
+            if staging.nRows and now - staging.firstRowTime >= self._stagingInterval:
+                self._writer.submit(staging)
+
+    def getWriteStats(self):
+        """Return a dict of statistics on the events written to the file:
+        those of StagedWriter.getStats(), plus staged_rows, the number of
+        events still waiting in the staging buffers."""
+        stats = self._writer.getStats()
+        stats['staged_rows'] = sum(s.nRows for s in self._staging.values())
+        return stats
+
     def bufferedFlush(self,eventCount=1):
         """
         If flushCounter threshold is >=0 then do some checks. If it is < 0,
@@ -432,16 +489,25 @@ class DataStoreFile(object):
         """
         if self.flushCounter >= 0:
             if self.flushCounter == 0:
-                self.flush()
+                self._flushTables()
                 return True
             if self.flushCounter <= self._eventCounter:
-                self.flush()
+                self._flushTables()
                 self._eventCounter = 0
                 return True
             self._eventCounter += eventCount
             return False
 
     def flush(self):
+        """Write all staged events, wait for the writer to finish and flush
+        the file to disk."""
+        for staging in self._staging.values():
+            self._writer.submit(staging)
+        self._writer.join()
+        with self._fileLock:
+            self._flushTables()
+
+    def _flushTables(self):
         try:
             if self.emrtFile:
                 self.emrtFile.flush()
@@ -450,8 +516,24 @@ class DataStoreFile(object):
         except Exception:
             printExceptionDetailsToStdErr()
 
+    @_lockedFileAccess
+    def indexEventTables(self):
+        """Index the columns of each event table that DataStore queries
+        select events by (see datastore.util.INDEXED_EVENT_COLUMNS)."""
+        for table_label, table in self.TABLES.items():
+            if 'time' in table.colnames and 'type' in table.colnames:
+                try:
+                    indexEventTable(table)
+                except Exception:
+                    print2err('Error indexing DataStore table %s' % (table_label))
+                    printExceptionDetailsToStdErr()
+        self._flushTables()
+
     def close(self):
         self.flush()
+        self._writer.close()
+        if self.settings.get('index_on_close', True):
+            self.indexEventTables()
         self._activeRunTimeConditionVariableTable = None
         self.emrtFile.close()
 
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+# Part of the psychopy.iohub library.
+# Copyright (C) 2012-2016 iSolver Software Solutions
+# Distributed under the terms of the GNU General Public License (GPL).
+"""
+Staging buffers and a background writer for the ioHub DataStore.
+
+Events are copied into a preallocated structured array per event table
+(a StagingBuffer). A full (or stale) buffer is handed to the
+StagedWriter, which appends it to its table as a single chunk on a worker
+thread, so the event processing greenlet never waits on HDF5.
+"""
+from __future__ import division, absolute_import
+
+import threading
+from collections import deque
+from timeit import default_timer
+
+import numpy as np
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+from ..errors import print2err, printExceptionDetailsToStdErr
+
+_STOP = object()  # sentinel telling the writer thread to finish
+
+
+class StagingBuffer(object):
+    """Rows for one event table that are waiting to be written.
+
+    Rows are stored in a preallocated numpy structured array of `size`
+    rows. take() hands the filled array to the writer and carries on with
+    a spare one; the writer gives arrays back with recycle() once they are
+    written, so no arrays are allocated in the steady state.
+    """
+
+    def __init__(self, table, dtype, size):
+        self.table = table
+        self.dtype = np.dtype(dtype)
+        self.size = max(1, int(size))
+        self._spare = deque()
+        self._rows = self._nextArray()
+        self.nRows = 0
+        self.firstRowTime = None
+
+    def _nextArray(self):
+        try:
+            return self._spare.pop()
+        except IndexError:
+            return np.empty(self.size, dtype=self.dtype)
+
+    def append(self, row, now):
+        """Stage `row` (a tuple matching the table dtype). Returns True when
+        the buffer is full and should be taken.
+        """
+        if self.nRows == 0:
+            self.firstRowTime = now
+        self._rows[self.nRows] = row
+        self.nRows += 1
+        return self.nRows >= self.size
+
+    def take(self):
+        """Return (rows, nRows) for the staged rows and start a new chunk.
+        """
+        rows, nRows = self._rows, self.nRows
+        self._rows = self._nextArray()
+        self.nRows = 0
+        self.firstRowTime = None
+        return rows, nRows
+
+    def recycle(self, rows):
+        """Give back an array returned by take() once it has been written.
+        """
+        self._spare.append(rows)
+
+
+class StagedWriter(object):
+    """Appends chunks taken from StagingBuffers to their tables.
+
+    With `threaded` True (the default) chunks are written, in the order
+    they were submitted, by a worker thread; otherwise submit() writes
+    them straight away. Every table append and file flush is done while
+    holding `fileLock`, which everything else touching the file must hold
+    too, since HDF5 is not safe to use from two threads at once.
+
+    `flushFile` is called (with the lock held) after each `flushInterval`
+    rows have been written; 0 flushes after every chunk and a negative
+    value leaves flushing to the caller.
+    """
+
+    def __init__(self, fileLock, flushFile, flushInterval=32, threaded=True):
+        self._fileLock = fileLock
+        self._flushFile = flushFile
+        self.flushInterval = flushInterval
+        self._sinceFlush = 0
+        self._statsLock = threading.Lock()
+        self.rowsWritten = 0
+        self.chunksWritten = 0
+        self.writeTime = 0.0
+        self.backlogRows = 0
+        self.maxBacklogRows = 0
+        self.errorCount = 0
+        self._queue = None
+        self._thread = None
+        if threaded:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run,
+                                            name='ioHubDataStoreWriter')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def submit(self, staging):
+        """Take the rows staged in `staging` and write them (or queue them to
+        be written).
+        """
+        rows, nRows = staging.take()
+        if nRows == 0:
+            staging.recycle(rows)
+            return
+        with self._statsLock:
+            self.backlogRows += nRows
+            self.maxBacklogRows = max(self.maxBacklogRows, self.backlogRows)
+        if self._thread is None:
+            self._write(staging, rows, nRows)
+        else:
+            self._queue.put((staging, rows, nRows))
+
+    def join(self):
+        """Block until every submitted chunk has been written.
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Write any queued chunks and stop the worker thread.
+        """
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def getStats(self):
+        """Return a dict of write statistics:
+
+        rows_written, chunks_written: totals so far
+        write_time: seconds spent appending to tables and flushing
+        write_rate: rows written per second of write_time
+        backlog_rows, backlog_chunks: submitted but not yet written
+        max_backlog_rows: the largest backlog_rows seen
+        errors: the number of chunks that failed to be written
+        """
+        with self._statsLock:
+            stats = dict(rows_written=self.rowsWritten,
+                         chunks_written=self.chunksWritten,
+                         write_time=self.writeTime,
+                         backlog_rows=self.backlogRows,
+                         max_backlog_rows=self.maxBacklogRows,
+                         errors=self.errorCount)
+        stats['write_rate'] = 0.0
+        if stats['write_time'] > 0:
+            stats['write_rate'] = stats['rows_written'] / stats['write_time']
+        stats['backlog_chunks'] = self._queue.qsize() if self._queue else 0
+        return stats
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._write(*item)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, staging, rows, nRows):
+        startTime = default_timer()
+        failed = False
+        try:
+            with self._fileLock:
+                staging.table.append(rows[:nRows])
+                self._sinceFlush += nRows
+                if 0 <= self.flushInterval <= self._sinceFlush:
+                    self._flushFile()
+                    self._sinceFlush = 0
+        except Exception:
+            failed = True
+            print2err('Error writing %d events to %s' %
+                      (nRows, getattr(staging.table, '_v_pathname', '?')))
+            printExceptionDetailsToStdErr()
+        finally:
+            staging.recycle(rows)
+        with self._statsLock:
+            self.writeTime += default_timer() - startTime
+            self.backlogRows -= nRows
+            if failed:
+                self.errorCount += 1
+            else:
+                self.rowsWritten += nRows
+                self.chunksWritten += 1
@@ -10,6 +10,7 @@ from builtins import next
 from past.builtins import basestring
 from builtins import object
 import numbers  # numbers.Integral is like (int, long) but supports Py3
+import numpy as np
 from tables import *
 import os
 from collections import namedtuple
@@ -25,16 +26,41 @@ if parse_version(tables.__version__) < parse_version('3'):
     list_nodes = "listNodes"
     get_node = "getNode"
     read_where = "readWhere"
+    create_index = "createIndex"
 else:
     from tables import open_file
     walk_groups = "walk_groups"
     list_nodes = "list_nodes"
     get_node = "get_node"
     read_where = "read_where"
+    create_index = "create_index"
 
 
 _hubFiles = []
 
+# The event table columns that queries select rows by.
+INDEXED_EVENT_COLUMNS = ('experiment_id', 'session_id', 'type', 'time')
+
+
+def indexEventTable(table, columns=INDEXED_EVENT_COLUMNS):
+    """
+    Create PyTables indexes for the given columns of an event table, so that
+    queries on them don't have to scan the whole table. Columns the table
+    doesn't have, or that are already indexed, are skipped.
+
+    Returns the list of column names that were indexed.
+    """
+    indexed = []
+    for name in columns:
+        if name not in table.colnames:
+            continue
+        column = table.cols._f_col(name)
+        if column.is_indexed:
+            continue
+        getattr(column, create_index)()
+        indexed.append(name)
+    return indexed
+
 def openHubFile(filepath, filename, mode):
     """
     Open an HDF5 DataStore file and register it so that it is closed even on interpreter crash.
@@ -443,18 +469,7 @@ class ExperimentDataAccessUtility(object):
             Values for the specified event type and event attribute columns which match the provided experiment condition variable filter, starting condition filer, and ending condition filter criteria.
         """
         if self.hdfFile:
-            klassTables = self.hdfFile.root.class_table_mapping
-
-            deviceEventTable = None
-
-            result = [
-                row.fetch_all_fields() for row in klassTables.where(
-                    '(class_id == %d) & (class_type_id == 1)' %
-                    (event_type_id))]
-            if len(result) is not 1:
-                raise ExperimentDataAccessException("event_type_id passed to getEventAttribute should only return one row from CLASS_MAPPINGS.")
-            tablePathString = result[0][3]
-            deviceEventTable = getattr(self.hdfFile, get_node)(tablePathString)
+            deviceEventTable = self._getEventTableForID(event_type_id)
 
             for ename in event_attribute_names:
                 if ename not in deviceEventTable.colnames:
@@ -485,6 +500,9 @@ class ExperimentDataAccessUtility(object):
                 # no further where clause building needed; get reseults and
                 # return
                 if startConditions is None and endConditions is None:
+                    # the query only depends on the session, so read the
+                    # matching rows (all columns) once per session
+                    sessionRows = dict()
                     for cv in filteredConditionVariableList:
 
                         wclause = '( experiment_id == {0} ) & ( session_id == {1} )'.format(
@@ -496,10 +514,15 @@ class ExperimentDataAccessUtility(object):
                             wclause += '& ( filter_id == {0} ) '.format(
                                 filter_id)
 
+                        if cv.session_id not in sessionRows:
+                            sessionRows[cv.session_id] = getattr(
+                                deviceEventTable, read_where)(wclause)
+                        rows = sessionRows[cv.session_id]
+
                         resultSetList.append([])
 
                         for ename in event_attribute_names:
-                            resultSetList[-1].append(getattr(deviceEventTable, read_where)(wclause, field=ename))
+                            resultSetList[-1].append(rows[ename])
                         resultSetList[-1].append(wclause)
                         resultSetList[-1].append(cv)
 
@@ -558,6 +581,148 @@ class ExperimentDataAccessUtility(object):
 
             return None
 
+    def getTrialEventAttributeValues(
+            self,
+            event_type_id,
+            event_attribute_names,
+            startTimeVariable,
+            endTimeVariable,
+            filter_id=None,
+            conditionVariablesFilter=None):
+        """
+        Like getEventAttributeValues, but for the common case of wanting the
+        events that occurred between a start and an end time saved as
+        condition variables for each trial. Rather than querying the event
+        table once per trial and attribute, all matching events are read in
+        one query, sorted by time, and each trial's events are found by a
+        binary search of their times.
+
+        Args:
+            event_type_id (int): The ioHub event type to get values for.
+            event_attribute_names (list): The event table columns to return.
+            startTimeVariable (str): The condition variable holding the time each trial starts (the '@' quoting used by getEventAttributeValues is optional).
+            endTimeVariable (str): The condition variable holding the time each trial ends.
+            filter_id (int): Only return events with this filter_id.
+            conditionVariablesFilter (dict): Passed to getConditionVariables to select the trials to return events for.
+
+        Returns:
+            list: One EventAttributeResults namedtuple per trial, the same as getEventAttributeValues returns for the time range condition `(time >= start) & (time <= end)`. The attribute arrays share memory with each other, so treat them as read-only.
+        """
+        if not self.hdfFile:
+            return None
+        deviceEventTable = self._getEventTableForID(event_type_id)
+
+        if not isinstance(event_attribute_names, (list, tuple)):
+            event_attribute_names = [event_attribute_names, ]
+        for ename in event_attribute_names:
+            if ename not in deviceEventTable.colnames:
+                raise ExperimentDataAccessException(
+                    'getTrialEventAttributeValues: %s does not have a column named %s' %
+                    (deviceEventTable.title, ename))
+
+        cvNames = self.getConditionVariableNames()
+        timeVariables = []
+        for name in (startTimeVariable, endTimeVariable):
+            if name.startswith('@') and name.endswith('@'):
+                name = name[1:-1]
+            if name not in cvNames:
+                raise ExperimentDataAccessException(
+                    'getTrialEventAttributeValues: {0} is not a valid attribute name in {1}'.format(
+                        name, cvNames))
+            timeVariables.append(name)
+        startTimeVariable, endTimeVariable = timeVariables
+
+        if conditionVariablesFilter is None:
+            conditionVariables = self.getConditionVariables()
+        else:
+            conditionVariables = self.getConditionVariables(
+                conditionVariablesFilter)
+
+        EventAttributeResults = namedtuple(
+            'EventAttributeResults',
+            list(event_attribute_names) + ['query_string', 'condition_set'])
+
+        wclause = '( experiment_id == {0} ) & ( type == {1} ) '.format(
+            self._experimentID, event_type_id)
+        if filter_id is not None:
+            wclause += '& ( filter_id == {0} ) '.format(filter_id)
+        sessionIDs = sorted(set(cv.session_id for cv in conditionVariables))
+        if len(sessionIDs) == 1:
+            wclause += '& ( session_id == {0} ) '.format(sessionIDs[0])
+
+        rows = getattr(deviceEventTable, read_where)(wclause)
+        if len(sessionIDs) > 1:
+            rows = rows[np.in1d(rows['session_id'], sessionIDs)]
+        rows = rows[np.lexsort((rows['time'], rows['session_id']))]
+        # contiguous float64 times, so searchsorted doesn't copy or cast them
+        times = np.ascontiguousarray(rows['time'], dtype=np.float64)
+        sessionStarts = dict()
+        ids, firsts, counts = np.unique(rows['session_id'], return_index=True,
+                                        return_counts=True)
+        for sid, first, count in zip(ids.tolist(), firsts, counts):
+            sessionStarts[sid] = (first, first + count)
+        columns = [rows[ename] for ename in event_attribute_names]
+
+        resultSetList = []
+        for cv in conditionVariables:
+            first, last = sessionStarts.get(int(cv.session_id), (0, 0))
+            startTime = getattr(cv, startTimeVariable)
+            endTime = getattr(cv, endTimeVariable)
+            sessionTimes = times[first:last]
+            start = first + sessionTimes.searchsorted(float(startTime), 'left')
+            end = first + sessionTimes.searchsorted(float(endTime), 'right')
+            query = '( experiment_id == {0} ) & ( session_id == {1} ) & ( type == {2} ) '.format(
+                self._experimentID, cv.session_id, event_type_id)
+            if filter_id is not None:
+                query += '& ( filter_id == {0} ) '.format(filter_id)
+            query += '& ( ( time >= {0} ) & ( time <= {1} ) ) '.format(
+                startTime, endTime)
+            values = [column[start:end] for column in columns]
+            resultSetList.append(EventAttributeResults(*(values + [query, cv])))
+        return resultSetList
+
+    def createEventTableIndexes(self):
+        """Index the experiment_id, session_id, type and time columns of
+        every event table that doesn't have them yet, which makes the
+        queries run by getEventAttributeValues and
+        getTrialEventAttributeValues much faster on large tables. The ioHub
+        Server normally creates these when the session ends; this is for
+        files saved without them. The file must have been opened in 'a'
+        mode.
+
+        Returns:
+            dict: The names of the columns indexed, by table path.
+        """
+        if self.mode not in ('a', 'r+'):
+            raise ExperimentDataAccessException(
+                "createEventTableIndexes: the DataStore file must be opened in 'a' mode, not '%s'" % (self.mode))
+        indexed = dict()
+        paths = set(m.table_path for m in self.getEventMappingInformation().values())
+        for path in sorted(paths):
+            if isinstance(path, bytes):
+                path = path.decode('utf-8')
+            columns = indexEventTable(getattr(self.hdfFile, get_node)(path))
+            if columns:
+                indexed[path] = columns
+        self.hdfFile.flush()
+        return indexed
+
+    def _getEventTableForID(self, event_type_id):
+        klassTables = self.hdfFile.root.class_table_mapping
+        result = [
+            row.fetch_all_fields() for row in klassTables.where(
+                '(class_id == %d) & (class_type_id == 1)' %
+                (event_type_id))]
+        if len(result) != 1:
+            raise ExperimentDataAccessException("event_type_id passed to getEventAttribute should only return one row from CLASS_MAPPINGS.")
+        return self._getNodeForPath(result[0][3])
+
+    def _getNodeForPath(self, path):
+        # table paths are read back from StringCol columns, so are bytes
+        if isinstance(path, bytes):
+            path = path.decode('utf-8')
+        return getattr(self.hdfFile, get_node)(path)
+
     def getEventIterator(self, event_type):
         """
         **Docstr TBC.**
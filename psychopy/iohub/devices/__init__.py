@@ -11,8 +11,10 @@ from builtins import object
 import collections
 import copy
 import os
+from bisect import bisect_right
 from collections import deque
-from operator import itemgetter
+from heapq import heapify, heappop, heapreplace
+from itertools import islice
 
 import numpy as np
 
@@ -143,6 +145,166 @@ class ioObject(with_metaclass(ioObjectMetaClass, object)):
                     rpcList.append(d)
         return rpcList
 
+########### Time ordered buffer of ioHub events ###############################
+
+
+class _EventStream(object):
+    """The buffered events of one device, event type and filter_id, in hub
+    time order, with their hub times kept alongside for bisecting.
+    """
+    __slots__ = ['events', 'times', 'dropped']
+
+    def __init__(self, maxlen):
+        self.events = deque(maxlen=maxlen)
+        self.times = deque(maxlen=maxlen)
+        self.dropped = 0
+
+
+def _eventsFrom(events, start):
+    # iterate over events[start:] without stepping over the start of a long
+    # deque when the end is closer
+    if start == 0:
+        return iter(events)
+    n = len(events) - start
+    if n <= start:
+        return reversed(list(islice(reversed(events), n)))
+    return islice(events, start, None)
+
+
+class DeviceEventBuffer(object):
+    """Buffer of ioHub events (in list form), used for the event buffer of
+    each Device and for the ioHub Server's global event buffer.
+
+    Events are kept in a separate stream for each device, event type and
+    filter_id, in hub time order. Events from several streams are returned
+    in time order by merging the streams, which takes O(k log m) time for k
+    events from m streams, rather than by sorting all the buffered events,
+    and the events after a given time are found by bisecting the streams.
+
+    Each stream holds up to maxlen events. When a stream is full, adding an
+    event drops the oldest event in it; the number of events dropped is
+    returned by droppedCount().
+    """
+
+    def __init__(self, maxlen=None):
+        self.maxlen = maxlen
+        self._streams = dict()
+
+    def append(self, event):
+        key = (event[DeviceEvent.DEVICE_ID_INDEX],
+               event[DeviceEvent.EVENT_TYPE_ID_INDEX],
+               event[DeviceEvent.EVENT_FILTER_ID_INDEX])
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = _EventStream(self.maxlen)
+        events, times = stream.events, stream.times
+        time = event[DeviceEvent.EVENT_HUB_TIME_INDEX]
+        full = len(events) == self.maxlen
+        if full:
+            stream.dropped += 1
+        if times and time < times[-1]:
+            # an event older than the last one in the stream; rare
+            if full:
+                events.popleft()
+                times.popleft()
+            i = bisect_right(times, time)
+            events.insert(i, event)
+            times.insert(i, time)
+        else:
+            events.append(event)
+            times.append(time)
+
+    def _select(self, event_type, filter_id):
+        return [stream for (_, etype, fid), stream in self._streams.items()
+                if (event_type is None or etype == event_type) and
+                (filter_id is None or fid == filter_id)]
+
+    def get(self, event_type=None, filter_id=None, since=None,
+            max_events=None, remove=False):
+        """Return a list of the buffered events, of event_type and with
+        filter_id if they are given, oldest first.
+
+        Only events with a hub time after `since` are returned if it is
+        given, and only the oldest max_events of them if that is given.
+        If remove is True the events returned, and any older events of the
+        same device, type and filter_id, are removed from the buffer.
+        """
+        streams = []
+        for stream in self._select(event_type, filter_id):
+            start = 0
+            if since is not None:
+                start = bisect_right(stream.times, since)
+            if start < len(stream.events) or (remove and start):
+                streams.append((stream, start))
+
+        timeIndex = DeviceEvent.EVENT_HUB_TIME_INDEX
+        taken = [0] * len(streams)
+        if len(streams) == 1:
+            stream, start = streams[0]
+            currentEvents = list(islice(_eventsFrom(stream.events, start),
+                                        max_events))
+            taken[0] = len(currentEvents)
+        else:
+            currentEvents = []
+            heap = []
+            for n, (stream, start) in enumerate(streams):
+                events = _eventsFrom(stream.events, start)
+                for event in events:
+                    heap.append((event[timeIndex], n, event, events))
+                    break
+            heapify(heap)
+            while heap and (max_events is None or
+                            len(currentEvents) < max_events):
+                _, n, event, events = heap[0]
+                currentEvents.append(event)
+                taken[n] += 1
+                for event in events:
+                    heapreplace(heap, (event[timeIndex], n, event, events))
+                    break
+                else:
+                    heappop(heap)
+
+        if remove:
+            for (stream, start), n in zip(streams, taken):
+                count = start + n
+                if count == len(stream.events):
+                    stream.events.clear()
+                    stream.times.clear()
+                else:
+                    for _ in range(count):
+                        stream.events.popleft()
+                        stream.times.popleft()
+        return currentEvents
+
+    def eventsByType(self):
+        """Return a dict of event type: tuple of the buffered events of that
+        type, oldest first.
+        """
+        types = set(etype for _, etype, _ in self._streams)
+        return {etype: tuple(self.get(etype)) for etype in types}
+
+    def clear(self, event_type=None, filter_id=None):
+        """Remove all events, or those of event_type and / or with
+        filter_id, from the buffer.
+        """
+        for stream in self._select(event_type, filter_id):
+            stream.events.clear()
+            stream.times.clear()
+
+    def droppedCount(self, event_type=None, filter_id=None):
+        """Return the number of events (of event_type and with filter_id if
+        they are given) dropped because their stream was full.
+        """
+        return sum(stream.dropped
+                   for stream in self._select(event_type, filter_id))
+
+    def __len__(self):
+        return sum(len(stream.events) for stream in self._streams.values())
+
+    def __iter__(self):
+        return iter(self.get())
+
+
 ########### Base Abstract Device that all other Devices inherit from ##########
 
 
@@ -288,7 +450,7 @@ class Device(ioObject):
         ioObject.__init__(self, *args, **kwargs)
 
         self._is_reporting_events = kwargs.get('auto_report_events', False)
-        self._iohub_event_buffer = dict()
+        self._iohub_event_buffer = DeviceEventBuffer(self.event_buffer_length)
         self._event_listeners = dict()
         self._configuration = kwargs
         self._last_poll_time = 0
@@ -337,6 +499,10 @@ class Device(ioObject):
 
             asType (str): Optional kwarg giving the object type to return events as. Valid values are 'namedtuple' (the default), 'dict', 'list', or 'object'.
 
+            since (float): Optional kwarg; only return events with an ioHub time later than this time. Older events are still removed from the device event buffer when clearEvents is True.
+
+            max_events (int): Optional kwarg; return at most this many events, the oldest first. When clearEvents is True, newer events are left in the device event buffer.
+
         Returns:
             (list): New events that the ioHub has received since the last getEvents() or clearEvents() call to the device. Events are ordered by the ioHub time of each event, older event at index 0. The event object type is determined by the asType parameter passed to the method. By default a namedtuple object is returned for each event.
 
@@ -354,40 +520,15 @@ class Device(ioObject):
             eventTypeID = kwargs.get('event_type_id', None)
             if eventTypeID is None:
                 eventTypeID = kwargs.get('event_type', None)
-        clearEvents = kwargs.get('clearEvents', True)
+        clearEvents = kwargs.get('clearEvents', clearEvents)
 
         filter_id = kwargs.get('filter_id', None)
 
-        currentEvents = []
-        if eventTypeID:
-            currentEvents = list(self._iohub_event_buffer.get(eventTypeID, []))
-
-            if filter_id:
-                currentEvents = [
-                    e for e in currentEvents if e[
-                        DeviceEvent.EVENT_FILTER_ID_INDEX] == filter_id]
-
-            if clearEvents is True and len(currentEvents) > 0:
-                self.clearEvents(
-                    eventTypeID,
-                    filter_id=filter_id,
-                    call_proc_events=False)
-        else:
-            if filter_id:
-                [currentEvents.extend([fe for fe in l if fe[
-                                      DeviceEvent.EVENT_FILTER_ID_INDEX] == filter_id]) for l in list(self._iohub_event_buffer.values())]
-            else:
-                [currentEvents.extend(l)
-                 for l in list(self._iohub_event_buffer.values())]
-
-            if clearEvents is True and len(currentEvents) > 0:
-                self.clearEvents(filter_id=filter_id, call_proc_events=False)
-
-        if len(currentEvents) > 0:
-            currentEvents = sorted(
-                currentEvents, key=itemgetter(
-                    DeviceEvent.EVENT_HUB_TIME_INDEX))
-        return currentEvents
+        return self._iohub_event_buffer.get(
+            eventTypeID or None, filter_id or None,
+            since=kwargs.get('since', None),
+            max_events=kwargs.get('max_events', None),
+            remove=clearEvents is True)
 
     def clearEvents(
             self,
@@ -410,24 +551,24 @@ class Device(ioObject):
         """
         if call_proc_events:
             self._iohub_server.processDeviceEvents()
+        self._iohub_event_buffer.clear(event_type or None, filter_id or None)
 
-        if event_type:
-            if filter_id:
-                event_que = self._iohub_event_buffer[event_type]
-                newque = deque([e for e in event_que if e[
-                               DeviceEvent.EVENT_FILTER_ID_INDEX] != filter_id], maxlen=self.event_buffer_length)
-                self._iohub_event_buffer[event_type] = newque
-            else:
-                self._iohub_event_buffer.setdefault(
-                    event_type, deque(maxlen=self.event_buffer_length)).clear()
-        else:
-            if filter_id:
-                for event_type, event_deque in list(self._iohub_event_buffer.items()):
-                    newque = deque([e for e in event_deque if e[
-                                   DeviceEvent.EVENT_FILTER_ID_INDEX] != filter_id], maxlen=self.event_buffer_length)
-                    self._iohub_event_buffer[event_type] = newque
-            else:
-                self._iohub_event_buffer.clear()
+    def getDroppedEventCount(self, event_type=None, filter_id=None):
+        """Returns the number of events the device event buffer has dropped
+        because it already held event_buffer_length events of the same type
+        (and filter_id). Dropped events can not be returned by getEvents().
+
+        Args:
+            event_type (int): Only count dropped events of this event type ID.
+
+            filter_id (int): Only count dropped events with this filter_id.
+
+        Returns:
+            (int): Number of events dropped.
+
+        """
+        return self._iohub_event_buffer.droppedCount(event_type or None,
+                                                     filter_id or None)
 
     def enableEventReporting(self, enabled=True):
         """
@@ -545,9 +686,7 @@ class Device(ioObject):
 
     def _handleEvent(self, e):
         event_type_id = e[DeviceEvent.EVENT_TYPE_ID_INDEX]
-        self._iohub_event_buffer.setdefault(
-            event_type_id, deque(
-                maxlen=self.event_buffer_length)).append(e)
+        self._iohub_event_buffer.append(e)
 
         # Add the event to any filters bound to the device which
         # list wanting the event's type and events filter_id
@@ -584,9 +723,7 @@ class Device(ioObject):
     def getCurrentDeviceState(self, clear_events=True):
         result_dict = {}
         self._iohub_server.processDeviceEvents()
-        events = {key: tuple(value)
-                  for key, value in list(self._iohub_event_buffer.items())}
-        result_dict['events'] = events
+        result_dict['events'] = self._iohub_event_buffer.eventsByType()
         if clear_events:
             self.clearEvents(call_proc_events=False)
 
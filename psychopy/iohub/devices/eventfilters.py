@@ -9,6 +9,7 @@ from past.builtins import basestring
 from builtins import object
 import numpy as np
 from collections import deque
+from heapq import heappush, heappop
 
 from ..util import NumPyRingBuffer
 from . import Device, DeviceEvent, Computer
@@ -204,19 +205,24 @@ class MovingWindowFilter(object):
 
         """
         if isinstance(event, (list, tuple)):
-            self._filtering_buffer.append(event[self._event_field_index])
+            self._addValue(event[self._event_field_index])
             self._events.append(event)
             if self.isFull():
+                filtered_value = self.filteredValue()
                 if self._inplace:
                     self._events[
                         self._active_index][
-                        self._event_field_index] = self.filteredValue()
-                return self._events[self._active_index], self.filteredValue()
+                        self._event_field_index] = filtered_value
+                return self._events[self._active_index], filtered_value
         else:
-            self._filtering_buffer.append(event)
+            self._addValue(event)
             if self.isFull():
                 return None, self.filteredValue()
 
+    def _addValue(self, value):
+        """Add value to the moving window."""
+        self._filtering_buffer.append(value)
+
     def isFull(self):
         return self._filtering_buffer.isFull()
 
@@ -334,6 +340,253 @@ class StampFilter(MovingWindowFilter):
 
 # ------
 
+
+class RunningWindowFilter(MovingWindowFilter):
+    """Base class for moving window filters that keep a running statistic of
+    the window, updated as each value enters and the oldest value leaves it,
+    so adding a value does not take time proportional to the window length.
+
+    Sub classes implement _updateStatistic(added, removed), where removed
+    is None until the window is full, _clearStatistic() and filteredValue().
+    Values are rounded to float32, as they are in a MovingWindowFilter
+    window, but the window is kept in a deque of floats, as single values
+    are slow to get from a NumPyRingBuffer.
+
+    Sub classes whose running statistic collects rounding errors also
+    implement _recalculateStatistic(elements), which is called in place of
+    _updateStatistic every RECALCULATE_INTERVAL values.
+    """
+    RECALCULATE_INTERVAL = None
+
+    def __init__(self, **kwargs):
+        MovingWindowFilter.__init__(self, **kwargs)
+        self._length = self._filtering_buffer.max_size
+        self._window = deque(maxlen=self._length)
+        self._since_recalculated = 0
+        self._clearStatistic()
+
+    def _addValue(self, value):
+        window = self._window
+        removed = window[0] if len(window) == self._length else None
+        added = float(np.float32(value))
+        window.append(added)
+        if removed is not None and self.RECALCULATE_INTERVAL:
+            self._since_recalculated += 1
+            if self._since_recalculated >= self.RECALCULATE_INTERVAL:
+                self._since_recalculated = 0
+                self._recalculateStatistic(np.array(window, np.float64))
+                return
+        self._updateStatistic(added, removed)
+
+    def isFull(self):
+        return len(self._window) == self._length
+
+    def _updateStatistic(self, added, removed):
+        raise RuntimeError(
+            '_updateStatistic method must be implemented by subclass.')
+
+    def _clearStatistic(self):
+        raise RuntimeError(
+            '_clearStatistic method must be implemented by subclass.')
+
+    def _recalculateStatistic(self, elements):
+        raise RuntimeError(
+            '_recalculateStatistic method must be implemented by subclass.')
+
+    def clear(self):
+        MovingWindowFilter.clear(self)
+        self._window.clear()
+        self._since_recalculated = 0
+        self._clearStatistic()
+
+# ------
+
+
+class RunningMeanFilter(RunningWindowFilter):
+    """Returns the average value of the moving window, as MovingWindowFilter
+    does, from a running sum of the window values.
+    """
+    RECALCULATE_INTERVAL = 4096
+
+    def _updateStatistic(self, added, removed):
+        if removed is None:
+            self._sum += added
+        else:
+            self._sum += added - removed
+
+    def _clearStatistic(self):
+        self._sum = 0.0
+
+    def _recalculateStatistic(self, elements):
+        self._sum = float(elements.sum())
+
+    def filteredValue(self):
+        return self._sum / self._length
+
+# ------
+
+
+class RunningMedianFilter(RunningWindowFilter):
+    """Returns the median value of the moving window, as MedianFilter does,
+    without sorting the window each time a value is added.
+
+    The window values are kept in two heaps: a max heap of the lower half
+    and a min heap of the upper half, so the median is at the top of the
+    heaps. Values leaving the window are only removed from a heap once they
+    reach its top, so adding a value takes O(log length) time.
+
+    For an even length the mean of the two middle values is returned.
+    """
+
+    def _clearStatistic(self):
+        self._low = []  # negated, so the largest is at the top
+        self._high = []
+        self._low_size = 0  # not counting values waiting to be removed
+        self._high_size = 0
+        self._removed = dict()  # value: number of copies waiting to be removed
+
+    def _prune(self, heap, sign):
+        removed = self._removed
+        while heap:
+            value = sign * heap[0]
+            count = removed.get(value)
+            if not count:
+                return
+            if count == 1:
+                del removed[value]
+            else:
+                removed[value] = count - 1
+            heappop(heap)
+
+    def _updateStatistic(self, added, removed):
+        low, high = self._low, self._high
+        if not low or added <= -low[0]:
+            heappush(low, -added)
+            self._low_size += 1
+        else:
+            heappush(high, added)
+            self._high_size += 1
+
+        if removed is not None:
+            self._removed[removed] = self._removed.get(removed, 0) + 1
+            if removed <= -low[0]:
+                self._low_size -= 1
+            else:
+                self._high_size -= 1
+            self._prune(low, -1)
+            self._prune(high, 1)
+
+        # keep the lower half the same size as the upper half, or one larger
+        if self._low_size > self._high_size + 1:
+            heappush(high, -heappop(low))
+            self._low_size -= 1
+            self._high_size += 1
+            self._prune(low, -1)
+        elif self._low_size < self._high_size:
+            heappush(low, -heappop(high))
+            self._low_size += 1
+            self._high_size -= 1
+            self._prune(high, 1)
+
+    def filteredValue(self):
+        if self._low_size > self._high_size:
+            return -self._low[0]
+        return (self._high[0] - self._low[0]) / 2.0
+
+# ------
+
+
+class LinearWeightedAverageFilter(RunningWindowFilter):
+    """Returns the weighted average of the moving window, with weights
+    length, length-1, ..., 1 from the value added last to the oldest value;
+    the same as a WeightedAverageFilter with weights=range(length, 0, -1).
+
+    Each value added lowers the weight of every value in the window by one,
+    so the weighted sum is updated from a running sum of the window values.
+    """
+    RECALCULATE_INTERVAL = 4096
+
+    def __init__(self, **kwargs):
+        RunningWindowFilter.__init__(self, **kwargs)
+        length = self._length
+        self._weights = np.arange(1, length + 1, dtype=np.float64)
+        self._weight_sum = length * (length + 1) / 2.0
+
+    def _updateStatistic(self, added, removed):
+        if removed is None:
+            self._count += 1
+            self._weighted_sum += self._count * added
+            self._sum += added
+        else:
+            # the oldest value had a weight of 1
+            self._weighted_sum += self._length * added - self._sum
+            self._sum += added - removed
+
+    def _clearStatistic(self):
+        self._count = 0
+        self._sum = 0.0
+        self._weighted_sum = 0.0
+
+    def _recalculateStatistic(self, elements):
+        self._sum = float(elements.sum())
+        self._weighted_sum = float(np.dot(self._weights, elements))
+
+    def filteredValue(self):
+        return self._weighted_sum / self._weight_sum
+
+# ------
+
+
+class TriangularWeightedAverageFilter(RunningWindowFilter):
+    """Returns the weighted average of the moving window, with weights
+    1, 2, ..., (length + 1) / 2, ..., 2, 1; the same as a
+    WeightedAverageFilter with those weights. Length must be odd.
+
+    The triangular weights are two moving averages of length (length + 1) / 2
+    one after the other, so the weighted sum is a running sum of the last
+    (length + 1) / 2 running sums of the last (length + 1) / 2 values.
+    """
+    RECALCULATE_INTERVAL = 4096
+
+    def __init__(self, **kwargs):
+        length = kwargs.get('length')
+        if length % 2 == 0:
+            raise ValueError(
+                'TriangularWeightedAverageFilter length must be odd.')
+        self._half_length = (length + 1) // 2
+        self._values = deque(maxlen=self._half_length)
+        self._sums = deque(maxlen=self._half_length)
+        RunningWindowFilter.__init__(self, **kwargs)
+
+    def _updateStatistic(self, added, removed):
+        half = self._half_length
+        if len(self._values) == half:
+            self._sum -= self._values[0]
+        self._values.append(added)
+        self._sum += added
+        if len(self._sums) == half:
+            self._weighted_sum -= self._sums[0]
+        self._sums.append(self._sum)
+        self._weighted_sum += self._sum
+
+    def _clearStatistic(self):
+        self._sum = 0.0
+        self._weighted_sum = 0.0
+        self._values.clear()
+        self._sums.clear()
+
+    def _recalculateStatistic(self, elements):
+        half = self._half_length
+        sums = np.convolve(elements, np.ones(half), 'valid')
+        self._values.extend(elements[-half:].tolist())
+        self._sums.extend(sums.tolist())
+        self._sum = float(sums[-1])
+        self._weighted_sum = float(sums.sum())
+
+    def filteredValue(self):
+        return self._weighted_sum / (self._half_length * self._half_length)
+
+
 #################### TEST ###############################
 
 if __name__ == '__main__':
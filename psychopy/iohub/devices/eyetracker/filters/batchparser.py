@@ -0,0 +1,767 @@
+# -*- coding: utf-8 -*-
+# Part of the psychopy.iohub library.
+# Copyright (C) 2012-2016 iSolver Software Solutions
+# Distributed under the terms of the GNU General Public License (GPL).
+"""
+ioHub Eye Tracker Offline Sample Event Parser
+
+Parses stored MonocularEyeSampleEvent or BinocularEyeSampleEvent data into
+fixation, saccade and blink events, for example to re-parse a recording with
+different filter or threshold settings. The same steps are used as by the
+online EyeTrackerEventParser (see parser.py), but each is done for a whole
+array of samples at once rather than one sample at a time:
+
+* binocular samples are converted to monocular samples (averaging the eyes
+  when both have valid data) and gaze positions to visual angles;
+* runs of missing samples between two valid samples are linearly
+  interpolated;
+* x, y and xy velocities are calculated from the (unfiltered) angles;
+* the position and velocity moving window filters are applied;
+* adaptive velocity thresholds are found from the last
+  adaptive_vel_thresh_history seconds of non zero velocities;
+* each sample is categorised as fixation, saccade or missing data, and an
+  event is ended and another started each time the category changes.
+
+Samples are parsed in chunks. Everything the online parser keeps from one
+sample to the next (filter windows, velocity history, the open event, ...)
+is carried over from one chunk to the next, so the events found do not
+depend on the chunk size, and memory use is bounded by it.
+
+Events are returned as numpy arrays of the NUMPY_DTYPE of each eye event
+class, holding the values the online parser gives each event. Their
+event_id values, which the online parser gets from the ioHub Server, are
+numbered from 1 in the order the online parser would output the events.
+
+Differences from the online parser:
+
+* When the position filter has a longer delay than the velocity filter,
+  samples are output once their positions have been filtered.
+* Velocities of the sample following interpolated data are calculated from
+  the last interpolated sample whatever the filter delays.
+* StampFilter leaves the middle of three monotonic values unchanged, as
+  described in parser.py.
+
+Example:
+
+    parser = BatchEyeEventParser(
+        display_device=dict(mm_size=dict(width=500, height=281),
+                            pixel_res=(1920, 1080), eye_distance=550),
+        sampling_rate=1000,
+        position_filter=dict(name='MedianFilter', length=3,
+                             knot_pos='center'))
+    events = parser.parse('events.hdf5')
+    fixation_ends = events[EventConstants.FIXATION_END]
+"""
+from __future__ import division, absolute_import
+
+from past.builtins import basestring
+from builtins import object
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from ....constants import EventConstants
+from ....util.visualangle import VisualAngleCalc
+from ..eye_events import (MonocularEyeSampleEvent, FixationStartEvent,
+                          FixationEndEvent, SaccadeStartEvent,
+                          SaccadeEndEvent, BlinkStartEvent, BlinkEndEvent)
+from .parser import PARSER_FILTER_ID, LEFT_EYE
+
+MONOCULAR_EYE_SAMPLE = EventConstants.MONOCULAR_EYE_SAMPLE
+
+# Sample categories
+FIX = 1
+SAC = 2
+MIS = 3
+
+START_EVENT_CLASSES = {FIX: FixationStartEvent, SAC: SaccadeStartEvent,
+                       MIS: BlinkStartEvent}
+END_EVENT_CLASSES = {FIX: FixationEndEvent, SAC: SaccadeEndEvent,
+                     MIS: BlinkEndEvent}
+EVENT_CLASSES = (FixationStartEvent, FixationEndEvent, SaccadeStartEvent,
+                 SaccadeEndEvent, BlinkStartEvent, BlinkEndEvent)
+
+# Paths of the eye sample tables in an ioDataStore file
+SAMPLE_TABLE_PATHS = ('/data_collection/events/eyetracker/BinocularEyeSampleEvent',
+                      '/data_collection/events/eyetracker/MonocularEyeSampleEvent')
+
+ANGLE_FIELDS = ('angle_x', 'angle_y')
+VELOCITY_FIELDS = ('velocity_x', 'velocity_y', 'velocity_xy')
+INTERPOLATED_FIELDS = ('angle_x', 'angle_y', 'pupil_measure1')
+# sample fields copied into the event header of every eye event
+HEADER_FIELDS = ('experiment_id', 'session_id', 'device_id', 'device_time',
+                 'logged_time', 'time', 'eye', 'status')
+# sample fields copied to start events, and to the start_ / end_ fields of
+# end events
+EVENT_SAMPLE_FIELDS = ('gaze_x', 'gaze_y', 'angle_x', 'angle_y', 'raw_x',
+                       'raw_y', 'pupil_measure1', 'pupil_measure1_type',
+                       'velocity_x', 'velocity_y', 'velocity_xy')
+AVERAGED_FIELDS = ('gaze_x', 'gaze_y', 'pupil_measure1') + VELOCITY_FIELDS
+
+# Samples are processed with all float fields held as float64, as the online
+# parser keeps them as python floats.
+SAMPLE_DTYPE = np.dtype([(name, 'f8' if dt.kind == 'f' else dt)
+                         for name, dt in
+                         [(n, MonocularEyeSampleEvent.NUMPY_DTYPE[n])
+                          for n in MonocularEyeSampleEvent.NUMPY_DTYPE.names]])
+
+
+def _windows(values, length):
+    """Return a read only (len(values) - length + 1, length) view of the
+    moving windows of a 1D array.
+    """
+    stride = values.strides[0]
+    return as_strided(values, (max(len(values) - length + 1, 0), length),
+                      (stride, stride), writeable=False)
+
+
+class WindowFilter(object):
+    """Applies one of the eventfilters moving window field filters to every
+    window of an array at once.
+
+    `settings` is a POSITION_FILTER or VELOCITY_FILTER dict, i.e. the filter
+    class name as 'name' plus the arguments for the filter class.
+    PassThroughFilter, MovingWindowFilter, MedianFilter,
+    WeightedAverageFilter and StampFilter are supported, as are the running
+    statistic versions of the moving window filters (RunningMeanFilter,
+    RunningMedianFilter, LinearWeightedAverageFilter and
+    TriangularWeightedAverageFilter).
+
+    length is the number of samples in the filter window, knot the index of
+    the filtered sample within it, and delay the number of samples
+    following the filtered sample in the window.
+    """
+
+    def __init__(self, settings=None):
+        settings = dict(settings or {})
+        self.name = settings.pop('name', 'PassThroughFilter')
+        knot_pos = settings.get('knot_pos', 'center')
+        if self.name == 'PassThroughFilter':
+            length, knot_pos = 1, 0
+        elif self.name == 'StampFilter':
+            self._level = settings.get('level', 1)
+            length, knot_pos = 2 * self._level + 1, self._level
+        elif self.name == 'WeightedAverageFilter':
+            weights = np.asarray(settings.get('weights'), dtype=np.float64)
+            length = len(weights)
+            # np.convolve, as used by the online filter, reverses the weights
+            self._weights = (weights / np.sum(weights))[::-1]
+        elif self.name in ('LinearWeightedAverageFilter',
+                           'TriangularWeightedAverageFilter'):
+            length = settings.get('length')
+            if self.name == 'LinearWeightedAverageFilter':
+                weights = np.arange(1, length + 1, dtype=np.float64)
+            elif length % 2 == 0:
+                raise ValueError(
+                    'TriangularWeightedAverageFilter length must be odd.')
+            else:
+                weights = np.minimum(np.arange(1, length + 1),
+                                     np.arange(length, 0, -1))
+                weights = weights.astype(np.float64)
+            self._weights = weights / np.sum(weights)
+        elif self.name in ('MovingWindowFilter', 'MedianFilter',
+                           'RunningMeanFilter', 'RunningMedianFilter'):
+            length = settings.get('length')
+        else:
+            raise ValueError(
+                'Filter %s can not be used for batch parsing.' % self.name)
+
+        if isinstance(knot_pos, basestring):
+            if knot_pos == 'center' and length % 2 == 0:
+                raise ValueError(
+                    'MovingWindow length must be odd for a centered knot_pos.')
+            knot = dict(center=length // 2, latest=0,
+                        oldest=length - 1).get(knot_pos)
+            if knot is None:
+                raise ValueError(
+                    "MovingWindow knot_pos must be an index between 0 - length-1, or a string constantin ['center','latest','oldest']")
+        elif knot_pos < 0 or knot_pos >= length:
+            raise ValueError(
+                'MovingWindow knot_pos must be between 0 and length-1.')
+        else:
+            knot = knot_pos
+        self.length = length
+        self.knot = knot
+        self.delay = length - 1 - knot
+
+    def apply(self, windows):
+        """Return the filtered value of each row of `windows`.
+        """
+        if self.name == 'PassThroughFilter':
+            return windows[:, 0]
+        if self.name in ('MovingWindowFilter', 'RunningMeanFilter'):
+            return windows.mean(axis=1)
+        if self.name in ('MedianFilter', 'RunningMedianFilter'):
+            return np.median(windows, axis=1)
+        if self.name != 'StampFilter':
+            return windows.dot(self._weights)
+        # StampFilter: each level replaces the middle of each three values
+        # by the mean of its neighbours unless the three are monotonic
+        values = windows
+        for _ in range(self._level):
+            v1, v2, v3 = values[:, :-2], values[:, 1:-1], values[:, 2:]
+            monotonic = ((v1 < v2) & (v2 < v3)) | ((v3 < v2) & (v2 < v1))
+            values = np.where(monotonic, v2, (v1 + v3) / 2.0)
+        return values[:, 0]
+
+
+def adaptiveVelocityThresholds(velocities, length):
+    """Return the adaptive velocity threshold for each window of `length`
+    consecutive values of `velocities`, as
+    EyeTrackerEventParser.addVelocityToAdaptiveThreshold finds it:
+
+    PT = min + 3 * std of the window, then repeatedly
+    PT = mean + 3 * std of the window values below PT, until PT changes
+    by less than 1.
+
+    Windows are handled in blocks of consecutive windows, which all share
+    the values in the middle of the block's span. Those are sorted once,
+    so the count, sum and sum of squares of the shared values below a
+    threshold are found with a binary search, leaving only the few values
+    each window does not share to be compared with its threshold.
+    """
+    velocities = np.asarray(velocities, dtype=np.float64)
+    nWindows = max(len(velocities) - length + 1, 0)
+    thresholds = np.empty(nWindows)
+    block = max(1, min(length, int(np.sqrt(length * np.log2(length + 1)))))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for first in range(0, nWindows, block):
+            k = min(block, nWindows - first)
+            shared = np.sort(velocities[first + k - 1:first + length])
+            sharedSum = np.concatenate(([0.0], np.cumsum(shared)))
+            sharedSquares = np.concatenate(([0.0], np.cumsum(shared * shared)))
+            # window i also has the k - 1 - i values before the shared ones
+            # and the i values after them
+            i = np.arange(k)[:, None]
+            c = np.arange(k - 1)[None, :]
+            nBefore = k - 1 - i
+            extra = velocities[np.where(c < nBefore, first + i + c,
+                                        first + length + c - nBefore)]
+            extraSquares = extra * extra
+
+            total = sharedSum[-1] + extra.sum(axis=1)
+            mean = total / length
+            variance = (sharedSquares[-1] + extraSquares.sum(axis=1)) / \
+                length - mean * mean
+            pt = (np.minimum(shared[0], extra.min(axis=1, initial=np.inf)) +
+                  np.sqrt(np.maximum(variance, 0.0)) * 3.0)
+            rows = np.arange(k)
+            while len(rows):
+                rowPT = pt[rows]
+                nShared = np.searchsorted(shared, rowPT)
+                below = extra[rows] < rowPT[:, None]
+                count = nShared + below.sum(axis=1)
+                mean = (sharedSum[nShared] +
+                        np.where(below, extra[rows], 0.0).sum(axis=1)) / count
+                variance = (sharedSquares[nShared] +
+                            np.where(below, extraSquares[rows], 0.0).sum(
+                                axis=1)) / count - mean * mean
+                newPT = mean + 3.0 * np.sqrt(np.maximum(variance, 0.0))
+                change = np.abs(newPT - rowPT)
+                pt[rows] = newPT
+                # NaN thresholds (no values below PT) also stop here
+                rows = rows[change >= 1.0]
+            thresholds[first:first + k] = pt
+    return thresholds
+
+
+class BatchEyeEventParser(object):
+    """Parses arrays of eye samples into eye events, in chunks.
+
+    Takes the same settings as EyeTrackerEventParser: display_device (a
+    dict with mm_size, pixel_res and eye_distance), sampling_rate,
+    position_filter, velocity_filter and adaptive_vel_thresh_history.
+    chunk_size is the number of samples parse() reads and parses at a time.
+
+    parse() parses a whole recording. To parse samples as they are read
+    from somewhere else, call parseChunk() with each array of consecutive
+    samples from one session, and reset() before starting on another.
+    """
+
+    def __init__(self, display_device, sampling_rate, position_filter=None,
+                 velocity_filter=None, adaptive_vel_thresh_history=3.0,
+                 chunk_size=65536):
+        self.positionFilter = WindowFilter(position_filter)
+        self.velocityFilter = WindowFilter(velocity_filter)
+        self.velocityHistoryLength = int(adaptive_vel_thresh_history *
+                                         sampling_rate)
+        self.chunk_size = chunk_size
+
+        mm_size = display_device.get('mm_size')
+        if mm_size:
+            mm_size = mm_size['width'], mm_size['height'],
+        self.visual_angle_calc = VisualAngleCalc(
+            mm_size, display_device.get('pixel_res'),
+            display_device.get('eye_distance'))
+        self.pix2deg = self.visual_angle_calc.pix2deg
+        self.reset()
+
+    def reset(self):
+        """Forget all samples parsed so far and start numbering events
+        from 1 again.
+        """
+        self._resetSamples()
+        self._nextEventID = 1
+
+    def _resetSamples(self):
+        self._binocular = None
+        # interpolation and velocity
+        self._lastRaw = None
+        self._lastProcessed = None
+        self._missing = None
+        self._angleHistory = np.empty((0, 2))
+        self._processedCount = 0
+        # filters
+        self._filterTail = None
+        self._filterTailStart = 0
+        self._nextOutput = 0
+        # adaptive thresholds
+        self._velocityHistory = [np.empty(0), np.empty(0)]
+        self._velocityCounts = [0, 0]
+        # event parsing
+        self._category = None
+        self._lastParsed = None
+        self._runStart = None
+        self._runCount = 0
+        self._runSums = dict((name, 0.0) for name in AVERAGED_FIELDS)
+        self._runPeaks = dict((name, -np.inf) for name in VELOCITY_FIELDS)
+
+    def parse(self, samples, table_path=None):
+        """Parse all the eye samples in `samples` and return a dict of the
+        events found, with an array for each eye event type id.
+
+        `samples` can be a numpy array or PyTables table of
+        MonocularEyeSampleEvent or BinocularEyeSampleEvent records, or the
+        path of an ioDataStore file, in which case the eye sample table is
+        read from it (the one at `table_path` if given). Samples are read in
+        chunks of chunk_size. Each session in the samples is parsed
+        separately.
+        """
+        if isinstance(samples, basestring):
+            from ....datastore.util import open_file
+            hubFile = open_file(samples, 'r')
+            try:
+                return self.parse(self._getSampleTable(hubFile, table_path))
+            finally:
+                hubFile.close()
+
+        self.reset()
+        events = dict((eventClass.EVENT_TYPE_ID, [])
+                      for eventClass in EVENT_CLASSES)
+        session = None
+        for chunkStart in range(0, len(samples), self.chunk_size):
+            chunk = samples[chunkStart:chunkStart + self.chunk_size]
+            ids = np.stack((chunk['experiment_id'], chunk['session_id']),
+                           axis=1)
+            # indexes where a new session starts
+            splits = np.flatnonzero((ids[1:] != ids[:-1]).any(axis=1)) + 1
+            if session is not None and tuple(ids[0]) != session:
+                splits = np.concatenate(([0], splits))
+            partStart = 0
+            for split in list(splits) + [len(chunk)]:
+                if split == partStart and split < len(chunk):
+                    self._resetSamples()
+                    continue
+                for typeID, found in self.parseChunk(
+                        chunk[partStart:split]).items():
+                    events[typeID].append(found)
+                if split < len(chunk):
+                    self._resetSamples()
+                partStart = split
+            session = tuple(ids[-1])
+
+        for eventClass in EVENT_CLASSES:
+            found = events[eventClass.EVENT_TYPE_ID]
+            events[eventClass.EVENT_TYPE_ID] = (
+                np.concatenate(found) if found else
+                np.zeros(0, eventClass.NUMPY_DTYPE))
+        return events
+
+    def _getSampleTable(self, hubFile, table_path=None):
+        from tables import NoSuchNodeError
+        from ....datastore.util import get_node
+        for path in ((table_path,) if table_path else SAMPLE_TABLE_PATHS):
+            try:
+                table = getattr(hubFile, get_node)(path)
+            except NoSuchNodeError:
+                continue
+            if table.nrows or table_path:
+                return table
+        raise ValueError('No eye sample events were found in %s' %
+                         hubFile.filename)
+
+    def parseChunk(self, samples):
+        """Parse the next array of samples from a session and return a dict
+        of the events that were completed by them, with an array for each
+        eye event type id.
+        """
+        if self._binocular is None:
+            self._binocular = 'left_gaze_x' in samples.dtype.names
+        processed = self._processSamples(self._toMonocular(samples))
+        filtered, atValid = self._filterSamples(processed)
+        self._addVelocityThresholds(filtered, atValid)
+        return self._parseEvents(filtered)
+
+    def _isValid(self, status):
+        if self._binocular:
+            return status != 22
+        return status == 0
+
+    def _toMonocular(self, samples):
+        """Return the samples as a SAMPLE_DTYPE array; binocular samples are
+        averaged as in EyeTrackerEventParser._convertToMonoAveraged.
+        """
+        mono = np.zeros(len(samples), SAMPLE_DTYPE)
+        names = samples.dtype.names
+        if not self._binocular:
+            for name in SAMPLE_DTYPE.names:
+                mono[name] = samples[name]
+            return mono
+
+        status = samples['status']
+        for name in SAMPLE_DTYPE.names:
+            if name in names:
+                mono[name] = samples[name]
+            elif name == 'eye':
+                mono[name] = LEFT_EYE
+            elif name.endswith('_type'):
+                mono[name] = samples['left_%s' % (name)]
+            else:
+                left = samples['left_%s' % (name)].astype(np.float64)
+                right = samples['right_%s' % (name)].astype(np.float64)
+                # only right eye data when status is 20; otherwise the left
+                # eye data is used, even when both are missing
+                mono[name] = np.where(status == 0, (left + right) / 2.0,
+                                      np.where(status == 20, right, left))
+        mono['type'] = MONOCULAR_EYE_SAMPLE
+        return mono
+
+    def _processSamples(self, samples):
+        """Convert valid sample positions to angles, interpolate missing data
+        runs that are followed by a valid sample and add velocities.
+
+        Returns the samples ready to be filtered. Samples before the first
+        valid sample are dropped, and missing data at the end of the chunk
+        is kept until the next valid sample arrives.
+        """
+        lastRaw = samples[-1:].copy() if len(samples) else self._lastRaw
+        valid = self._isValid(samples['status'])
+        if valid.any():
+            samples['angle_x'][valid], samples['angle_y'][valid] = \
+                self.pix2deg(samples['gaze_x'][valid],
+                             samples['gaze_y'][valid])
+
+        previous = self._lastProcessed
+        if self._missing is not None and len(self._missing):
+            samples = np.concatenate((self._missing, samples))
+            valid = np.concatenate((np.zeros(len(self._missing), bool),
+                                    valid))
+        validIndex = np.flatnonzero(valid)
+        if previous is None:
+            if len(validIndex) == 0:
+                self._lastRaw = lastRaw
+                return samples[:0]
+            # velocities of the first valid sample are from the sample
+            # before it, as in the online parser
+            first = validIndex[0]
+            previousRaw = samples[first - 1:first] if first else self._lastRaw
+            samples, valid = samples[first:], valid[first:]
+            validIndex = validIndex - first
+        elif len(validIndex) == 0:
+            self._missing = samples
+            self._lastRaw = lastRaw
+            return samples[:0]
+        last = validIndex[-1]
+        self._missing = samples[last + 1:].copy()
+        samples, valid = samples[:last + 1].copy(), valid[:last + 1]
+        self._lastRaw = lastRaw
+
+        # the angles of the last samples processed, then of these
+        history = self._angleHistory
+        h = len(history)
+        firstIndex = self._processedCount - h
+        angles = np.concatenate((history, np.stack(
+            (samples['angle_x'], samples['angle_y']), axis=1)))
+
+        # linearly interpolate each missing data run, from the sample
+        # before it (as the filters left it) to the valid sample after it
+        change = np.diff(np.concatenate(([0], (~valid).astype(np.int8), [0])))
+        for start, end in zip(np.flatnonzero(change == 1),
+                              np.flatnonzero(change == -1)):
+            num = end - start + 2
+            before = self._addedAngles(angles, np.array([h + start - 1]),
+                                       firstIndex)[0]
+            for axis in (0, 1):
+                angles[h + start:h + end, axis] = np.linspace(
+                    before[axis], angles[h + end, axis], num)[1:-1]
+            pupil = samples['pupil_measure1']
+            pupilBefore = pupil[start - 1] if start else \
+                previous['pupil_measure1'][0]
+            pupil[start:end] = np.linspace(pupilBefore, pupil[end], num)[1:-1]
+        samples['angle_x'] = angles[h:, 0]
+        samples['angle_y'] = angles[h:, 1]
+
+        n = len(samples)
+        rows = slice(None)
+        beforeAngles = self._addedAngles(angles, np.arange(h - 1, h + n - 1),
+                                         firstIndex)
+        beforeTimes = np.concatenate((samples['time'][:1], samples['time'][:-1]))
+        if h:
+            beforeTimes[0] = previous['time'][0]
+        elif previousRaw is not None:
+            # the first sample processed; as in the online parser, its
+            # velocities are from the (missing data) sample before it
+            beforeAngles[0] = previousRaw['angle_x'][0], previousRaw['angle_y'][0]
+            beforeTimes[0] = previousRaw['time'][0]
+        else:
+            rows = slice(1, None)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dt = (samples['time'] - beforeTimes)[rows]
+            vx = np.abs(angles[h:, 0] - beforeAngles[:, 0])[rows] / dt
+            vy = np.abs(angles[h:, 1] - beforeAngles[:, 1])[rows] / dt
+            samples['velocity_x'][rows] = vx
+            samples['velocity_y'][rows] = vy
+            samples['velocity_xy'][rows] = np.hypot(vx, vy)
+
+        self._angleHistory = angles[-self.positionFilter.length:].copy()
+        self._processedCount += n
+        self._lastProcessed = samples[-1:].copy()
+        return samples
+
+    def _addedAngles(self, angles, rows, firstIndex):
+        """Return the angles of the given rows of `angles` as they are once
+        the samples have been added to the online parser's filters: a
+        position filter with no delay replaces a sample's angles with their
+        filtered (float32) values as the sample is added.
+
+        Rows before the first are returned as is.
+        """
+        values = angles[np.maximum(rows, 0)]
+        positionFilter = self.positionFilter
+        if positionFilter.delay == 0:
+            full = np.flatnonzero((rows >= 0) &
+                                  (firstIndex + rows >= positionFilter.knot))
+            if len(full):
+                windows = rows[full][:, None] + np.arange(
+                    1 - positionFilter.length, 1)
+                for axis in (0, 1):
+                    values[full, axis] = positionFilter.apply(
+                        angles[windows, axis].astype(np.float32))
+        return values
+
+    def _filterSamples(self, samples):
+        """Apply the position and velocity filters to the processed samples.
+
+        Returns the samples output by the filters so far, and for each,
+        whether it was output when a valid sample was added to the filters
+        (only those samples get adaptive velocity thresholds).
+        """
+        positionFilter, velocityFilter = self.positionFilter, self.velocityFilter
+        if self._filterTail is not None and len(self._filterTail):
+            samples = np.concatenate((self._filterTail, samples))
+        start = self._filterTailStart
+        end = start + len(samples)
+        # [first, stop) are the stream indexes of the samples output now
+        first = max(self._nextOutput, velocityFilter.knot)
+        stop = end - max(positionFilter.delay, velocityFilter.delay)
+        if stop > first:
+            output = samples[first - start:stop - start].copy()
+            for name in VELOCITY_FIELDS:
+                windows = _windows(samples[name].astype(np.float32),
+                                   velocityFilter.length)
+                output[name] = velocityFilter.apply(
+                    windows[first - velocityFilter.knot - start:
+                            stop - velocityFilter.knot - start])
+            # samples before the position filter's knot are never filtered
+            positionFirst = max(first, positionFilter.knot)
+            if stop > positionFirst:
+                for name in ANGLE_FIELDS:
+                    windows = _windows(samples[name].astype(np.float32),
+                                       positionFilter.length)
+                    output[name][positionFirst - first:] = positionFilter.apply(
+                        windows[positionFirst - positionFilter.knot - start:
+                                stop - positionFilter.knot - start])
+            atValid = self._isValid(
+                samples['status'][first + velocityFilter.delay - start:
+                                  stop + velocityFilter.delay - start])
+            self._nextOutput = stop
+        else:
+            output = samples[:0]
+            atValid = np.zeros(0, bool)
+        # keep the samples that are in the windows of those output next
+        tailStart = max(start, self._nextOutput -
+                        max(positionFilter.knot, velocityFilter.knot))
+        self._filterTail = samples[tailStart - start:].copy()
+        self._filterTailStart = tailStart
+        return output, atValid
+
+    def _addVelocityThresholds(self, samples, atValid):
+        """Store the adaptive x and y velocity thresholds in the raw_x and
+        raw_y fields, as the online parser does.
+        """
+        rows = np.flatnonzero(atValid)
+        length = self.velocityHistoryLength
+        for axis, (velocityField, thresholdField) in enumerate(
+                (('velocity_x', 'raw_x'), ('velocity_y', 'raw_y'))):
+            velocities = samples[velocityField][rows]
+            # only velocities > 0 are added to the history, and a threshold
+            # is given once the history is full
+            positive = velocities > 0.0
+            added = velocities[positive]
+            history = np.concatenate((self._velocityHistory[axis], added))
+            count = self._velocityCounts[axis]
+            full = np.flatnonzero(count + np.arange(len(added)) >= length)
+            addedThresholds = np.full(len(added), np.nan)
+            if len(full):
+                # windows of the history ending at each of the full values
+                start = len(history) - len(added) + full[0] - length + 1
+                addedThresholds[full] = adaptiveVelocityThresholds(
+                    history[start:], length)
+            thresholds = np.full(len(rows), np.nan)
+            thresholds[positive] = addedThresholds
+            samples[thresholdField][rows] = thresholds
+            self._velocityHistory[axis] = history[-length:].copy()
+            self._velocityCounts[axis] = count + len(added)
+
+    def _parseEvents(self, samples):
+        """Categorise the filtered samples and create the events started and
+        ended by changes in category.
+        """
+        events = dict((eventClass.EVENT_TYPE_ID, []) for eventClass in
+                      EVENT_CLASSES)
+        n = len(samples)
+        if n:
+            with np.errstate(invalid='ignore'):
+                saccade = ((samples['velocity_x'] >= samples['raw_x']) |
+                           (samples['velocity_y'] >= samples['raw_y']))
+            category = np.where(self._isValid(samples['status']),
+                                np.where(saccade, SAC, FIX), MIS)
+            previous = np.empty_like(category)
+            previous[1:] = category[:-1]
+            previous[0] = category[0] if self._category is None else \
+                self._category
+            starts = np.flatnonzero(category != previous)
+            self._addEvents(samples, category, starts, events)
+
+        for eventClass in EVENT_CLASSES:
+            found = events[eventClass.EVENT_TYPE_ID]
+            events[eventClass.EVENT_TYPE_ID] = (
+                np.concatenate(found) if found else
+                np.zeros(0, eventClass.NUMPY_DTYPE))
+        return events
+
+    def _addEvents(self, samples, category, starts, events):
+        n = len(samples)
+        # runs of samples of one category: the one carried over from the
+        # last chunk (possibly empty here) and then one per start
+        bounds = np.concatenate(([0], starts, [n]))
+        runStarts, runEnds = bounds[:-1], bounds[1:]
+        counts = runEnds - runStarts
+        nonEmpty = np.flatnonzero(counts)
+        sums = dict()
+        for name in AVERAGED_FIELDS:
+            sums[name] = np.zeros(len(runStarts))
+            sums[name][nonEmpty] = np.add.reduceat(samples[name],
+                                                   runStarts[nonEmpty])
+            sums[name][0] += self._runSums[name]
+        peaks = dict()
+        for name in VELOCITY_FIELDS:
+            peaks[name] = np.full(len(runStarts), -np.inf)
+            peaks[name][nonEmpty] = np.maximum.reduceat(samples[name],
+                                                        runStarts[nonEmpty])
+            peaks[name][0] = max(peaks[name][0], self._runPeaks[name])
+        counts[0] += self._runCount
+        runCategory = category[np.minimum(runStarts, n - 1)]
+        if len(starts) and starts[0] == 0:
+            runCategory[0] = self._category
+
+        # every run but the last is ended by a start; the run carried over
+        # has no start event if it began with the first sample parsed
+        nEnded = len(starts)
+        ended = np.ones(nEnded, bool)
+        if nEnded and self._runStart is None:
+            ended[0] = False
+        if self._lastParsed is not None:
+            withLast = np.concatenate((self._lastParsed, samples))
+            endRows = withLast[runEnds[:nEnded]]
+        else:
+            endRows = samples[runEnds[:nEnded] - 1]
+        startRows = samples[starts]
+        if self._runStart is not None:
+            runStartRows = np.concatenate((self._runStart, startRows))
+        else:
+            runStartRows = np.concatenate((samples[:1], startRows))
+
+        # the online parser outputs each end event before the start event
+        # of the new run
+        endIDs = self._nextEventID + np.cumsum(ended + 1) - ended - 1
+        startIDs = endIDs + ended
+        self._nextEventID += nEnded + int(ended.sum())
+
+        for cat in (FIX, SAC, MIS):
+            isStart = category[starts] == cat
+            if isStart.any():
+                events[START_EVENT_CLASSES[cat].EVENT_TYPE_ID].append(
+                    self._startEvents(cat, startRows[isStart],
+                                      startIDs[isStart]))
+            isEnd = ended & (runCategory[:nEnded] == cat)
+            if isEnd.any():
+                ends = np.flatnonzero(isEnd)
+                events[END_EVENT_CLASSES[cat].EVENT_TYPE_ID].append(
+                    self._endEvents(cat, endRows[ends], runStartRows[ends],
+                                    endIDs[ends],
+                                    dict((k, v[ends]) for k, v in sums.items()),
+                                    dict((k, v[ends]) for k, v in peaks.items()),
+                                    counts[ends]))
+
+        # carry the run still open over to the next chunk
+        if nEnded:
+            self._runStart = samples[starts[-1]:starts[-1] + 1].copy()
+        self._runCount = counts[-1]
+        self._runSums = dict((k, v[-1]) for k, v in sums.items())
+        self._runPeaks = dict((k, v[-1]) for k, v in peaks.items())
+        self._category = category[-1]
+        self._lastParsed = samples[-1:].copy()
+
+    def _eventHeaders(self, eventClass, samples, eventIDs):
+        events = np.zeros(len(samples), eventClass.NUMPY_DTYPE)
+        for name in HEADER_FIELDS:
+            events[name] = samples[name]
+        events['event_id'] = eventIDs
+        events['type'] = eventClass.EVENT_TYPE_ID
+        events['filter_id'] = PARSER_FILTER_ID
+        return events
+
+    def _startEvents(self, cat, samples, eventIDs):
+        events = self._eventHeaders(START_EVENT_CLASSES[cat], samples,
+                                    eventIDs)
+        if cat != MIS:
+            for name in EVENT_SAMPLE_FIELDS:
+                events[name] = samples[name]
+        return events
+
+    def _endEvents(self, cat, samples, startSamples, eventIDs, sums, peaks,
+                   counts):
+        events = self._eventHeaders(END_EVENT_CLASSES[cat], samples, eventIDs)
+        events['duration'] = samples['time'] - startSamples['time']
+        if cat == MIS:
+            return events
+
+        for name in EVENT_SAMPLE_FIELDS:
+            events['start_%s' % (name)] = startSamples[name]
+            events['end_%s' % (name)] = samples[name]
+        for name in VELOCITY_FIELDS:
+            events['average_%s' % (name)] = sums[name] / counts
+            events['peak_%s' % (name)] = peaks[name]
+        if cat == FIX:
+            events['average_gaze_x'] = sums['gaze_x'] / counts
+            events['average_gaze_y'] = sums['gaze_y'] / counts
+            events['average_pupil_measure1'] = sums['pupil_measure1'] / counts
+            events['average_pupil_measure1_type'] = samples[
+                'pupil_measure1_type']
+        else:
+            xDiff = samples['gaze_x'] - startSamples['gaze_x']
+            yDiff = samples['gaze_y'] - startSamples['gaze_y']
+            events['amplitude_x'] = xDiff
+            events['amplitude_y'] = yDiff
+            events['angle'] = np.rad2deg(np.arctan2(yDiff, xDiff))
+        return events
@@ -109,6 +109,26 @@ is 1, the same as using 'center' in this case. The filtered sample index will
 count toward 1/2 the weighted average, with the previous and next samples
 contributing 1/4 of the weighted average each.
 
+Running statistic filters
+--------------------------
+
+eventfilters.RunningMeanFilter, eventfilters.RunningMedianFilter,
+eventfilters.LinearWeightedAverageFilter and
+eventfilters.TriangularWeightedAverageFilter return the same values as a
+MovingWindowFilter, a MedianFilter and a WeightedAverageFilter with linear
+(length, ..., 2, 1) or triangular (1, 2, ..., 2, 1) weights, but update their
+value as each sample enters the window instead of recalculating it from the
+whole window, so they stay fast for long windows and high sampling rates.
+
+Parameters:
+    * length: The number of samples in the moving window. Must be odd for the
+              TriangularWeightedAverageFilter.
+    * knot_pos: As for the MovingWindowFilter.
+
+Example:
+
+POSITION_FILTER = eventfilters.RunningMedianFilter, {length: 21, knot_pos: 'center'}
+
 eventfilters.StampFilter
 --------------------------
 
@@ -131,6 +151,7 @@ Data is filtered once, similar to what a 'normal' filter level would be in the
   eyelink<tm> system. Level = 2 would be similar to the 'extra' filter level
   setting of eyelink<tm>.
 """
+import numpy as np
 from ....constants import EventConstants
 from ....errors import print2err
 from ... import DeviceEvent, eventfilters
@@ -151,6 +172,12 @@ LEFT_EYE = 1
 RIGHT_EYE = 2
 BOTH_EYE = 3
 
+PARSER_FILTER_ID = 23
+
+np_abs = np.abs
+rad2deg = np.rad2deg
+arctan = np.arctan2
+
 
 class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
 
@@ -183,7 +210,7 @@ class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
             pos_filter_class, pos_filter_kwargs = eventfilters.PassThroughFilter, {}
 
         if velocity_filter:
-            vel_filter_class_name = position_filter.get(
+            vel_filter_class_name = velocity_filter.get(
                 'name', 'PassThroughFilter')
             vel_filter_class = getattr(eventfilters, vel_filter_class_name)
             del velocity_filter['name']
@@ -192,10 +219,10 @@ class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
             vel_filter_class, vel_filter_kwargs = eventfilters.PassThroughFilter, {}
 
         self.adaptive_x_vthresh_buffer = np.zeros(
-            self.vel_thresh_history_dur * sampling_rate)
+            int(self.vel_thresh_history_dur * sampling_rate))
         self.x_vthresh_buffer_index = 0
         self.adaptive_y_vthresh_buffer = np.zeros(
-            self.vel_thresh_history_dur * sampling_rate)
+            int(self.vel_thresh_history_dur * sampling_rate))
         self.y_vthresh_buffer_index = 0
 
         pos_filter_kwargs['event_type'] = MONOCULAR_EYE_SAMPLE
@@ -227,7 +254,7 @@ class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
 
     @property
     def filter_id(self):
-        return 23
+        return PARSER_FILTER_ID
 
     @property
     def input_event_types(self):
@@ -550,9 +577,10 @@ class EyeTrackerEventParser(eventfilters.DeviceEventFilter):
 
     def _convertMonoFields(self, prev_event, current_event):
         if self.isValidSample(current_event):
-            self._convertPosToAngles(self, current_event)
+            self._convertPosToAngles(current_event)
             if prev_event:
                 self._addVelocity(prev_event, current_event)
+        return current_event
 
     def _convertToMonoAveraged(self, prev_event, current_event):
         mono_evt = []
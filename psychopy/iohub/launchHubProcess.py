@@ -71,7 +71,11 @@ def run(rootScriptPathDir, configFilePath):
             m.start()
             glets.append(m)
 
-        tlet = gevent.spawn(s.processEventsTasklet, 0.01)
+        process_events_interval = 0.01
+        if s.sharedEvents:
+            process_events_interval = s.config.get(
+                'shared_memory_event_interval', 0.001)
+        tlet = gevent.spawn(s.processEventsTasklet, process_events_interval)
         glets.append(tlet)
 
         if Computer.psychopy_process:
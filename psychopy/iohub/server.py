@@ -6,7 +6,7 @@ from __future__ import division, absolute_import
 
 import os
 import sys
-from operator import itemgetter
+import tempfile
 from collections import deque, OrderedDict
 
 import msgpack
@@ -20,7 +20,7 @@ try:
 except ImportError:
     pass
 
-from past.builtins import basestring, unicode
+from past.builtins import basestring, unicode, xrange
 from . import _pkgroot
 from . import IOHUB_DIRECTORY, EXP_SCRIPT_DIRECTORY, _DATA_STORE_AVAILABLE
 from .errors import print2err, printExceptionDetailsToStdErr, ioHubError
@@ -28,7 +28,7 @@ from .net import MAX_PACKET_SIZE
 from .util import convertCamelToSnake, win32MessagePump
 from .util import yload, yLoader
 from .constants import DeviceConstants, EventConstants
-from .devices import DeviceEvent, import_device
+from .devices import DeviceEvent, DeviceEventBuffer, import_device
 from .devices import Computer
 from .devices.deviceConfigValidation import validateDeviceConfiguration
 getTime = Computer.getTime
@@ -176,13 +176,10 @@ class udpServer(DatagramServer):
     def handleGetEvents(self, replyTo):
         try:
             self.iohub.processDeviceEvents()
-            currentEvents = list(self.iohub.eventBuffer)
-            self.iohub.eventBuffer.clear()
+            # the buffer returns events in hub time order
+            currentEvents = self.iohub.eventBuffer.get(remove=True)
 
             if len(currentEvents) > 0:
-                currentEvents = sorted(
-                    currentEvents, key=itemgetter(
-                        DeviceEvent.EVENT_HUB_TIME_INDEX))
                 self.sendResponse(
                     ('GET_EVENTS_RESULT', currentEvents), replyTo)
             else:
@@ -202,6 +199,10 @@ class udpServer(DatagramServer):
             exp_dev_cb = io_dev_dict['Experiment']._nativeEventCallback
             for eventAsTuple in exp_events:
                 exp_dev_cb(eventAsTuple)
+            if self.iohub.sharedEvents:
+                # have the events in the shared buffer before replying, as
+                # they would be for a GET_EVENTS request sent after this one
+                self.iohub.processDeviceEvents()
             self.sendResponse(('EVENT_TX_RESULT', len(exp_events)), replyTo)
             return True
         elif request_type == 'DEV_RPC':
@@ -450,10 +451,22 @@ class udpServer(DatagramServer):
     def flushIODataStoreFile(self):
         dsfile = self.iohub.dsfile
         if dsfile:
-            dsfile.emrtFile.flush()
+            dsfile.flush()
             return True
         return False
 
+    def getDataStoreWriteStats(self):
+        dsfile = self.iohub.dsfile
+        if dsfile:
+            return dsfile.getWriteStats()
+        return None
+
+    def getSharedEventBufferPath(self):
+        shared_events = self.iohub.sharedEvents
+        if shared_events:
+            return shared_events.path
+        return None
+
     def shutDown(self):
         try:
             self.setPriority('normal')
@@ -516,7 +529,10 @@ class ioServer(object):
         self._hookDevice = None
         self._all_dev_conf_errors = []
         ebuf_sz = config.get('global_event_buffer', 2048)
-        ioServer.eventBuffer = deque(maxlen=ebuf_sz)
+        ioServer.eventBuffer = DeviceEventBuffer(ebuf_sz)
+        self.sharedEvents = None
+        if config.get('event_transport', 'udp') == 'shared_memory':
+            self._initSharedEvents(config, ebuf_sz)
 
         self._running = True
         # start UDP service
@@ -527,6 +543,18 @@ class ioServer(object):
 
         self._addPubSubListeners()
 
+    def _initSharedEvents(self, config, capacity):
+        from .shmem import SharedEventBuffer
+        path = os.path.join(tempfile.gettempdir(),
+                            'iohub_events_%d.shm' % os.getpid())
+        size = int(config.get('shared_memory_size', 32) * 1024 * 1024)
+        try:
+            self.sharedEvents = SharedEventBuffer.create(path, size, capacity)
+        except Exception:
+            print2err('Error creating the shared memory event buffer; '
+                      'events will be sent over UDP.')
+            printExceptionDetailsToStdErr()
+
     def _initDataStore(self, config, script_dir):
         try:
             # initial dataStore setup
@@ -859,6 +887,8 @@ class ioServer(object):
         while self._running:
             stime = Computer.getTime()
             self.processDeviceEvents()
+            if self.dsfile:
+                self.dsfile.flushStaleBuffers()
             dur = sleep_interval - (Computer.getTime() - stime)
             gevent.sleep(max(0.0, dur))
 
@@ -893,6 +923,11 @@ class ioServer(object):
                 print2err('--------------------------------------')
 
     def _handleEvent(self, event):
+        if self.sharedEvents:
+            etype = event[DeviceEvent.EVENT_TYPE_ID_INDEX]
+            eclass = EventConstants.getClass(etype)
+            if eclass and self.sharedEvents.write(event, eclass.NUMPY_DTYPE):
+                return
         self.eventBuffer.append(event)
 
     def clearEventBuffer(self, call_proc_events=True):
@@ -943,6 +978,10 @@ class ioServer(object):
 
             self.closeDataStoreFile()
 
+            if self.sharedEvents:
+                self.sharedEvents.close()
+                self.sharedEvents = None
+
             while self.devices:
                 self.devices.pop(0)._close()
         except Exception:
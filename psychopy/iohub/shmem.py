@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+# Part of the psychopy.iohub library.
+# Copyright (C) 2012-2016 iSolver Software Solutions
+# Distributed under the terms of the GNU General Public License (GPL).
+"""
+Shared memory transport for ioHub device events.
+
+The ioHub Process writes each event into a ring buffer of fixed size
+records (the NUMPY_DTYPE of the event's class), one ring per event type,
+all kept in a memory mapped file. The experiment process maps the same
+file and copies new records straight out of the rings, so getting events
+does not need a UDP round trip, msgpack or multi packet replies.
+
+Each ring has a single writer (the ioHub Server) and a single reader (the
+ioHubConnection), so no locks are needed: the writer only ever advances
+the ring's write count and the reader only its read count. When the
+writer gets a full ring ahead of the reader the oldest events are
+overwritten, just as the ioHub global event buffer drops them. Every slot
+also holds a sequence number, cleared before its record is written and
+set after, which the reader checks before and after copying a record to
+detect ones overwritten while it was reading them.
+
+File layout (all offsets 64 byte aligned)::
+
+    file header | ring table (MAX_RINGS entries) | ring | ring | ...
+
+    ring: write count | read count | dtype description | slots
+"""
+from __future__ import division, absolute_import
+
+import os
+import sys
+import ast
+import mmap
+from operator import itemgetter
+
+import numpy as np
+
+from .devices import DeviceEvent
+
+PY3 = sys.version_info[0] >= 3
+
+MAGIC = 0x696f4852  # 'ioHR'
+VERSION = 1
+MAX_RINGS = 64
+DESCR_SIZE = 4096  # bytes kept for the repr() of a ring's record dtype
+
+FILE_HEADER = np.dtype([('magic', '<u4'), ('version', '<u4'),
+                        ('n_rings', '<u4'), ('max_rings', '<u4'),
+                        ('size', '<u8'), ('next_offset', '<u8'),
+                        ('fallback_count', '<u8')])
+RING_ENTRY = np.dtype([('type_id', '<u4'), ('descr_size', '<u4'),
+                       ('offset', '<u8'), ('capacity', '<u8'),
+                       ('slot_size', '<u8')])
+# the write and read counts are kept on different cache lines
+RING_HEADER_SIZE = 128
+
+
+def _aligned(n, alignment=64):
+    return (n + alignment - 1) // alignment * alignment
+
+
+_RINGS_OFFSET = _aligned(FILE_HEADER.itemsize)
+_FIRST_RING_OFFSET = _aligned(_RINGS_OFFSET + MAX_RINGS * RING_ENTRY.itemsize)
+
+
+class EventRing(object):
+    """The ring of event records for one event type, as a view on the
+    shared memory map.
+    """
+
+    def __init__(self, buf, offset, capacity, eventDtype):
+        self.capacity = int(capacity)
+        self.eventDtype = np.dtype(eventDtype)
+        self.slotDtype = np.dtype([('seq', '<u8'),
+                                   ('event', self.eventDtype)])
+        self._writeCount = np.ndarray((1,), '<u8', buf, offset)
+        self._readCount = np.ndarray((1,), '<u8', buf, offset + 64)
+        self._slots = np.ndarray((self.capacity,), self.slotDtype, buf,
+                                 offset + RING_HEADER_SIZE + DESCR_SIZE)
+        self._seq = self._slots['seq']
+        self._events = self._slots['event']
+        self._nWritten = int(self._writeCount[0])
+        # the fields that have to be decoded to str for event lists
+        self._bytesFields = [i for i, name in enumerate(self.eventDtype.names)
+                             if PY3 and self.eventDtype[name].kind == 'S']
+        #: number of events the reader has lost to the writer overtaking it
+        self.lost = 0
+
+    @classmethod
+    def sizeFor(cls, capacity, eventDtype):
+        slotSize = np.dtype([('seq', '<u8'),
+                             ('event', np.dtype(eventDtype))]).itemsize
+        return _aligned(RING_HEADER_SIZE + DESCR_SIZE + capacity * slotSize)
+
+    def write(self, event):
+        """Copy `event` (a list of values in NUMPY_DTYPE order) into the next
+        slot. Only the ioHub Server writes to a ring.
+        """
+        i = self._nWritten
+        slot = i % self.capacity
+        self._seq[slot] = 0
+        self._events[slot] = tuple(event)
+        self._seq[slot] = i + 1
+        self._nWritten = i + 1
+        self._writeCount[0] = i + 1
+
+    def read(self):
+        """Return a numpy array holding a copy of the events written since
+        the last read, oldest first.
+        """
+        end = int(self._writeCount[0])
+        start = int(self._readCount[0])
+        if end == start:
+            return self._events[:0].copy()
+        if end - start > self.capacity:
+            self.lost += end - start - self.capacity
+            start = end - self.capacity
+        first = start % self.capacity
+        if first + end - start <= self.capacity:
+            index = slice(first, first + end - start)
+        else:
+            index = np.arange(start, end) % self.capacity
+        slots = self._slots[index]
+        if isinstance(index, slice):
+            slots = slots.copy()
+        # a record is intact if its sequence number was right both before
+        # and after it was copied
+        expected = np.arange(start + 1, end + 1, dtype=np.uint64)
+        intact = (slots['seq'] == expected) & (self._seq[index] == expected)
+        self._readCount[0] = end
+        if not intact.all():
+            self.lost += int(len(intact) - intact.sum())
+            slots = slots[intact]
+        return slots['event']
+
+    def discard(self):
+        """Skip all events not read yet.
+        """
+        self._readCount[0] = self._writeCount[0]
+
+    def toEventLists(self, events):
+        """Convert an array returned by read() into a list of event lists, as
+        the ioHub Server sends them over UDP.
+        """
+        columns = [events[name].tolist() for name in self.eventDtype.names]
+        for i in self._bytesFields:
+            columns[i] = np.char.decode(events[self.eventDtype.names[i]],
+                                        'utf-8').tolist()
+        return [list(event) for event in zip(*columns)]
+
+
+class SharedEventBuffer(object):
+    """All the event rings in one memory mapped file.
+
+    The ioHub Server creates the file with create(); ioHubConnection opens
+    it with attach(). Rings are added by the writer the first time an
+    event of a new type is written, and picked up by the reader on its
+    next read().
+
+    :usage:
+
+        hubSide = SharedEventBuffer.create(path, size, capacity)
+        hubSide.write(event, eventClass.NUMPY_DTYPE)
+
+        clientSide = SharedEventBuffer.attach(path)
+        events = clientSide.read()
+
+    """
+
+    def __init__(self, path, mm, capacity=None, owner=False):
+        self.path = path
+        self.capacity = capacity
+        self._owner = owner
+        self._mmap = mm
+        self._header = np.ndarray((1,), FILE_HEADER, mm, 0)
+        if self._header['magic'][0] != MAGIC or \
+                self._header['version'][0] != VERSION:
+            raise ValueError('%s is not an ioHub shared event buffer' % path)
+        self._entries = np.ndarray((MAX_RINGS,), RING_ENTRY, mm,
+                                   _RINGS_OFFSET)
+        self._rings = dict()
+        self._ringList = []
+        self._fallbackRead = 0
+        self._attachNewRings()
+
+    @classmethod
+    def create(cls, path, size, capacity):
+        """Create (or replace) the file `path` of `size` bytes, with rings
+        holding `capacity` events each, and map it for writing.
+        """
+        size = max(int(size), _FIRST_RING_OFFSET)
+        with open(path, 'wb') as f:
+            f.truncate(size)
+        mm = cls._map(path, size)
+        header = np.ndarray((1,), FILE_HEADER, mm, 0)
+        header[0] = (MAGIC, VERSION, 0, MAX_RINGS, size, _FIRST_RING_OFFSET,
+                     0)
+        return cls(path, mm, capacity, owner=True)
+
+    @classmethod
+    def attach(cls, path):
+        """Map the existing file `path` for reading events.
+        """
+        return cls(path, cls._map(path, os.path.getsize(path)))
+
+    @staticmethod
+    def _map(path, size):
+        with open(path, 'r+b') as f:
+            return mmap.mmap(f.fileno(), size)
+
+    def _attachNewRings(self):
+        nRings = int(self._header['n_rings'][0])
+        while len(self._ringList) < nRings:
+            entry = self._entries[len(self._ringList)]
+            offset = int(entry['offset'])
+            descr = self._mmap[offset + RING_HEADER_SIZE:
+                               offset + RING_HEADER_SIZE +
+                               int(entry['descr_size'])]
+            eventDtype = np.dtype(ast.literal_eval(descr.decode('ascii')))
+            ring = EventRing(self._mmap, offset, entry['capacity'],
+                             eventDtype)
+            self._rings[int(entry['type_id'])] = ring
+            self._ringList.append(ring)
+
+    def _addRing(self, typeID, eventDtype):
+        nRings = int(self._header['n_rings'][0])
+        offset = int(self._header['next_offset'][0])
+        size = EventRing.sizeFor(self.capacity, eventDtype)
+        descr = repr(np.dtype(eventDtype).descr).encode('ascii')
+        if (nRings >= MAX_RINGS or len(descr) > DESCR_SIZE or
+                offset + size > int(self._header['size'][0])):
+            return None
+        self._mmap[offset:offset + RING_HEADER_SIZE] = \
+            b'\0' * RING_HEADER_SIZE
+        self._mmap[offset + RING_HEADER_SIZE:
+                   offset + RING_HEADER_SIZE + len(descr)] = descr
+        ring = EventRing(self._mmap, offset, self.capacity, eventDtype)
+        self._entries[nRings] = (typeID, len(descr), offset, self.capacity,
+                                 ring.slotDtype.itemsize)
+        self._header['next_offset'] = offset + size
+        # publish the ring only once its entry is complete
+        self._header['n_rings'] = nRings + 1
+        self._rings[typeID] = ring
+        self._ringList.append(ring)
+        return ring
+
+    def write(self, event, eventDtype):
+        """Write `event` (an ioHub event list) to the ring for its type.
+
+        Returns False, and counts the event as a fallback, if it could not
+        be written: there was no room in the file for a new ring, or its
+        values don't fit `eventDtype`. Such events need to be sent some
+        other way (i.e. over UDP).
+        """
+        typeID = event[DeviceEvent.EVENT_TYPE_ID_INDEX]
+        ring = self._rings.get(typeID)
+        if ring is None:
+            ring = self._addRing(typeID, eventDtype)
+        if ring is not None:
+            try:
+                ring.write(event)
+                return True
+            except (ValueError, TypeError, OverflowError, UnicodeError):
+                pass
+        self._header['fallback_count'] += 1
+        return False
+
+    def hasFallbackEvents(self):
+        """True if the writer has had to send events some other way since
+        the last call.
+        """
+        count = int(self._header['fallback_count'][0])
+        changed = count != self._fallbackRead
+        self._fallbackRead = count
+        return changed
+
+    def read(self):
+        """Return the events written to all rings since the last read, as
+        event lists sorted by hub time.
+        """
+        self._attachNewRings()
+        events = []
+        for ring in self._ringList:
+            records = ring.read()
+            if len(records):
+                events.extend(ring.toEventLists(records))
+        if len(events) > 1:
+            events.sort(key=itemgetter(DeviceEvent.EVENT_HUB_TIME_INDEX))
+        return events
+
+    def clear(self):
+        """Discard all events not read yet.
+        """
+        self._attachNewRings()
+        for ring in self._ringList:
+            ring.discard()
+
+    @property
+    def lost(self):
+        """Number of events overwritten before they could be read"""
+        return sum(ring.lost for ring in self._ringList)
+
+    def close(self):
+        """Unmap the file; the writer also deletes it.
+        """
+        if self._mmap is None:
+            return
+        self._rings.clear()
+        self._ringList = []
+        self._header = self._entries = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # arrays still refer to the map; it goes with them
+        self._mmap = None
+        if self._owner:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
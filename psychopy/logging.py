@@ -26,6 +26,16 @@ messages, (which PsychoPy doesn't use) using the commands::
     from psychopy import logging
     logging.console.setLevel(logging.CRITICAL)
 
+Messages are written to the targets when :func:`flush` is called. To keep
+file writes out of time-critical code, :func:`startBackgroundWriter` hands
+the messages to a thread that writes them instead::
+
+    logging.startBackgroundWriter()
+
+A :class:`BinaryLogFile` target writes a compact binary log, which can be
+loaded into arrays with :func:`readBinaryLog` or converted to the text
+format with :func:`binaryLogToText`.
+
 """
 
 # Much of the code below is based conceptually, if not syntactically, on the
@@ -42,6 +52,8 @@ import atexit
 import sys
 import codecs
 import locale
+import threading
+from collections import deque
 from psychopy import clock
 from psychopy.constants import PY3
 
@@ -81,6 +93,15 @@ _levelNames = {
 
 _prefEncoding = locale.getpreferredencoding()
 
+# the binary log format written by BinaryLogFile
+BINARY_LOG_MAGIC = b'PsyLog\x01\x00'
+BINARY_LOG_NO_OBJ = 0xFFFFFFFF
+# numpy dtype description of an entry (numpy is only imported when needed)
+BINARY_LOG_ENTRY = [('t', '<f8'), ('level', 'u1'), ('message', '<u4'),
+                    ('obj', '<u4')]
+
+
+
 def getLevel(level):
     """Return the textual representation of logging level 'level'.
 
@@ -122,16 +143,41 @@ def setDefaultClock(clock):
 
 
 class _LogEntry(object):
+    """A logged message. Attributes can also be read as items, so that the
+    logger format can be applied to the entry directly.
+
+    The message may be given as a function (taking no arguments) returning
+    the message text, which is then only called when the message is needed.
+    """
+    __slots__ = ['t', 'level', 'obj', '_message']
 
     def __init__(self, level, message, t=None, obj=None):
         super(_LogEntry, self).__init__()
         self.t = t
-        self.t_ms = t * 1000
         self.level = level
-        self.levelname = getLevel(level)
-        self.message = message
+        self._message = message
         self.obj = obj
 
+    @property
+    def t_ms(self):
+        return self.t * 1000
+
+    @property
+    def levelname(self):
+        return getLevel(self.level)
+
+    @property
+    def message(self):
+        if callable(self._message):
+            self._message = self._message()
+        return self._message
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
 
 class LogFile(object):
     """A text stream to receive inputs from the logging system
@@ -210,6 +256,109 @@ class LogFile(object):
             pass
 
 
+class BinaryLogFile(LogFile):
+    """A log target that writes entries in a compact binary format, which is
+    quicker to write than text and much quicker to load back (with
+    :func:`readBinaryLog`). :func:`binaryLogToText` converts a binary log
+    to the usual text format.
+
+    The file starts with the 8 bytes BINARY_LOG_MAGIC, followed by a block
+    for each logger flush:
+
+        - a header of 3 little-endian uint32: the number of entries, the
+          number of new strings and the size of the new strings in bytes
+        - the size in bytes of each new string, as uint32
+        - the new strings, utf-8 encoded
+        - the entries, as BINARY_LOG_ENTRY records: time (float64), level
+          (uint8), and the ids of the message and obj strings (uint32)
+
+    Message and obj strings are interned: each distinct string is written
+    once and numbered in the order written (from 0), and entries give its
+    number. An obj of None is given as BINARY_LOG_NO_OBJ.
+    """
+
+    def __init__(self, f, level=WARNING, filemode='a', logger=None,
+                 maxInterned=100000):
+        """Create a binary log file as a target for logged entries of a given
+        level
+
+        :parameters:
+
+            - f:
+                a path, or a file object opened for writing bytes
+
+            - level:
+                The minimum level of importance that a message must have
+                to be logged by this target.
+
+            - filemode: 'a', 'w'
+                Append or overwrite existing log file
+
+            - maxInterned:
+                the number of strings to remember the ids of; after that
+                strings are numbered (and written) afresh
+
+        """
+        import numpy
+        self._numpy = numpy
+        self._maxInterned = maxInterned
+        self._ids = {}
+        if isinstance(f, basestring):
+            f = open(f, filemode.replace('b', '') + 'b')
+        self._nStrings = 0
+        if f.tell() == 0:
+            f.write(BINARY_LOG_MAGIC)
+        else:
+            # appending, so carry on numbering after the strings written
+            if not hasattr(f, 'name'):
+                raise ValueError('Can not append to a binary log stream '
+                                 'with no file name')
+            self._nStrings = _binaryLogStringCount(f.name)
+        LogFile.__init__(self, f, level=level, logger=logger)
+
+    def _stringId(self, text, newStrings):
+        i = self._ids.get(text)
+        if i is None:
+            if len(self._ids) >= self._maxInterned:
+                self._ids.clear()
+            i = self._ids[text] = self._nStrings
+            self._nStrings += 1
+            newStrings.append(text.encode('utf-8'))
+        return i
+
+    def writeEntries(self, entries):
+        """Write the given log entries as a block
+        """
+        if not entries:
+            return
+        np = self._numpy
+        records = np.empty(len(entries), BINARY_LOG_ENTRY)
+        newStrings = []
+        stringId = self._stringId
+        records['t'] = [e.t for e in entries]
+        records['level'] = [e.level for e in entries]
+        records['message'] = [stringId(u'%s' % (e.message,), newStrings)
+                              for e in entries]
+        records['obj'] = [BINARY_LOG_NO_OBJ if e.obj is None else
+                          stringId(e.obj if isinstance(e.obj, basestring)
+                                   else repr(e.obj), newStrings)
+                          for e in entries]
+        sizes = np.array([len(b) for b in newStrings], '<u4')
+        header = np.array([len(entries), len(newStrings), sizes.sum()],
+                          '<u4')
+        self.stream.write(b''.join([header.tobytes(), sizes.tobytes()] +
+                                   newStrings + [records.tobytes()]))
+        self.stream.flush()
+
+    def write(self, txt):
+        """Log each line of txt as an entry with level NOTSET, timed by the
+        default clock.
+        """
+        t = defaultClock.getTime()
+        self.writeEntries([_LogEntry(NOTSET, line, t=t)
+                           for line in txt.splitlines()])
+
+
 class _Logger(object):
     """Maintains a set of log targets (text streams such as files of stdout)
 
@@ -217,10 +366,14 @@ class _Logger(object):
 
     """
 
-    def __init__(self, format="%(t).4f \t%(levelname)s \t%(message)s"):
+    def __init__(self, format="%(t).4f \t%(levelname)s \t%(message)s",
+                 keepFlushed=None):
         """The string-formatted elements %(xxxx)f can be used, where
         each xxxx is an attribute of the LogEntry.
         e.g. t, t_ms, level, levelname, message
+
+        keepFlushed is the number of flushed entries to keep in
+        self.flushed (see setKeepFlushed).
         """
         super(_Logger, self).__init__()
         self.targets = []
@@ -228,9 +381,13 @@ class _Logger(object):
         self.toFlush = []
         self.format = format
         self.lowestTarget = 50
+        self._writer = None
+        self._pending = deque()  # lists of entries for the writer thread
+        self.setKeepFlushed(keepFlushed)
 
     def __del__(self):
         self.flush()
+        self.stopBackgroundWriter()
         # unicode logged to coder output window can cause logger failure, with
         # error message pointing here. this is despite it being ok to log to
         # terminal or Builder output. proper fix: fix coder unicode bug #97
@@ -254,11 +411,98 @@ class _Logger(object):
         for target in self.targets:
             self.lowestTarget = min(self.lowestTarget, target.level)
 
+    def isEnabledFor(self, level):
+        """True if a message of this level would be sent to any target, so
+        callers can avoid building messages that would be discarded.
+        """
+        return level >= self.lowestTarget
+
+    def setKeepFlushed(self, n=None):
+        """Set how many of the most recently flushed entries are kept in
+        self.flushed: all of them if n is None (the default), otherwise
+        the last n (so none for 0). Long experiments that log every frame
+        can set a limit so the log does not keep growing in memory.
+        """
+        if n is None:
+            self.flushed = list(self.flushed)
+        else:
+            self.flushed = deque(self.flushed, maxlen=n)
+
+    def startBackgroundWriter(self, maxPending=64):
+        """Write flushed messages to the targets from a separate thread, so
+        that flush() only passes the messages on to that thread.
+
+        maxPending is the number of flushes that can be waiting to be
+        written; a flush beyond that waits for the thread to catch up.
+        """
+        if self._writer is not None:
+            return
+        self._ready = threading.Event()
+        self._space = threading.Semaphore(maxPending)
+        self._writer = threading.Thread(target=self._writeLoop,
+                                        name='PsychoPyLogWriter')
+        self._writer.daemon = True
+        self._writer.start()
+
+    def stopBackgroundWriter(self):
+        """Wait for the background writer thread to write any messages it
+        has been given, then stop it. Later flushes write the messages
+        directly.
+        """
+        writer = self._writer
+        if writer is None:
+            return
+        self._writer = None
+        self._pending.append(None)
+        self._ready.set()
+        writer.join()
+
+    def _writeLoop(self):
+        pending, ready = self._pending, self._ready
+        while True:
+            ready.wait()
+            ready.clear()
+            while pending:
+                entries = pending.popleft()
+                if entries is None:
+                    return
+                try:
+                    self._write(entries)
+                finally:
+                    self._space.release()
+
+    def _write(self, entries):
+        # write all of the entries each target wants in a single write, so
+        # the stream is flushed once rather than once per entry
+        formatted = {}  # keep a dict - so only do the formatting once
+        for target in list(self.targets):
+            if hasattr(target, 'writeEntries'):
+                # a target that writes the entries itself, not as text
+                target.writeEntries([thisEntry for thisEntry in entries
+                                     if thisEntry.level >= target.level])
+                continue
+            lines = []
+            for thisEntry in entries:
+                if thisEntry.level >= target.level:
+                    if not thisEntry in formatted:
+                        # convert the entry into a formatted string
+                        formatted[thisEntry] = self.format % thisEntry
+                    lines.append(formatted[thisEntry] + '\n')
+            if lines:
+                target.write(''.join(lines))
+            if hasattr(target.stream, 'flush'):
+                target.stream.flush()
+
     def log(self, message, level, t=None, obj=None):
         """Add the `message` to the log stack at the appropriate `level`
 
         If no relevant targets (files or console) exist then the message is
         simply discarded.
+
+        The message can also be a function (taking no arguments) that
+        returns the message, which is only called if a target receives the
+        message. As it can be called later (by the background writer) it
+        should not depend on values that may change.
         """
         # check for at least one relevant logger
         if level < self.lowestTarget:
@@ -272,23 +516,21 @@ class _Logger(object):
             _LogEntry(t=t, level=level, message=message, obj=obj))
 
     def flush(self):
-        """Process all current messages to each target
+        """Process all current messages to each target, or pass them to the
+        background writer thread if it has been started
         """
-        # loop through targets then entries in toFlush
-        # so that stream.flush can be called just once
-        formatted = {}  # keep a dict - so only do the formatting once
-        for target in self.targets:
-            for thisEntry in self.toFlush:
-                if thisEntry.level >= target.level:
-                    if not thisEntry in formatted:
-                        # convert the entry into a formatted string
-                        formatted[thisEntry] = self.format % thisEntry.__dict__
-                    target.write(formatted[thisEntry] + '\n')
-            if hasattr(target.stream, 'flush'):
-                target.stream.flush()
-        # finished processing entries - move them to self.flushed
-        self.flushed.extend(self.toFlush)
+        entries = self.toFlush
         self.toFlush = []  # a new empty list
+        if not entries:
+            return
+        if self._writer is not None:
+            self._space.acquire()
+            self._pending.append(entries)
+            self._ready.set()
+        else:
+            self._write(entries)
+        # finished processing entries - move them to self.flushed
+        self.flushed.extend(entries)
 
 root = _Logger()
 console = LogFile()
@@ -298,8 +540,29 @@ def flush(logger=root):
     """Send current messages in the log to all targets
     """
     logger.flush()
+
+
+def startBackgroundWriter(logger=root, maxPending=64):
+    """Have messages written to the log targets by a background thread, so
+    that :func:`flush` does not wait for files to be written.
+
+    See :meth:`_Logger.startBackgroundWriter`.
+    """
+    logger.startBackgroundWriter(maxPending=maxPending)
+
+
+def stopBackgroundWriter(logger=root):
+    """Wait for the background thread to write all flushed messages, then
+    stop it.
+    """
+    logger.stopBackgroundWriter()
+
+
+def _flushAtExit():
+    flush()
+    stopBackgroundWriter()
 # make sure this function gets called as python closes
-atexit.register(flush)
+atexit.register(_flushAtExit)
 
 
 def critical(msg, t=None, obj=None):
@@ -389,3 +652,86 @@ def log(msg, level, t=None, obj=None):
     Log the msg, at a  given level on the root logger
     """
     root.log(msg, level=level, t=t, obj=obj)
+
+
+def _binaryLogBlocks(f):
+    """Yield the (entries, strings) of each block of binary log file f
+    """
+    import numpy as np
+    with open(f, 'rb') as stream:
+        data = stream.read()
+    if not data.startswith(BINARY_LOG_MAGIC):
+        raise ValueError('%s is not a PsychoPy binary log file' % f)
+    pos = len(BINARY_LOG_MAGIC)
+    entryDtype = np.dtype(BINARY_LOG_ENTRY)
+    while pos + 12 <= len(data):
+        nEntries, nStrings, nBytes = np.frombuffer(data, '<u4', 3,
+                                                   pos).tolist()
+        stringsPos = pos + 12 + 4 * nStrings
+        entriesPos = stringsPos + nBytes
+        end = entriesPos + nEntries * entryDtype.itemsize
+        if end > len(data):
+            break  # the last block was not completely written
+        sizes = np.frombuffer(data, '<u4', nStrings, pos + 12)
+        ends = (stringsPos + np.cumsum(sizes, dtype=np.int64)).tolist()
+        strings = [data[start:stop].decode('utf-8') for start, stop in
+                   zip([stringsPos] + ends[:-1], ends)]
+        entries = np.frombuffer(data, entryDtype, nEntries, entriesPos)
+        pos = end
+        yield entries, strings
+
+
+def _binaryLogStringCount(f):
+    return sum(len(strings) for _, strings in _binaryLogBlocks(f))
+
+
+def readBinaryLog(f, asDataFrame=False):
+    """Load a log written by a :class:`BinaryLogFile`
+
+    Returns a dict of numpy arrays: t (float64), level (uint8), and
+    message and obj (arrays of str, with None for no obj), or a pandas
+    DataFrame with those columns if asDataFrame is True.
+    """
+    import numpy as np
+    blocks = list(_binaryLogBlocks(f))
+    strings = []
+    for _, blockStrings in blocks:
+        strings.extend(blockStrings)
+    strings.append(None)  # for BINARY_LOG_NO_OBJ
+    strings = np.array(strings, dtype=object)
+    if blocks:
+        entries = np.concatenate([entries for entries, _ in blocks])
+    else:
+        entries = np.empty(0, BINARY_LOG_ENTRY)
+    objIds = entries['obj'].astype(np.int64)
+    objIds[objIds == BINARY_LOG_NO_OBJ] = len(strings) - 1
+    columns = {'t': entries['t'].astype(np.float64),
+               'level': entries['level'].copy(),
+               'message': strings[entries['message'].astype(np.int64)],
+               'obj': strings[objIds]}
+    if asDataFrame:
+        import pandas
+        return pandas.DataFrame(columns,
+                                columns=['t', 'level', 'message', 'obj'])
+    return columns
+
+
+def binaryLogToText(f, textFile=None, format=None):
+    """Convert a log written by a :class:`BinaryLogFile` to text, formatted
+    as the root logger formats it (or using `format`).
+
+    The text is written to textFile if that is given, otherwise returned.
+    """
+    if format is None:
+        format = root.format
+    columns = readBinaryLog(f)
+    lines = [format % _LogEntry(level, message, t=t, obj=obj) + '\n'
+             for t, level, message, obj in zip(columns['t'].tolist(),
+                                               columns['level'].tolist(),
+                                               columns['message'],
+                                               columns['obj'])]
+    text = u''.join(lines)
+    if textFile is None:
+        return text
+    with codecs.open(textFile, 'w', 'utf8') as stream:
+        stream.write(text)
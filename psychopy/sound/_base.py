@@ -14,6 +14,7 @@ import numpy
 import copy
 from os import path
 from psychopy import logging
+from psychopy.tools.arraytools import ArrayCache
 from psychopy.constants import (STARTED, PLAYING, PAUSED, FINISHED, STOPPED,
                                 NOT_STARTED, FOREVER)
 from sys import platform
@@ -48,6 +49,41 @@ def apodize(soundArray, sampleRate):
     return soundArray
 
 
+# the sections of hamming windows returned for each block, keyed by
+# (winSamples, blockSize), see HammingWindow._tables()
+_windowTables = {}
+
+# tones up to this long are rendered once and kept in renderedTones
+maxRenderedToneSecs = 10.0
+renderedTones = ArrayCache(maxBytes=64 * 2**20)
+
+
+def renderTone(freq, secs, sampleRate, hamming=True):
+    """Returns a read-only (nSamples, 1) array of a tone, with the onset
+    and offset ramped as by HammingWindow if hamming is True.
+
+    Tones are shared by all sounds using the same (freq, secs, sampleRate,
+    hamming), so each is only synthesised once.
+    """
+    key = (freq, secs, sampleRate, bool(hamming))
+    tone = renderedTones.get(key)
+    if tone is None:
+        nSamples = int(round(sampleRate * secs))
+        tone = numpy.arange(nSamples, dtype=float)
+        tone *= 2 * numpy.pi * freq / sampleRate
+        numpy.sin(tone, out=tone)
+        tone.shape = (nSamples, 1)
+        if hamming:
+            # the same window a block-by-block tone would have
+            window = HammingWindow(winSecs=min(0.005, secs / 15.0),
+                                   soundSecs=secs, sampleRate=sampleRate)
+            tone[:window.winSamples, 0] *= window.startWindow
+            if window.winSamples:
+                tone[-window.winSamples:, 0] *= window.endWindow
+        tone = renderedTones.add(key, tone)
+    return tone
+
+
 class HammingWindow(object):
     def __init__(self, winSecs, soundSecs, sampleRate):
         """
@@ -65,49 +101,50 @@ class HammingWindow(object):
         self.endWindow = numpy.hanning(self.winSamples*2)[self.winSamples:]
         self.finalWinStart = self.soundSamples-self.winSamples
 
+    def _tables(self, blockSize):
+        """Returns (read-only) arrays of the start window followed by
+        blockSize ones, and of blockSize ones, the end window and blockSize
+        ones, from which each block of the window is a slice. These are
+        shared by all windows of the same length.
+        """
+        key = (self.winSamples, blockSize)
+        tables = _windowTables.get(key)
+        if tables is None:
+            ones = numpy.ones(blockSize)
+            startTable = numpy.concatenate([self.startWindow, ones])
+            endTable = numpy.concatenate([ones, self.endWindow, ones])
+            tables = []
+            for table in (startTable, endTable):
+                table.shape = [len(table), 1]
+                table.flags.writeable = False
+                tables.append(table)
+            tables = _windowTables[key] = tuple(tables)
+        return tables
+
     def nextBlock(self, t, blockSize):
-        """Returns a block to be multiplied with the current sound block or 1.0
+        """Returns a block to be multiplied with the current sound block or
+        None (where no window is needed)
 
         :param t: current position in time (secs)
         :param blockSize: block size for the sound needing the hanning window
-        :return: numpy array of length blockSize
+        :return: read-only numpy array of shape [blockSize, 1]
         """
         startSample = int(t*self.sampleRate)
         if startSample < self.winSamples:
             # we're in beginning hanning window (start of sound)
-            # 2 options:
-            #  - block is fully within window
-            #  - block starts in window but ends after window
-            block = numpy.ones(blockSize)
-            winEndII = min(self.winSamples,  # if block goes beyond hann win
-                           startSample+blockSize)  # if block shorter
-            blockEndII = min(self.winSamples-startSample,  # if block beyond
-                             blockSize)  # if block shorter
-            block[0:blockEndII] = self.startWindow[startSample:winEndII]
+            startTable = self._tables(blockSize)[0]
+            return startTable[startSample:startSample + blockSize]
         elif startSample >= self.soundSamples:
-            block = None  # the sound has finished (shouldn't have got here!)
+            return None  # the sound has finished (shouldn't have got here!)
         elif startSample >= self.finalWinStart-blockSize:
-            # we're in final hanning window (end of sound)
-            # More complicated, with 3 options:
-            #  - block starts before win
-            #  - start/end during win
-            #  - start during but end after win
-            block = numpy.ones(blockSize)  # the initial flat part
-            blockStartII = max(self.finalWinStart-startSample,
-                         0)  # if block start inside window
-            blockEndII = min(blockSize,  # if block ends in hann win
-                             self.soundSamples-startSample)  # ends after snd
-            winStartII = max(0,  # current block ends in win but starts before
-                             startSample-self.finalWinStart)
-            winEndII = min(self.winSamples,
-                           startSample+blockSize-self.finalWinStart)
-            block[blockStartII:blockEndII] = \
-                self.endWindow[winStartII:winEndII]
+            # we're in final hanning window (end of sound), which starts
+            # blockSize samples into the end table
+            endTable = self._tables(blockSize)[1]
+            ii = startSample - self.finalWinStart + blockSize
+            return endTable[ii:ii + blockSize]
         else:
-            block = None  # we're in the middle of sound so no need for window
-        if block is not None:
-            block.shape = [len(block), 1]
-        return block
+            return None  # we're in the middle of sound so no need for window
+
 
 class _SoundBase(object):
     """Base class for sound object, from one of many ways.
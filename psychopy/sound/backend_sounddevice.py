@@ -9,12 +9,15 @@ import sys
 import os
 import time
 import re
+import threading
+import weakref
 
-from psychopy import logging, exceptions
+from psychopy import logging, exceptions, clock
 from psychopy.constants import (PLAYING, PAUSED, FINISHED, STOPPED,
                                 NOT_STARTED)
 from psychopy.exceptions import SoundFormatError, DependencyError
-from ._base import _SoundBase, HammingWindow
+from ._base import _SoundBase, HammingWindow, renderTone, maxRenderedToneSecs
+from psychopy.tools.arraytools import ArrayCache
 
 try:
     import sounddevice as sd
@@ -138,6 +141,194 @@ class _StreamsDict(dict):
 streams = _StreamsDict()
 
 
+class _DecodedAudioCache(ArrayCache):
+    """Keeps the arrays decoded from sound files, so that each file (or
+    section of a file) is only decoded once however many Sounds use it.
+
+    Arrays are keyed by (path, startTime, stopTime, sampleRate), and are
+    dropped (least recently used first) once they total more than
+    `maxBytes`. The file's modification time is part of the key, so a file
+    is decoded again if it has changed.
+
+    use the instance `decodedAudio` rather than creating a new instance of
+    this
+    """
+
+    def __init__(self, maxBytes=256 * 2**20):
+        ArrayCache.__init__(self, maxBytes)
+
+    def _key(self, fileName, startTime, stopTime, sampleRate):
+        return (os.path.abspath(fileName), os.path.getmtime(fileName),
+                startTime, stopTime, sampleRate)
+
+    def get(self, fileName, startTime, stopTime, sampleRate):
+        """Returns the array decoded from this section of the file, or None
+        """
+        return ArrayCache.get(
+            self, self._key(fileName, startTime, stopTime, sampleRate))
+
+    def add(self, fileName, startTime, stopTime, sampleRate, array):
+        """Stores the array decoded from this section of the file, returning
+        it as a read-only array
+        """
+        return ArrayCache.add(
+            self, self._key(fileName, startTime, stopTime, sampleRate), array)
+
+
+decodedAudio = _DecodedAudioCache()
+
+
+def _fillStreamer(streamerRef):
+    """Loop of the thread reading a file for a _FileStreamer. Only a weak
+    reference is kept while sleeping, so the thread ends when the streamer
+    is no longer used.
+    """
+    while True:
+        streamer = streamerRef()
+        if streamer is None:
+            return
+        if streamer.closed:
+            streamer.sndFile.close()
+            return
+        busy = streamer._fill()
+        interval = streamer.fillInterval
+        del streamer
+        if not busy:
+            time.sleep(interval)
+
+
+class _FileStreamer(object):
+    """Streams a section of a sound file through a ring buffer, which a
+    background thread keeps filled ahead of the stream callback, so the
+    callback never reads from disk.
+
+    There is one reader (the callback, calling read()), and each side only
+    advances its own count of frames (`_read` and `_written`), so the
+    reader takes no lock. The writers (the thread, and seek(), which reads
+    the first chunk itself so the sound can restart at once) are serialised
+    by `_fillLock`. While a seek is in progress (`_seeksRequested` differs
+    from `_seeksDone`) read() returns silence.
+    """
+
+    def __init__(self, sndFile, startFrame, stopFrame, bufferFrames):
+        self.sndFile = sndFile
+        self.startFrame = startFrame
+        self.stopFrame = stopFrame
+        self.buffer = np.zeros((bufferFrames, sndFile.channels))
+        self.chunkFrames = max(bufferFrames // 4, 1)
+        self.fillInterval = min(max(
+            bufferFrames / float(sndFile.samplerate) / 8, 0.005), 0.05)
+        self.underruns = 0  # reads the thread hadn't filled in time
+        self.closed = False
+        self._read = 0
+        self._written = 0
+        self._validFrom = 0  # frames written before the last seek are stale
+        self._end = None  # value of _written at the end of the section
+        self._position = startFrame
+        self._seekFrame = startFrame
+        self._seeksRequested = 1
+        self._seeksDone = 0
+        self._fillLock = threading.Lock()
+        # fill the buffer before starting, so the sound can play at once
+        while self._fill():
+            pass
+        self._thread = threading.Thread(target=_fillStreamer,
+                                        args=(weakref.ref(self),))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def seek(self, frame):
+        """Continue from this frame of the file (within the section). The
+        first chunk is read before returning, so it can be played at once,
+        and the thread reads the rest.
+        """
+        with self._fillLock:
+            self._seekFrame = min(max(frame, self.startFrame),
+                                  self.stopFrame)
+            self._seeksRequested += 1
+            # a whole chunk (in two reads if it wraps round the ring)
+            while (self._fillChunk() and
+                   self._written - self._validFrom < self.chunkFrames):
+                pass
+
+    def _fill(self):
+        """Read the next chunk of the file into the buffer, if there is room
+        for it (called by the thread). Returns True if anything was read.
+        """
+        with self._fillLock:
+            return self._fillChunk()
+
+    def _fillChunk(self):
+        # called with _fillLock held
+        seeksRequested = self._seeksRequested
+        if seeksRequested != self._seeksDone:
+            self.sndFile.seek(self._seekFrame)
+            self._position = self._seekFrame
+            self._end = None
+            self._validFrom = self._written
+        # read() waits for the first chunk from the new position
+        nFrames = self._readChunk()
+        self._seeksDone = seeksRequested
+        return nFrames > 0
+
+    def _readChunk(self):
+        # returns the number of frames there was room for
+        if self._end is not None:
+            return 0
+        bufferFrames = len(self.buffer)
+        start = self._written % bufferFrames
+        nFrames = min(
+            bufferFrames - (self._written - max(self._read, self._validFrom)),
+            bufferFrames - start,  # up to the end of the ring
+            self.chunkFrames, self.stopFrame - self._position)
+        if nFrames > 0:
+            nRead = len(self.sndFile.read(
+                nFrames, out=self.buffer[start:start + nFrames]))
+            self._position += nRead
+            if nRead < nFrames:  # the file is shorter than expected
+                self._position = self.stopFrame
+            self._written += nRead
+        if self._position >= self.stopFrame:
+            self._end = self._written
+        return nFrames
+
+    def read(self, nFrames, out=None):
+        """Returns the next nFrames from the buffer (called by the stream
+        callback). Fewer are returned only at the end of the section; if the
+        thread has fallen behind, the missing frames are zeros and the
+        underrun is counted.
+
+        If out is given the frames are copied into out[:nFrames] (mono files
+        filling every channel of out), and that part of out is returned.
+        """
+        if out is None:
+            block = np.zeros((nFrames, self.buffer.shape[1]))
+        else:
+            block = out[:nFrames]
+            block.fill(0)
+        if self._seeksDone != self._seeksRequested:
+            self.underruns += 1
+            return block
+        read = max(self._read, self._validFrom)
+        nRead = min(nFrames, self._written - read)
+        bufferFrames = len(self.buffer)
+        start = read % bufferFrames
+        firstPart = min(nRead, bufferFrames - start)
+        np.copyto(block[:firstPart], self.buffer[start:start + firstPart])
+        np.copyto(block[firstPart:nRead], self.buffer[:nRead - firstPart])
+        self._read = read + nRead
+        if nRead < nFrames:
+            end = self._end
+            if end is not None and read + nRead >= end:
+                return block[:nRead]
+            self.underruns += 1
+        return block
+
+    def close(self):
+        """Stop the thread, which then closes the file"""
+        self.closed = True
+
+
 class _SoundStream(object):
     def __init__(self, sampleRate, channels, blockSize,
                  device=None, duplex=False):
@@ -155,6 +346,10 @@ class _SoundStream(object):
         self.sounds = []  # list of dicts for sounds currently playing
         self.takeTimeStamp = False
         self.frameN = 1
+        # each sound's block is put together here before adding it to the
+        # output, so the callback doesn't allocate arrays
+        self._scratch = np.zeros((blockSize, channels), np.float32)
+        self.resetCallbackStats()
         # self.frameTimes = range(5)  # DEBUGGING: store the last 5 callbacks
         if not travisCI:  # travis-CI testing does not have a sound device
             self._sdStream = sd.OutputStream(samplerate=self.sampleRate,
@@ -186,37 +381,51 @@ class _SoundStream(object):
             logging.info("Entered callback: {} ms after sound start"
                          .format(
                 (time.time() - self._tSoundRequestPlay) * 1000))
-        t0 = time.time()
+        t0 = clock.getTime()
         self.frameN += 1
         toSpk.fill(0)
-        for thisSound in self.sounds:
-            dat = thisSound._nextBlock()  # fetch the next block of data
-            dat *= thisSound.volume  # Set the volume block by block
-            if self.channels == 2 and len(dat.shape) == 2:
-                toSpk[:len(dat), :] += dat  # add to out stream
-            elif self.channels == 2 and len(dat.shape) == 1:
-                toSpk[:len(dat), 0] += dat  # add to out stream
-                toSpk[:len(dat), 1] += dat  # add to out stream
-            elif self.channels == 1 and len(dat.shape) == 2:
-                toSpk[:len(dat), :] += dat  # add to out stream
-            else:
-                toSpk[:len(dat), 0] += dat  # add to out stream
+        scratch = self._scratch
+        if len(scratch) < blockSize:
+            self._scratch = scratch = np.zeros((blockSize, self.channels),
+                                               np.float32)
+        # a copy, as finished sounds are removed from the list
+        for thisSound in list(self.sounds):
+            # fetch the next block of data, already expanded to our channels
+            dat = thisSound._nextBlock(out=scratch)
+            if dat is None:
+                continue
+            if thisSound.volume != 1:
+                np.multiply(dat, thisSound.volume, out=dat)
+            spk = toSpk[:len(dat)]
+            np.add(spk, dat, out=spk)  # add to out stream
             # check if that was a short block (sound is finished)
-            if len(dat) < len(toSpk[:, :]):
-                self.sounds.remove(thisSound)
+            if len(dat) < blockSize:
+                self.remove(thisSound)
                 thisSound._EOS()
-                # check if that took a long time
-                # t1 = time.time()
-                # if (t1-t0) > 0.001:
-                #     logging.debug("buffer_callback took {:.3f}ms that frame"
-                #                  .format((t1-t0)*1000))
-                # self.frameTimes.pop(0)
-                # if hasattr(self, 'lastFrameTime'):
-                #     self.frameTimes.append(time.time()-self.lastFrameTime)
-                # self.lastFrameTime = time.time()
-                # if self.takeTimeStamp:
-                #     logging.debug("Callback durations: {}".format(self.frameTimes))
-                #     self.takeTimeStamp = False
+        duration = clock.getTime() - t0
+        self.nCallbacks += 1
+        self.lastCallbackDuration = duration
+        self._totalCallbackDuration += duration
+        if duration > self.maxCallbackDuration:
+            self.maxCallbackDuration = duration
+
+    def getCallbackStats(self):
+        """Returns a dict of the number of callbacks since the stats were
+        reset, and the mean, max and last time (secs) the callback took to
+        mix the sounds. `load` is the mean time as a fraction of the time
+        each block lasts; the stream can't keep up as it nears 1.
+        """
+        mean = self._totalCallbackDuration / max(self.nCallbacks, 1)
+        return dict(nCallbacks=self.nCallbacks, mean=mean,
+                    max=self.maxCallbackDuration,
+                    last=self.lastCallbackDuration,
+                    load=mean * self.sampleRate / self.blockSize)
+
+    def resetCallbackStats(self):
+        self.nCallbacks = 0
+        self.lastCallbackDuration = 0.0
+        self.maxCallbackDuration = 0.0
+        self._totalCallbackDuration = 0.0
 
     def add(self, sound):
         # t0 = time.time()
@@ -258,9 +467,12 @@ class SoundDeviceSound(_SoundBase):
         :param blockSize: the size of the buffer on the sound card
                          (small for low latency, large for stability)
         :param preBuffer: integer to control streaming/buffering
-                           - -1 means store all
-                           - 0 (no buffer) means stream from disk
-                           - potentially we could buffer a few secs(!?)
+                           - -1 means store all (decoded arrays are
+                             cached, see `decodedAudio`)
+                           - 0 means stream from disk, read 0.5 s ahead
+                             by a background thread
+                           - n > 0 means stream from disk, read n secs
+                             ahead by a background thread
         :param hamming: boolean (default True) to indicate if the sound should
                         be apodized (i.e., the onset and offset smoothly ramped up from
                         down to zero). The function apodize uses a Hanning window, but
@@ -294,6 +506,11 @@ class SoundDeviceSound(_SoundBase):
         self.sourceType = 'unknown'  # set to be file, array or freq
         self.sndFile = None
         self.sndArr = None
+        self._streamer = None  # reads files ahead when streaming
+        self._tone = None  # a rendered tone, shared with other sounds
+        self._phase = 0.0  # of synthesised tones, in cycles
+        self._blockRamp = None  # sample numbers of a block, for tones
+        self._blockPhase = None
         self.hamming = hamming
         self._hammingWindow = None  # will be created during setSound
 
@@ -341,6 +558,9 @@ class SoundDeviceSound(_SoundBase):
                 output sounds in the bottom octave (1) and the top
                 octave (8) is generally painful
         """
+        if self._streamer is not None:
+            self._streamer.close()
+            self._streamer = None
         # start with the base class method
         _SoundBase.setSound(self, value, secs, octave, hamming, log)
         try:
@@ -367,7 +587,15 @@ class SoundDeviceSound(_SoundBase):
             hamming = self.hamming
         else:
             self.hamming = hamming
-        if hamming:
+        self._tone = None
+        self._hammingWindow = None
+        if (self.sourceType == 'freq' and
+                0 < self.secs <= maxRenderedToneSecs):
+            # short tones are played from a buffer rendered once (with any
+            # window), and shared by all sounds with the same tone
+            self._tone = renderTone(self.freq, self.secs, self.sampleRate,
+                                    hamming)
+        elif hamming:
             # 5ms or 15th of stimulus (for short sounds)
             hammDur = min(0.005,  # 5ms
                           self.secs / 15.0)  # 15th of stim
@@ -398,22 +626,34 @@ class SoundDeviceSound(_SoundBase):
         # can now calculate duration in frames
         self.durationFrames = int(round(self.duration * self.sampleRate))
         # are we preloading or streaming?
-        if self.preBuffer == 0:
-            # no buffer - stream from disk on each call to nextBlock
-            pass
+        if self.preBuffer >= 0:
+            # stream from disk, with a thread reading ahead of nextBlock
+            bufferSecs = self.preBuffer or 0.5
+            startFrame = int(self.t * self.sampleRate)
+            self._streamer = _FileStreamer(
+                f, startFrame, startFrame + self.durationFrames,
+                bufferFrames=int(bufferSecs * self.sampleRate))
+            self._channelCheck(self._streamer.buffer)
         elif self.preBuffer == -1:
-            # full pre-buffer. Load requested duration to memory
-            sndArr = self.sndFile.read(
-                frames=int(self.sampleRate * self.duration))
+            # full pre-buffer. Load requested duration to memory, unless
+            # this section of the file has already been decoded
+            cacheKey = (filename, self.startTime, self.stopTime,
+                        self.sampleRate)
+            sndArr = decodedAudio.get(*cacheKey)
+            if sndArr is None:
+                sndArr = decodedAudio.add(*(cacheKey + (self.sndFile.read(
+                    frames=int(self.sampleRate * self.duration)),)))
             self.sndFile.close()
-            self._setSndFromArray(sndArr)
-        self._channelCheck(self.sndArr)  # Check for fewer channels in stream vs data array
+            # a view, so reshaping it leaves the cached array alone
+            self._setSndFromArray(sndArr.view())
+            self._channelCheck(self.sndArr)  # Check for fewer channels in stream vs data array
 
     def _setSndFromFreq(self, thisFreq, secs, hamming=True):
         self.freq = thisFreq
         self.secs = secs
         self.sourceType = 'freq'
         self.t = 0
+        self._phase = 0.0
         self.duration = self.secs
         if self.stereo == -1:
             self.stereo = 0
@@ -484,15 +724,23 @@ class SoundDeviceSound(_SoundBase):
             self.seek(0)
         self.status = STOPPED
 
-    def _nextBlock(self):
+    def _nextBlock(self, out=None):
+        """Returns the next block of the sound, with any hamming window
+        applied (but not the volume).
+
+        If out is given (the stream's blockSize x channels scratch array)
+        the block is written into the start of it, expanded to all its
+        channels, and that part of out is returned. Otherwise a new array
+        is returned, or for arrays without a window a view of the array.
+        Arrays the sound is played from are never changed.
+        """
         if self.status == STOPPED:
             return
         samplesLeft = int((self.stopTime - self.t) * self.sampleRate)
         nSamples = min(self.blockSize, samplesLeft)
-        if self.sourceType == 'file' and self.preBuffer == 0:
-            # streaming sound block-by-block direct from file
-            block = self.sndFile.read(nSamples)
-            # TODO: check if we already finished using sndFile?
+        if self.sourceType == 'file' and self._streamer is not None:
+            # streaming sound block-by-block, read ahead from the file
+            block = self._streamer.read(self.blockSize, out)
         elif (self.sourceType == 'file' and self.preBuffer == -1) \
                 or self.sourceType == 'array':
             # An array, or a file entirely loaded into an array
@@ -506,24 +754,52 @@ class SoundDeviceSound(_SoundBase):
                               .format(self.stereo))
             if ii + nSamples > len(self.sndArr):
                 self._EOS()
+            if out is not None:
+                np.copyto(out[:len(block)], block)
+                block = out[:len(block)]
+
+        elif self.sourceType == 'freq' and self._tone is not None:
+            # a rendered tone, padded with zeros to the end of the block
+            ii = int(round(self.t * self.sampleRate))
+            tone = self._tone[ii:ii + self.blockSize]
+            if out is None:
+                block = np.zeros((self.blockSize, 1))
+            else:
+                block = out[:self.blockSize]
+                block[len(tone):] = 0
+            np.copyto(block[:len(tone)], tone)
+            if self.t + self.blockSize/float(self.sampleRate) > self.secs:
+                self._EOS(reset=False)  # don't set t=0
 
         elif self.sourceType == 'freq':
+            # a long tone, synthesised block by block
             startT = self.t
             stopT = self.t + self.blockSize/float(self.sampleRate)
-            xx = np.linspace(
-                start=startT * self.freq * 2 * np.pi,
-                stop=stopT * self.freq * 2 * np.pi,
-                num=self.blockSize, endpoint=False
-            )
-            xx.shape = [self.blockSize, 1]
-            block = np.sin(xx)
+            if self._blockRamp is None or \
+                    len(self._blockRamp) != self.blockSize:
+                self._blockRamp = np.arange(self.blockSize, dtype=float)
+                self._blockPhase = np.empty(self.blockSize)
+            if out is None:
+                block = np.empty((self.blockSize, 1))
+            else:
+                block = out[:self.blockSize]
+            # the phase of each sample (in float64, as out may be float32),
+            # from the phase the last block ended on, then its sine
+            xx = self._blockPhase
+            np.multiply(self._blockRamp,
+                        self.freq * 2 * np.pi / self.sampleRate, out=xx)
+            xx += self._phase * 2 * np.pi
+            np.sin(xx, out=block[:, 0])
+            self._phase = (self._phase + self.blockSize * self.freq /
+                           float(self.sampleRate)) % 1.0
             # if run beyond our desired t then set to zeros
             if stopT > (self.secs):
-                tRange = np.linspace(startT, self.blockSize*self.sampleRate,
-                                     num=self.blockSize, endpoint=False)
-                block[tRange > self.secs] = 0
+                nLeft = int(round((self.secs - startT) * self.sampleRate))
+                block[max(nLeft, 0):, 0] = 0
                 # and inform our EOS function that we finished
                 self._EOS(reset=False)  # don't set t=0
+            if block.shape[1] > 1:
+                block[:, 1:] = block[:, :1]
 
         else:
             raise IOError("SoundDeviceSound._nextBlock doesn't correctly handle"
@@ -531,20 +807,24 @@ class SoundDeviceSound(_SoundBase):
 
         if self._hammingWindow:
             thisWin = self._hammingWindow.nextBlock(self.t, self.blockSize)
-            if thisWin is not None:
-                if len(block) == len(thisWin):
-                    block *= thisWin
-                elif block.shape[0] == 0:
-                    pass
+            if thisWin is not None and block.shape[0]:
+                thisWin = thisWin[0:len(block)]
+                if out is None:
+                    # not in place, as the block may be a view of an array
+                    block = block * thisWin
                 else:
-                    block *= thisWin[0:len(block)]
+                    np.multiply(block, thisWin, out=block)
         self.t += self.blockSize/float(self.sampleRate)
         return block
 
     def seek(self, t):
         self.t = t
         self.frameN = int(round(t * self.sampleRate))
-        if self.sndFile and not self.sndFile.closed:
+        if self.sourceType == 'freq':
+            self._phase = (t * self.freq) % 1.0
+        if self._streamer is not None:
+            self._streamer.seek(self.frameN)
+        elif self.sndFile and not self.sndFile.closed:
             self.sndFile.seek(self.frameN)
 
     def _EOS(self, reset=True):
@@ -559,6 +839,16 @@ class SoundDeviceSound(_SoundBase):
         streams[self.streamLabel].remove(self)
         self.status = FINISHED
 
+    @property
+    def underruns(self):
+        """Read-only property returning how many blocks a streamed sound
+        has played with missing frames, as the file wasn't read in time
+        (always 0 for sounds that aren't streamed)
+        """
+        if self._streamer is None:
+            return 0
+        return self._streamer.underruns
+
     @property
     def stream(self):
         """Read-only property returns the the stream on which the sound
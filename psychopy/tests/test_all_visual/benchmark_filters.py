@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Times psychopy.visual.filters for square images of 256 to 2048 pixels:
+
+    - making a Butterworth lowpass filter, the first time (computed) and
+      again (a copy of the cached filter)
+    - filtering an image with the full complex transforms
+      (`real(ifft2(ifftshift(imfft(image) * filt)))`) and with filterImage
+      (real transforms)
+    - filtering a stack of images one by one with the complex transforms,
+      and in one call to filterImages
+
+Times are in milliseconds.
+
+Not part of the test suite.
+
+command-line usage:
+    python benchmark_filters.py [number of images in the stack]
+"""
+
+from __future__ import print_function, division
+
+import sys
+from timeit import default_timer
+
+import numpy as np
+from numpy.fft import ifft2, ifftshift
+
+from psychopy.visual import filters
+
+SIZES = (256, 512, 1024, 2048)
+
+
+def timeCall(func, *args):
+    t0 = default_timer()
+    func(*args)
+    return default_timer() - t0
+
+
+def complexFilter(image, filt):
+    return np.real(ifft2(ifftshift(filters.imfft(image) * filt)))
+
+
+def main(nImages):
+    rng = np.random.RandomState(0)
+    print('%6s %10s %10s %10s %10s %12s %12s' %
+          ('size', 'lp new', 'lp cached', 'complex', 'rfft',
+           'stack loop', 'stack batch'))
+    for size in SIZES:
+        filters.filterCache.clear()
+        shape = (size, size)
+        made = timeCall(filters.butter2d_lp, shape, 0.2, 3)
+        cached = timeCall(filters.butter2d_lp, shape, 0.2, 3)
+        filt = filters.butter2d_lp(shape, 0.2, 3)
+        image = rng.uniform(-1, 1, shape)
+        full = timeCall(complexFilter, image, filt)
+        real = timeCall(filters.filterImage, image, filt)
+        images = rng.uniform(-1, 1, (nImages,) + shape)
+        loop = timeCall(lambda: [complexFilter(im, filt) for im in images])
+        batch = timeCall(filters.filterImages, images, filt)
+        print('%6d %10.1f %10.1f %10.1f %10.1f %12.1f %12.1f' %
+              (size, made * 1e3, cached * 1e3, full * 1e3, real * 1e3,
+               loop * 1e3, batch * 1e3))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8)
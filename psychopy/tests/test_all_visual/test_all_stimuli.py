@@ -55,6 +55,63 @@ class Test_Window(object):
         self.win.saveFrameIntervals(os.path.join(self.temp_dir, 'junkFrameInts'))
         fps = self.win.fps()
 
+    def test_textureCache(self):
+        from psychopy.visual import basevisual
+        cache = basevisual.textureCache
+        cache.clear()
+        visual.GratingStim(self.win, tex='sin', mask='gauss', texRes=64)
+        misses = cache.misses
+        hits = cache.hits
+        # further stimuli with the same texture and mask use the cached ones
+        stims = [visual.GratingStim(self.win, tex='sin', mask='gauss',
+                                    texRes=64) for _ in range(3)]
+        assert cache.misses == misses
+        assert cache.hits >= hits + 6
+        for stim in stims:
+            stim.draw()
+        self.win.flip()
+
+    def test_imagePreloader(self):
+        from psychopy.visual import basevisual
+        fileNames = [os.path.join(utils.TESTS_DATA_PATH, name)
+                     for name in ('testimage.jpg', 'testimagegray.jpg')]
+        basevisual.preloadedImages.clear()
+        preloader = visual.ImagePreloader(self.win, nThreads=2)
+        preloader.preloadConditions([{'image': name, 'ori': 0}
+                                     for name in fileNames])
+        assert preloader.wait(timeout=10)
+        assert all(preloader.isReady(name) for name in fileNames)
+        hits = basevisual.preloadedImages.hits
+        stim = visual.ImageStim(self.win, image=fileNames[0])
+        stim.image = fileNames[1]
+        assert basevisual.preloadedImages.hits == hits + 2
+        assert stim.isLumImage
+        stim.draw()
+        self.win.flip()
+        preloader.close()
+
+    def test_imageSet(self):
+        from psychopy.tools.imagetools import packImages
+        fileNames = [os.path.join(utils.TESTS_DATA_PATH, name)
+                     for name in ('testimage.jpg', 'testimagegray.jpg')]
+        images = packImages(fileNames,
+                            os.path.join(self.temp_dir, 'images.npy'))
+        stim = visual.ImageStim(self.win, image=images[0])
+        assert not stim.isLumImage
+        stim.draw()
+        stim.image = images[fileNames[1]]
+        assert stim.isLumImage
+        stim.draw()
+        self.win.flip()
+        # a packed image looks the same as the file it came from
+        frames = []
+        for image in (images[fileNames[1]], fileNames[1]):
+            visual.ImageStim(self.win, image=image).draw()
+            frames.append(numpy.array(self.win._getFrame(buffer='back'),
+                                      numpy.int16))
+            self.win.flip()
+        assert numpy.abs(frames[0] - frames[1]).max() <= 1
+
     def test_callonFlip(self):
         def assertThisIs2(val):
             assert val==2
@@ -179,6 +236,33 @@ class _baseVisualTest(object):
         win.flip()
         str(image)
 
+    def test_noiseBank(self):
+        win = self.win
+        size = numpy.array([2.0,2.0])*self.scaleFactor
+        noise = visual.NoiseStim(win=win, units=win.units, size=size,
+            texRes=64, noiseType='Filtered', noiseFractalPower=-1,
+            noiseFilterLower=2.0/size[0], noiseFilterUpper=16.0/size[0],
+            noiseFilterOrder=1, noiseClip=4.0)
+        noise.makeNoiseBank(5)
+        assert noise._noiseBank.shape == (5, 64, 64)
+        assert noise._noiseBank.dtype == numpy.float32
+        for i in range(1, 7):  # the first is shown once the bank is made
+            noise.updateNoise()
+            assert numpy.array_equal(noise.tex, noise._noiseBank[i % 5])
+        noise.draw()
+        win.flip()
+        # the filter is shared with new stimuli, and the bank is remade
+        # for new parameters
+        from psychopy.visual.noise import noiseFilters
+        hits = noiseFilters.hits
+        noise.buildNoise()
+        assert noiseFilters.hits == hits + 1
+        noise.noiseFilterOrder = 2
+        noise.draw()
+        assert noise._noiseBank.shape == (5, 64, 64)
+        noise.clearNoiseBank()
+        noise.updateNoise()
+
     def test_envelopeBeatAndRaisedCos(self):
         win = self.win
         size = numpy.array([2.0,2.0])*self.scaleFactor
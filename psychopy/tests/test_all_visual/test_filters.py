@@ -0,0 +1,56 @@
+from __future__ import division
+
+import numpy
+from numpy.fft import fft2, ifft2, ifftshift
+
+from psychopy.visual import filters
+
+
+def complexFilter(image, filt):
+    return numpy.real(ifft2(ifftshift(filters.imfft(image) * filt)))
+
+
+class TestFilters(object):
+
+    def setup_method(self):
+        self.rng = numpy.random.RandomState(0)
+
+    def test_cachedButterworth(self):
+        filters.filterCache.clear()
+        x = numpy.linspace(-0.5, 0.5, 33)
+        y = numpy.linspace(-0.5, 0.5, 32)
+        radius = numpy.sqrt((x**2)[numpy.newaxis] + (y**2)[:, numpy.newaxis])
+        expected = 1 / (1.0 + (radius / 0.3)**6)
+        lp = filters.butter2d_lp((32, 33), 0.3, 3)
+        assert numpy.array_equal(lp, expected)
+        hits = filters.filterCache.hits
+        # returned filters can still be changed without affecting the cache
+        lp[:] = 0
+        assert numpy.array_equal(filters.butter2d_lp((32, 33), 0.3, 3),
+                                 expected)
+        assert filters.filterCache.hits == hits + 1
+        assert numpy.array_equal(filters.butter2d_hp((32, 33), 0.3, 3),
+                                 1.0 - expected)
+
+    def test_filterImage(self):
+        for shape in [(64, 64), (48, 35)]:
+            image = self.rng.uniform(-1, 1, shape)
+            for filt in [filters.butter2d_bp(shape, 0.1, 0.3, 2),
+                         filters.butter2d_lp_elliptic(shape, 0.2, 0.4,
+                                                      alpha=0.5)]:
+                numpy.testing.assert_allclose(
+                    filters.filterImage(image, filt),
+                    complexFilter(image, filt), atol=1e-12)
+                images = self.rng.uniform(-1, 1, (3,) + shape)
+                filtered = filters.filterImages(images, filt)
+                for i in range(3):
+                    numpy.testing.assert_allclose(
+                        filtered[i], complexFilter(images[i], filt),
+                        atol=1e-12)
+
+    def test_conv2d(self):
+        a = self.rng.uniform(-1, 1, (32, 31))
+        b = self.rng.uniform(-1, 1, (32, 31))
+        numpy.testing.assert_allclose(filters.conv2d(a, b),
+                                      ifft2(fft2(a) * fft2(b)).real,
+                                      atol=1e-12)
@@ -0,0 +1,107 @@
+from __future__ import division
+
+import os
+import shutil
+from tempfile import mkdtemp
+
+import numpy
+
+from psychopy.visual.frameintervals import FrameIntervalRecorder
+
+
+class TestFrameIntervalRecorder(object):
+
+    def setup_method(self):
+        self.tmpDir = mkdtemp(prefix='psychopy-tests-frameintervals')
+        rng = numpy.random.RandomState(0)
+        self.intervals = (1 / 60.0 + rng.normal(0, 0.0005, 1000)).tolist()
+        self.intervals[500] = 0.05  # two dropped frames
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmpDir)
+
+    def check(self, recorder):
+        intervals = self.intervals
+        assert len(recorder) == len(intervals)
+        assert recorder == intervals
+        assert list(recorder) == intervals
+        assert recorder[-10:] == intervals[-10:]
+        assert recorder[3:900:7] == intervals[3:900:7]
+        assert recorder[-1] == intervals[-1]
+        assert str(recorder) == str(intervals)
+        numpy.testing.assert_array_equal(numpy.array(recorder), intervals)
+
+    def test_sequence(self):
+        recorder = FrameIntervalRecorder(blockSize=64)
+        recorder.extend(self.intervals)
+        self.check(recorder)
+        recorder.clear()
+        assert recorder == [] and recorder.mean is None
+
+    def test_spillFile(self):
+        spillFile = os.path.join(self.tmpDir, 'intervals.dat')
+        recorder = FrameIntervalRecorder(blockSize=64, spillFile=spillFile)
+        recorder.extend(self.intervals)
+        assert len(recorder._blocks) == 1
+        self.check(recorder)
+        recorder.close()
+        assert os.path.getsize(spillFile) == 15 * 64 * 8
+
+    def test_statistics(self):
+        recorder = FrameIntervalRecorder(blockSize=64)
+        recorder.extend(self.intervals)
+        numpy.testing.assert_allclose(recorder.mean,
+                                      numpy.mean(self.intervals))
+        numpy.testing.assert_allclose(recorder.sd,
+                                      numpy.std(self.intervals, ddof=1))
+        assert (recorder.min, recorder.max) == (min(self.intervals), 0.05)
+        for q in (1, 50, 95, 99):
+            numpy.testing.assert_allclose(
+                recorder.percentile(q), numpy.percentile(self.intervals, q),
+                atol=0.0001)
+        threshold = 1 / 60.0 * 1.2
+        assert recorder.countAbove(threshold) == 1
+        assert recorder.countAbove(numpy.median(self.intervals)) == 500
+
+    def test_segmentsAndSaving(self):
+        recorder = FrameIntervalRecorder(blockSize=64)
+        recorder.extend(self.intervals[:100])
+        recorder.addMarker('trial')
+        recorder.extend(self.intervals[100:600])
+        recorder.addMarker(u'feedback')
+        recorder.extend(self.intervals[600:])
+        assert recorder.segments() == [(None, 0, 100), ('trial', 100, 600),
+                                       (u'feedback', 600, 1000)]
+        stats = recorder.segmentStats(threshold=0.02)
+        assert [s['n'] for s in stats] == [100, 500, 400]
+        assert [s['nAbove'] for s in stats] == [0, 1, 0]
+        numpy.testing.assert_allclose(stats[1]['max'], 0.05)
+
+        fileName = os.path.join(self.tmpDir, 'intervals.npz')
+        recorder.save(fileName)
+        loaded = FrameIntervalRecorder.load(fileName)
+        self.check(loaded)
+        assert loaded.segments() == recorder.segments()
+
+    def test_listMethods(self):
+        spillFile = os.path.join(self.tmpDir, 'intervals.dat')
+        recorder = FrameIntervalRecorder(blockSize=64, spillFile=spillFile)
+        intervals = self.intervals[:200]
+        recorder.extend(intervals[:100])
+        recorder.addMarker('trial')
+        recorder += intervals[100:200]
+        assert recorder == intervals
+        assert recorder + [1.0] == intervals + [1.0]
+        assert [1.0] + recorder == [1.0] + intervals
+        assert recorder.pop() == intervals.pop()
+        assert recorder.pop(0) == intervals.pop(0)
+        del recorder[-5:]
+        del intervals[-5:]
+        del recorder[10:20:3]
+        del intervals[10:20:3]
+        del recorder[150]
+        del intervals[150]
+        assert recorder == intervals
+        assert recorder.segments() == [(None, 0, 95), ('trial', 95, 188)]
+        numpy.testing.assert_allclose(recorder.mean, numpy.mean(intervals))
+        assert recorder.max == max(intervals)
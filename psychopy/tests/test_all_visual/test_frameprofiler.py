@@ -0,0 +1,112 @@
+from __future__ import division
+
+import json
+import os
+import shutil
+from tempfile import mkdtemp
+
+import numpy
+
+from psychopy.visual import frameprofiler
+from psychopy.visual.frameprofiler import FrameProfiler, PHASES
+
+
+class FakeStim(object):
+    def __init__(self, name, durations):
+        self.name = name
+        self.durations = durations
+        self.nDrawn = 0
+
+    def draw(self):
+        self.nDrawn += 1
+
+
+class FakeClock(object):
+    """Advances by a set amount each time it is read"""
+    def __init__(self):
+        self.t = 0.0
+        self.steps = []
+
+    def __call__(self):
+        if self.steps:
+            self.t += self.steps.pop(0)
+        return self.t
+
+
+def profileFrame(profiler, fakeClock, stimuli):
+    """Run the profiler through one flip(), each phase taking 1ms and each
+    stimulus its next duration"""
+    fakeClock.steps = [0.0]  # beginFrame
+    for stim in stimuli:
+        fakeClock.steps.extend([0.0, stim.durations[stim.nDrawn]])
+    # the draw phase ends 1ms after the last draw
+    fakeClock.steps.extend([0.001] * len(PHASES))
+    profiler.beginFrame()
+    for stim in stimuli:
+        profiler.drawStim(stim)
+    for phase in range(len(PHASES)):
+        profiler.endPhase(phase)
+    profiler.endFrame()
+
+
+class TestFrameProfiler(object):
+
+    def setup_method(self):
+        self.profiler = FrameProfiler(nFrames=4, maxStimuli=2)
+        self.clock = self.profiler._getTime = FakeClock()
+        self.stimuli = [FakeStim('slow', [0.010] * 6),
+                        FakeStim('fast', [0.001, 0.002] * 3),
+                        FakeStim('untimed', [0.001] * 6)]
+
+    def test_summary(self):
+        for _ in range(6):
+            profileFrame(self.profiler, self.clock, self.stimuli)
+        assert self.stimuli[2].nDrawn == 6  # drawn, if not timed separately
+        summary = self.profiler.summary(percentiles=(50, 100), topN=5)
+        # only the last 4 frames are kept
+        assert summary['nFrames'] == 4
+        draw = summary['phases']['draw']
+        numpy.testing.assert_allclose(
+            [draw['mean'], draw['p50'], draw['p100']], [13.5, 13.5, 14])
+        numpy.testing.assert_allclose(summary['phases']['swap']['mean'], 1)
+        numpy.testing.assert_allclose(summary['phases']['total']['mean'],
+                                      13.5 + len(PHASES) - 1)
+        assert [s['name'] for s in summary['stimuli']] == ['slow', 'fast']
+        fast = summary['stimuli'][1]
+        assert fast['nDraws'] == 4
+        numpy.testing.assert_allclose(
+            [fast['total'], fast['mean'], fast['max']], [6, 1.5, 2])
+
+    def test_chromeTrace(self):
+        for _ in range(2):
+            profileFrame(self.profiler, self.clock, self.stimuli[:2])
+        tmpDir = mkdtemp(prefix='psychopy-tests-frameprofiler')
+        try:
+            fileName = os.path.join(tmpDir, 'trace.json')
+            self.profiler.saveChromeTrace(fileName)
+            with open(fileName) as f:
+                events = json.load(f)['traceEvents']
+        finally:
+            shutil.rmtree(tmpDir)
+        # a flip, its phases and its stimulus draws for each frame
+        assert len(events) == 2 * (1 + len(PHASES) + 2)
+        flip, draw = events[0], events[1]
+        assert (flip['name'], draw['name']) == ('flip', 'draw')
+        assert draw['ts'] == flip['ts']
+        numpy.testing.assert_allclose(draw['dur'], 12000)
+        stims = [e for e in events if e['cat'] == 'stim']
+        assert [e['name'] for e in stims[:2]] == ['slow', 'fast']
+        numpy.testing.assert_allclose(stims[1]['ts'] - stims[0]['ts'], 10000)
+
+    def test_replacedStim(self):
+        # a new stimulus is not mistaken for a deleted one with the same id
+        profileFrame(self.profiler, self.clock, [FakeStim('old', [0.001])])
+        profileFrame(self.profiler, self.clock, [FakeStim('new', [0.002])])
+        summary = self.profiler.summary()
+        assert sorted(s['name'] for s in summary['stimuli']) == ['new',
+                                                                 'old']
+        assert [s['nDraws'] for s in summary['stimuli']] == [1, 1]
+
+    def test_phaseConstants(self):
+        assert PHASES[frameprofiler.DRAW] == 'draw'
+        assert PHASES[frameprofiler.LOGGING] == 'logging'
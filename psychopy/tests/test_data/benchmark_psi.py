@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Compares the time per trial of the PsiHandler engines at several grid
+sizes.
+
+Not part of the test suite.
+
+command-line usage:
+    python benchmark_psi.py [nTrials]
+"""
+
+from __future__ import print_function, division
+
+import sys
+import timeit
+import numpy as np
+
+from psychopy import data, logging
+
+logging.console.setLevel(logging.ERROR)
+
+# (intensity, alpha, beta) step sizes; grids get finer down the list
+GRIDS = [(0.1, 0.1, 0.1),
+         (0.05, 0.05, 0.05),
+         (0.05, 0.025, 0.025),
+         (0.025, 0.02, 0.02)]
+
+ENGINES = [('classic', {}),
+           ('fast', {}),
+           ('fast', {'engineDtype': 'float32'}),
+           ('fast', {'engineThreads': 4})]
+
+
+def timePsi(grid, engine, options, nTrials):
+    """Returns (seconds per trial, grid size, intensities chosen)"""
+    psi = data.PsiHandler(nTrials=nTrials, intensRange=[0.1, 10],
+                          alphaRange=[0.1, 10], betaRange=[0.1, 3],
+                          intensPrecision=grid[0], alphaPrecision=grid[1],
+                          betaPrecision=grid[2], delta=0.01,
+                          engine=engine, **options)
+    rng = np.random.RandomState(seed=1)
+    t0 = timeit.default_timer()
+    for intensity in psi:
+        psi.addResponse(int(rng.rand() < 0.75))
+    secs = (timeit.default_timer() - t0) / nTrials
+    return secs, psi._psi._probResponseGivenLambdaX.size, psi.intensities
+
+
+def main(nTrials=20):
+    for grid in GRIDS:
+        classicIntensities = None
+        for engine, options in ENGINES:
+            try:
+                secs, size, intensities = timePsi(grid, engine, options,
+                                                  nTrials)
+            except MemoryError:
+                print('%s %s: out of memory' % (engine, options))
+                continue
+            if classicIntensities is None:
+                classicIntensities = intensities
+            same = np.mean(np.equal(intensities, classicIntensities))
+            print('grid %9i  %-8s %-28s %8.2f ms/trial  (%3i%% same x)'
+                  % (size, engine, options, secs * 1000, same * 100))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Times the trial sequencing of TrialHandler and TrialHandler2.
+
+Not part of the test suite (a million trials per method takes a while).
+
+command-line usage:
+    python benchmark_trialHandlers.py [nTrials]
+"""
+
+from __future__ import print_function, division
+
+import sys
+import timeit
+
+from psychopy import data, logging
+
+logging.console.setLevel(logging.ERROR)
+
+CONDITIONS = [{'cond': n} for n in range(10)]
+
+
+def runTrials(Handler, method, nTrials):
+    trials = Handler(CONDITIONS, nReps=nTrials // len(CONDITIONS),
+                     method=method, autoLog=False)
+    t0 = timeit.default_timer()
+    for trial in trials:
+        trials.getFutureTrial(1)
+        trials.getEarlierTrial(-1)
+    return timeit.default_timer() - t0
+
+
+def main(nTrials=1000000):
+    for Handler in (data.TrialHandler, data.TrialHandler2):
+        for method in ('sequential', 'random', 'fullRandom'):
+            secs = runTrials(Handler, method, nTrials)
+            print('%-14s %-11s %i trials: %6.2f s (%.2f us/trial)'
+                  % (Handler.__name__, method, nTrials, secs,
+                     secs / nTrials * 1e6))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -3,6 +3,7 @@
 from builtins import object
 from psychopy import data, logging
 import numpy as np
+import pandas as pd
 import os, glob, shutil
 from tempfile import mkdtemp
 
@@ -97,6 +98,110 @@ class TestExperimentHandler(object):
         contents = open(exp.dataFileName+'.csv', 'rU').read()
         assert contents == "mutable,\n[1],\n[9999],\n"
 
+    def test_columnar_matches_default(self):
+        # the columnar store must write exactly the same wide text file
+        contents = []
+        for columnar in (False, True):
+            fileName = os.path.join(self.tmpDir, 'columnar%i' % columnar)
+            exp = data.ExperimentHandler(
+                name='testExp',
+                extraInfo={'participant': 'jwp'},
+                savePickle=False,
+                saveWideText=False,
+                dataFileName=fileName,
+                columnar=columnar
+            )
+            conds = data.createFactorialTrialList(
+                {'word': ['a,b', 'c'], 'dur': [0.2, 1]})
+            trials = data.TrialHandler(trialList=conds, nReps=2,
+                                       method='sequential')
+            exp.addLoop(trials)
+            mutant = [1]
+            for n, trial in enumerate(trials):
+                exp.addData('rt', n * 0.1)
+                exp.addData('corr', n % 2 == 0)
+                exp.addData('list', mutant)
+                mutant[0] = n
+                if n == 3:
+                    exp.addData('late', 3)  # a column that appears late
+                    exp.addData('rt', 'timeout')  # type changes mid-column
+                exp.nextEntry()
+            exp.addData('orphan', 1)
+            exp.saveAsWideText(fileName + '.csv', delim=',')
+            with open(fileName + '.csv') as f:
+                contents.append(f.read())
+            assert len(exp.getAllEntries()) == 9
+        assert contents[0] == contents[1]
+
+    def test_columnar_to_dataframe(self):
+        exp = data.ExperimentHandler(savePickle=False, saveWideText=False,
+                                     columnar=True)
+        for n in range(100):
+            exp.addData('n', n)
+            exp.addData('rt', n / 10.0)
+            if n % 2:
+                exp.addData('odd', 'yes')
+            exp.nextEntry()
+        assert exp.entries[5] == {'n': 5, 'rt': 0.5, 'odd': 'yes'}
+        df = exp.to_dataframe()
+        assert list(df.columns) == ['n', 'rt', 'odd']
+        assert df['n'].dtype == np.int64
+        assert np.isnan(df['odd'][0]) and df['odd'][1] == 'yes'
+        values, present = exp.entries.getColumn('rt')
+        assert np.shares_memory(df['rt'].values, values)
+
+    def test_columnar_mixed_numbers(self):
+        # ints mixed with floats or None give float columns, as they do
+        # from a list of dicts, but entries keep the original values
+        handlers = [data.ExperimentHandler(savePickle=False,
+                                           saveWideText=False,
+                                           columnar=columnar)
+                    for columnar in (False, True)]
+        for exp in handlers:
+            for rt, resp in [(1, None), (0.5, 2), (None, 3), (2, 'x')]:
+                exp.addData('rt', rt)
+                exp.addData('resp', resp)
+                exp.nextEntry()
+            exp.addData('n', 1)
+            exp.nextEntry()
+        default, columnar = [exp.to_dataframe() for exp in handlers]
+        pd.testing.assert_frame_equal(columnar, default)
+        assert columnar['rt'].dtype == np.float64
+        assert columnar['rt'].sum() == 3.5
+        assert handlers[1].entries[0] == {'rt': 1, 'resp': None}
+        assert handlers[1].getAllEntries() == handlers[0].getAllEntries()
+
+    def test_streamWideText(self):
+        fileName = os.path.join(self.tmpDir, 'streamed')
+        exp = data.ExperimentHandler(
+            name='testExp',
+            extraInfo={'participant': 'jwp'},
+            savePickle=False,
+            saveWideText=True,
+            dataFileName=fileName,
+            streamWideText=True
+        )
+        for n in range(10):
+            exp.addData('n', n)
+            if n >= 5:
+                exp.addData('late', 'x,y')  # new column mid-session
+            exp.nextEntry()
+        # everything so far should be on disk before the session ends
+        writer = exp._streamWriter
+        writer.flush()
+        with open(writer.fileName) as f:
+            lines = f.read().splitlines()
+        assert lines[0] == 'n,participant,late,'
+        assert lines[1] == '0,jwp,'
+        assert lines[10] == '9,jwp,"x,y",'
+        assert writer.nWritten == 10
+        # on close the file is rewritten in the standard layout
+        exp.close()
+        with open(writer.fileName) as f:
+            lines = f.read().splitlines()
+        assert lines[0] == 'n,late,participant,'
+        assert lines[10] == '9,"x,y",jwp,'
+
     def test_unicode_conditions(self):
         fileName = self.tmpDir + 'unicode_conds'
 
@@ -435,6 +435,21 @@ class TestQuestHandler(_BaseTestStairHandler):
     """
     Test QuestHandler, but with the ExperimentHandler attached as well.
     """
+    def test_mode_ties(self):
+        # tied maxima give the same mode as argsort, as they always have
+        from psychopy.contrib.quest import QuestObject
+        q = QuestObject(tGuess=0, tGuessSd=1, pThreshold=0.82, beta=3.5,
+                        delta=0.01, gamma=0.5)
+        flat = np.ones(len(q.pdf))
+        peaks = np.zeros(len(q.pdf))
+        peaks[[10, 50, 90]] = 1
+        for pdf in (flat, peaks, np.arange(len(q.pdf))):
+            q.pdf = pdf  # the summaries follow an assigned pdf
+            t, p = q.mode()
+            assert t == q.x[np.argsort(pdf)[-1]] + q.tGuess
+            assert np.isclose(q.mean(),
+                              np.dot(pdf, q.x) / pdf.sum() + q.tGuess)
+
     def test_QuestHandler(self):
         nTrials = 10
         startVal, minVal, maxVal = 50, 0, 100
@@ -489,6 +504,29 @@ class TestQuestHandler(_BaseTestStairHandler):
         assert self.stairs._quest.x[0] == -range/2
         assert self.stairs._quest.x[-1] == range/2
 
+    def test_recompute(self):
+        q = data.QuestHandler(0.5, 0.2, pThreshold=0.63, gamma=0.01,
+                              nTrials=40, minVal=0, maxVal=1)
+        for intensity, response in zip(q, [1, 1, 1, 0, 1, 0, 0, 1] * 5):
+            q.addResponse(response)
+        quest = q._quest
+        pdf = quest.pdf.copy()
+        estimates = [quest.mean(), quest.sd(), quest.quantile(),
+                     quest.mode()[0]]
+
+        # rebuilding the pdf from the history gives the same posterior
+        quest.recompute()
+        assert np.allclose(quest.pdf, pdf, rtol=1e-9)
+        assert np.allclose([quest.mean(), quest.sd(), quest.quantile(),
+                            quest.mode()[0]], estimates)
+
+        quest.normalizePdf = True
+        quest.recompute()
+        assert np.isclose(quest.pdf.sum(), 1)
+        assert np.allclose(quest.pdf, pdf / pdf.sum(), rtol=1e-9)
+        assert np.allclose([quest.mean(), quest.sd(), quest.quantile(),
+                            quest.mode()[0]], estimates)
+
     def test_comparison_equals(self):
         q1 = data.QuestHandler(0.5, 0.2, pThreshold=0.63, gamma=0.01,
                                nTrials=20, minVal=0, maxVal=1)
@@ -649,6 +687,59 @@ class TestPsiHandler(_BaseTestStairHandler):
         p2.__next__()
         assert p1 != p2
 
+    def test_fast_engine(self):
+        # the fast engine should choose the same intensities
+        kwargs = dict(nTrials=20, intensRange=[0.1, 10],
+                      alphaRange=[0.1, 10], betaRange=[0.1, 3],
+                      intensPrecision=0.1, alphaPrecision=0.1,
+                      betaPrecision=0.1, delta=0.01)
+        classic = data.PsiHandler(**kwargs)
+        fast = data.PsiHandler(engine='fast', **kwargs)
+        threaded = data.PsiHandler(engine='fast', engineThreads=2, **kwargs)
+        rng = np.random.RandomState(seed=1000)
+        for intensity in classic:
+            assert next(fast) == intensity
+            assert next(threaded) == intensity
+            response = int(rng.rand() < 0.8)
+            for p in (classic, fast, threaded):
+                p.addResponse(response)
+        assert np.allclose(classic.estimateLambda(), fast.estimateLambda())
+        assert np.allclose(classic._psi._expectedEntropyX,
+                           fast._psi._expectedEntropyX)
+
+    def test_fast_engine_pickled(self):
+        # a handler restored from a pickle should carry on updating its
+        # posterior (and so its estimates) as before
+        import pickle
+        kwargs = dict(nTrials=20, intensRange=[0.1, 10],
+                      alphaRange=[0.1, 10], betaRange=[0.1, 3],
+                      intensPrecision=0.1, alphaPrecision=0.1,
+                      betaPrecision=0.1, delta=0.01)
+        classic = data.PsiHandler(**kwargs)
+        fast = data.PsiHandler(engine='fast', **kwargs)
+        rng = np.random.RandomState(seed=1000)
+        for n, intensity in enumerate(classic):
+            if n == 5:
+                fast = pickle.loads(pickle.dumps(fast))
+            assert next(fast) == intensity
+            response = int(rng.rand() < 0.8)
+            for p in (classic, fast):
+                p.addResponse(response)
+        assert np.allclose(classic.estimateLambda(), fast.estimateLambda())
+
+    def test_json_dump_fast_engine(self):
+        p = data.PsiHandler(nTrials=10, intensRange=[0.1, 10],
+                            alphaRange=[0.1, 10], betaRange=[0.1, 3],
+                            intensPrecision=1, alphaPrecision=1,
+                            betaPrecision=0.5, delta=0.01, engine='fast',
+                            engineDtype='float32')
+        p.addResponse(1)
+        p.__next__()
+        dump = p.saveAsJson()
+
+        p.origin = ''
+        assert p == json_tricks.loads(dump)
+
     def test_json_dump(self):
         if _travisTesting:
             pytest.skip()
@@ -158,6 +158,68 @@ class TestTrialHandler2(object):
         utils.compareTextFiles(pjoin(self.temp_dir, 'testRandom.csv'),
                                pjoin(fixturesPath,'corrRandomTH2.csv'))
 
+    def test_future_and_earlier_trials(self):
+        for method in ('sequential', 'random', 'fullRandom'):
+            t = data.TrialHandler2(self.conditions, nReps=4, method=method,
+                                   seed=self.random_seed, autoLog=False)
+            seen = [t.getFutureTrial(n) for n in range(1, t.nTotal + 1)]
+            assert t.getFutureTrial(t.nTotal + 1) is None
+            ran = []
+            for trial in t:
+                ran.append(t.trialList[t.thisIndex])
+                if t.thisN > 0:
+                    assert t.getEarlierTrial(1) is ran[-2]
+            assert ran == seen
+            assert t.getEarlierTrial(t.nTotal + 1) is None
+
+    def test_fullRandom_repN(self):
+        t = data.TrialHandler2(self.conditions, nReps=4, method='fullRandom',
+                               seed=self.random_seed, autoLog=False)
+        counts = {}
+        for trial in t:
+            assert t.thisRepN == counts.get(t.thisIndex, 0)
+            counts[t.thisIndex] = t.thisRepN + 1
+        assert sorted(counts.values()) == [4, 4, 4]
+
+    def test_data_cache(self):
+        import pandas as pd
+        t = data.TrialHandler2(self.conditions, nReps=3, method='random',
+                               seed=self.random_seed, autoLog=False)
+        for trial in t:
+            frame = t.data
+            assert t.data is not frame  # a new frame on each access
+            t.addData('resp', t.thisN % 2 == 0)
+            if t.thisN == 4:
+                t.addData('resp', 'late')  # change type for current trial
+                t.addData('extra', [1, 2])
+            expected = pd.DataFrame(t._data)
+            pd.testing.assert_frame_equal(t.data, expected)
+
+    def test_data_matches_dicts(self):
+        import pandas as pd
+        conditions = [dict(a=1, word='x'), dict(a=2.5, word='y')]
+        t = data.TrialHandler2(conditions, nReps=2, method='sequential',
+                               autoLog=False)
+        for trial in t:
+            if t.thisN == 0:
+                t.addData('rt', 1)
+            elif t.thisN == 1:
+                t.addData('rt', 0.5)
+            elif t.thisN == 2:
+                t.addData('rt', None)
+            held = t.data
+            expected = pd.DataFrame(t._data)
+            pd.testing.assert_frame_equal(held, expected)
+            # frames are independent of each other and of later data
+            held['a'] = 0
+            expected['a'] = 0
+            t.addData('resp', 1)
+            pd.testing.assert_frame_equal(held, expected)
+            pd.testing.assert_frame_equal(t.data, pd.DataFrame(t._data))
+        assert t.data['a'].dtype == np.float64  # 1 and 2.5
+        assert t.data['rt'].dtype == np.float64
+        assert np.isnan(t.data['rt'][2]) and np.isnan(t.data['rt'][3])
+
     def test_comparison_equals(self):
         t1 = data.TrialHandler2([dict(foo=1)], 2, seed=self.random_seed)
         t2 = data.TrialHandler2([dict(foo=1)], 2, seed=self.random_seed)
@@ -0,0 +1,102 @@
+"""Test the batch staircase simulations against the handlers they mimic"""
+
+from __future__ import division, print_function
+
+from builtins import object
+import numpy as np
+
+from psychopy import data
+from psychopy.data.simulation import SimulationResult
+
+
+def _replay(handler, result, row):
+    """Feed the simulated responses of one staircase to `handler` and
+    check that it asks for the same intensities
+    """
+    intensities = []
+    for n, intensity in enumerate(handler):
+        intensities.append(intensity)
+        handler.addResponse(int(result.responses[row, n]))
+    assert len(intensities) == result.nTrials[row]
+    assert np.allclose(intensities,
+                       result.intensities[row, :len(intensities)])
+    assert np.isnan(result.intensities[row, len(intensities):]).all()
+    return handler
+
+
+class TestSimulation(object):
+
+    def test_stairs(self):
+        kwargs = dict(startVal=0.8, nReversals=8, stepSizes=[4, 2, 1],
+                      nTrials=20, stepType='lin', minVal=0, maxVal=1)
+        result = data.simulateStairs(
+            20, data.WeibullObserver(0.3), seed=1, **kwargs)
+        assert result.finished.all()
+        for row in range(20):
+            stairs = _replay(data.StairHandler(autoLog=False, **kwargs),
+                             result, row)
+            assert np.isclose(np.mean(stairs.reversalIntensities[-6:]),
+                              result.thresholds[row])
+
+    def test_stairs_db(self):
+        kwargs = dict(startVal=0.8, stepSizes=[8, 4, 2], nTrials=10,
+                      stepType='db')
+        thresholds = np.linspace(0.2, 0.4, 10)
+        result = data.simulateStairs(
+            10, data.WeibullObserver(thresholds), seed=2, **kwargs)
+        for row in range(10):
+            _replay(data.StairHandler(autoLog=False, **kwargs), result, row)
+
+    def test_quest(self):
+        for kwargs in [dict(nTrials=30),
+                       dict(stopInterval=0.3, method='mean')]:
+            kwargs.update(startVal=0, startValSd=0.5, minVal=-2, maxVal=1)
+            result = data.simulateQuest(10, tActual=-0.5, seed=3, **kwargs)
+            assert result.finished.all()
+            for row in range(10):
+                quest = _replay(data.QuestHandler(autoLog=False, **kwargs),
+                                result, row)
+                assert np.isclose(quest.mean(), result.thresholds[row])
+                assert np.isclose(quest.sd(), result.estimates['sd'][row])
+                assert np.isclose(quest.quantile(),
+                                  result.estimates['quantile'][row])
+
+    def test_psi(self):
+        args = ([0.01, 1], [0.01, 1], [0.01, 1], 0.01, 0.01, 0.05, 0.04)
+        result = data.simulatePsi(6, 15, *args, trueAlpha=0.3,
+                                  trueBeta=0.1, thresh=0.75, seed=4)
+        for row in range(6):
+            psi = _replay(data.PsiHandler(15, *args, engine='fast'),
+                          result, row)
+            assert np.allclose(psi.estimateLambda(),
+                               (result.estimates['alpha'][row],
+                                result.estimates['beta'][row]))
+            assert np.isclose(psi.estimateThreshold(0.75),
+                              result.thresholds[row])
+
+    def test_processes(self):
+        kwargs = dict(tActual=-0.5, startVal=0, startValSd=0.5,
+                      stopInterval=0.4, seed=5)
+        result = data.simulateQuest(9, nProcesses=3, **kwargs)
+        assert len(result) == 9
+        assert result.intensities.shape[1] == result.nTrials.max()
+        # the same seed gives the same staircases
+        again = data.simulateQuest(9, nProcesses=3, **kwargs)
+        assert np.array_equal(result.responses, again.responses)
+        assert np.allclose(result.thresholds, again.thresholds)
+
+    def test_concatenate(self):
+        parts = [SimulationResult(np.ones((2, n)), np.ones((2, n), 'int8'),
+                                  np.array([n, n]), np.ones(2, bool),
+                                  np.zeros(2), {'sd': np.zeros(2)})
+                 for n in (3, 5)]
+        joined = SimulationResult.concatenate(parts)
+        assert joined.intensities.shape == (4, 5)
+        assert np.isnan(joined.intensities[:2, 3:]).all()
+        assert (joined.responses[:2, 3:] == -1).all()
+        assert len(joined.estimates['sd']) == 4
+
+
+if __name__ == '__main__':
+    import pytest
+    pytest.main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Compares getting events from a hub process over UDP (a GET_EVENTS
+request answered by the ioHub udpServer) with reading them from the
+shared memory event buffer.
+
+A child process stands in for the ioHub Server: it creates events at a
+fixed rate (with the time they were created as their hub time) and serves
+them over UDP, or writes them to the shared buffer. The parent polls for
+them as an experiment would, and reports the delay between each event
+being created and it being received, the cost of a poll that finds no
+events, and how many events per second can be received while the hub
+creates them as fast as it can.
+
+Not part of the test suite.
+
+command-line usage:
+    python benchmark_event_transport.py [seconds]
+"""
+
+from __future__ import print_function, division
+
+import os
+import sys
+import tempfile
+import multiprocessing
+from timeit import default_timer
+
+import numpy as np
+
+from psychopy.iohub.net import UDPClientConnection
+from psychopy.iohub.client import ioHubConnection
+from psychopy.iohub.devices import DeviceEventBuffer
+from psychopy.iohub.shmem import SharedEventBuffer
+
+UDP_PORT = 9047
+EVENT_DTYPE = np.dtype([('experiment_id', 'u4'), ('session_id', 'u4'),
+                        ('device_id', 'u2'), ('event_id', 'u4'),
+                        ('type', 'u1'), ('device_time', 'f8'),
+                        ('logged_time', 'f8'), ('time', 'f8'),
+                        ('confidence_interval', 'f4'), ('delay', 'f4'),
+                        ('filter_id', 'i2'), ('key', 'S12'),
+                        ('modifiers', 'u4'), ('char', 'S4')])
+
+
+class BenchmarkHub(object):
+    """The parts of an ioServer that udpServer uses"""
+
+    def __init__(self, sharedEvents=None):
+        self.eventBuffer = DeviceEventBuffer(2048)
+        self.sharedEvents = sharedEvents
+
+    def log(self, text, level=None):
+        pass
+
+    def processDeviceEvents(self):
+        pass
+
+    def handleEvent(self, event):
+        if self.sharedEvents and self.sharedEvents.write(event, EVENT_DTYPE):
+            return
+        self.eventBuffer.append(event)
+
+
+def runHub(transport, path, interval, burst, duration, ready, finished):
+    import gevent
+    from psychopy.iohub.server import udpServer
+
+    sharedEvents = None
+    if transport == 'shared_memory':
+        sharedEvents = SharedEventBuffer.create(path, 32 * 1024 * 1024, 2048)
+    hub = BenchmarkHub(sharedEvents)
+    server = udpServer(hub, ':%d' % UDP_PORT)
+    server.start()
+
+    def createEvents():
+        eventID = 0
+        endTime = default_timer() + duration
+        while default_timer() < endTime:
+            for _ in range(burst):
+                t = default_timer()
+                hub.handleEvent([0, 0, 1, eventID, 22, t, t, t, 0.0, 0.0, 0,
+                                 'space', 0, ' '])
+                eventID += 1
+            gevent.sleep(interval)
+
+    ready.set()
+    gevent.spawn(createEvents).join()
+    while not finished.is_set():  # let the client collect the last events
+        gevent.sleep(0.01)
+    server.stop()
+    if sharedEvents:
+        sharedEvents.close()
+
+
+class UDPClient(object):
+    """Gets events the way ioHubConnection does without shared memory"""
+
+    def __init__(self):
+        self.udp_client = UDPClientConnection(remote_port=UDP_PORT)
+        self._isErrorReply = ioHubConnection._isErrorReply
+        self._send = ioHubConnection.__dict__['_sendToHubServer']
+        self.failed = 0
+
+    def getEvents(self):
+        # large replies are split over several datagrams, which can be
+        # dropped (or arrive after the request timed out); count those
+        # requests rather than stopping
+        try:
+            reply = self._send(self, ('GET_EVENTS',))
+        except Exception:
+            reply = None
+        if (isinstance(reply, (list, tuple)) and len(reply) == 2 and
+                reply[0] == 'GET_EVENTS_RESULT'):
+            return reply[1] or []
+        self.failed += 1
+        return []
+
+    def close(self):
+        self.udp_client.close()
+
+
+class SharedMemoryClient(object):
+    def __init__(self, path):
+        self.events = SharedEventBuffer.attach(path)
+        self.failed = 0
+
+    def getEvents(self):
+        return self.events.read()
+
+    def close(self):
+        self.events.close()
+
+
+def runClient(transport, interval, burst, duration):
+    path = os.path.join(tempfile.gettempdir(),
+                        'iohub_benchmark_%d.shm' % os.getpid())
+    ready = multiprocessing.Event()
+    finished = multiprocessing.Event()
+    hub = multiprocessing.Process(target=runHub,
+                                  args=(transport, path, interval, burst,
+                                        duration, ready, finished))
+    hub.start()
+    ready.wait()
+    if transport == 'udp':
+        client = UDPClient()
+    else:
+        client = SharedMemoryClient(path)
+
+    delays = []
+    nReceived = 0
+    emptyPolls = []
+    endTime = default_timer() + duration + 0.25
+    while default_timer() < endTime:
+        t0 = default_timer()
+        events = client.getEvents()
+        t1 = default_timer()
+        if events:
+            nReceived += len(events)
+            delays.extend(t1 - e[7] for e in events)
+        else:
+            emptyPolls.append(t1 - t0)
+    finished.set()
+    client.close()
+    hub.join()
+    return np.array(delays), nReceived, np.array(emptyPolls), client.failed
+
+
+def main(duration):
+    print('%-14s %10s %10s %10s %14s %14s %14s' %
+          ('transport', 'median ms', '95% ms', 'max ms', 'empty poll us',
+           'events / sec', 'failed polls'))
+    for transport in ('udp', 'shared_memory'):
+        # one event per ms, for the delay
+        delays, _, empty, _ = runClient(transport, 0.001, 1, duration)
+        # as many as the hub can make, for the throughput
+        _, nReceived, _, failed = runClient(transport, 0.0, 100, duration)
+        print('%-14s %10.3f %10.3f %10.3f %14.1f %14.0f %14d' %
+              (transport, np.median(delays) * 1000,
+               np.percentile(delays, 95) * 1000, delays.max() * 1000,
+               np.median(empty) * 1e6, nReceived / duration, failed))
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Times the ioHub moving window filters that calculate their value from
+the whole window against the running statistic filters that replace them,
+for window lengths of 3 to 101 values and a 2 kHz eye tracker.
+
+For each filter and window length the time taken to add a value (and get
+the filtered value back) is reported, in microseconds and as a percentage
+of the 500 usec between samples at 2 kHz. This is per filtered field; the
+eye event parser filters several fields of every sample.
+
+Not part of the test suite.
+
+command-line usage:
+    python benchmark_eventfilters.py [seconds of samples]
+"""
+
+from __future__ import print_function, division
+
+import sys
+from timeit import default_timer
+
+import numpy as np
+
+from psychopy.iohub.devices.eventfilters import (
+    MovingWindowFilter, MedianFilter, WeightedAverageFilter,
+    RunningMeanFilter, RunningMedianFilter, LinearWeightedAverageFilter,
+    TriangularWeightedAverageFilter)
+
+SAMPLING_RATE = 2000
+LENGTHS = (3, 5, 11, 21, 51, 101)
+
+
+def triangle(length):
+    half = (length + 1) // 2
+    return np.concatenate((np.arange(1, half + 1), np.arange(half - 1, 0, -1)))
+
+
+FILTERS = (
+    ('mean', lambda n: MovingWindowFilter(length=n, knot_pos='center'),
+     lambda n: RunningMeanFilter(length=n, knot_pos='center')),
+    ('median', lambda n: MedianFilter(length=n, knot_pos='center'),
+     lambda n: RunningMedianFilter(length=n, knot_pos='center')),
+    ('linear weights',
+     lambda n: WeightedAverageFilter(weights=np.arange(n, 0, -1),
+                                     knot_pos='center'),
+     lambda n: LinearWeightedAverageFilter(length=n, knot_pos='center')),
+    ('triangle weights',
+     lambda n: WeightedAverageFilter(weights=triangle(n), knot_pos='center'),
+     lambda n: TriangularWeightedAverageFilter(length=n, knot_pos='center')),
+)
+
+
+def timeFilter(windowFilter, values):
+    add = windowFilter.add
+    t0 = default_timer()
+    for value in values:
+        add(value)
+    return (default_timer() - t0) / len(values)
+
+
+def main(duration):
+    rng = np.random.RandomState(0)
+    values = (np.cumsum(rng.normal(0, 2, int(duration * SAMPLING_RATE))) +
+              960).tolist()
+    interval = 1.0 / SAMPLING_RATE
+    print('%-17s %6s %12s %12s %10s %10s %8s' %
+          ('filter', 'length', 'window usec', 'running usec', 'window %',
+           'running %', 'speedup'))
+    for name, windowFilter, runningFilter in FILTERS:
+        for length in LENGTHS:
+            before = timeFilter(windowFilter(length), values)
+            after = timeFilter(runningFilter(length), values)
+            print('%-17s %6d %12.2f %12.2f %10.2f %10.2f %8.1f' %
+                  (name, length, before * 1e6, after * 1e6,
+                   100 * before / interval, 100 * after / interval,
+                   before / after))
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0)
@@ -0,0 +1,164 @@
+""" Test the staged (chunked) writing of ioDataStore events and the indexed
+queries of ExperimentDataAccessUtility
+"""
+import os
+import json
+import shutil
+import threading
+from tempfile import mkdtemp
+
+import numpy as np
+import pytest
+
+tables = pytest.importorskip('tables')
+
+from psychopy.iohub.datastore.staging import StagingBuffer, StagedWriter
+from psychopy.iohub.datastore.util import (ExperimentDataAccessUtility,
+                                           ExperimentDataAccessException)
+
+EVENT_DTYPE = np.dtype([('event_id', 'u4'), ('time', 'f8'), ('text', 'S8')])
+
+
+class TestStagedWriter(object):
+
+    def setup_method(self):
+        self.tmp_dir = mkdtemp(prefix='psychopy-tests-iohub')
+        self.hdf = tables.open_file(os.path.join(self.tmp_dir, 'events.hdf5'),
+                                    'w')
+        self.table = self.hdf.create_table(self.hdf.root, 'events',
+                                           EVENT_DTYPE)
+        self.lock = threading.RLock()
+        self.flushes = 0
+
+    def teardown_method(self):
+        self.hdf.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def flushFile(self):
+        self.flushes += 1
+        self.hdf.flush()
+
+    def writeEvents(self, writer, nEvents, size=64):
+        staging = StagingBuffer(self.table, EVENT_DTYPE, size)
+        for i in range(nEvents):
+            if staging.append((i, i * 0.001, b'e%d' % i), i * 0.001):
+                writer.submit(staging)
+        return staging
+
+    def test_threaded(self):
+        writer = StagedWriter(self.lock, self.flushFile, flushInterval=200)
+        staging = self.writeEvents(writer, 1000)
+        assert staging.nRows == 1000 % 64
+        writer.submit(staging)
+        writer.join()
+        assert self.table.nrows == 1000
+        assert (self.table.col('event_id') == np.arange(1000)).all()
+        stats = writer.getStats()
+        assert stats['rows_written'] == 1000
+        assert stats['chunks_written'] == 1000 // 64 + 1
+        assert stats['backlog_rows'] == stats['backlog_chunks'] == 0
+        assert stats['errors'] == 0
+        # flushed once 200 or more rows have been written since the last
+        assert self.flushes == 4
+        writer.close()
+
+    def test_unthreaded(self):
+        writer = StagedWriter(self.lock, self.flushFile, flushInterval=0,
+                              threaded=False)
+        staging = self.writeEvents(writer, 100, size=10)
+        assert staging.nRows == 0
+        assert self.table.nrows == 100
+        # every chunk is flushed and the arrays are reused
+        assert self.flushes == 10
+        assert len(staging._spare) == 1
+        assert writer.getStats()['max_backlog_rows'] == 10
+
+
+SAMPLE_DTYPE = np.dtype([('experiment_id', 'u4'), ('session_id', 'u4'),
+                         ('type', 'u1'), ('filter_id', 'i2'), ('time', 'f8'),
+                         ('x', 'f4')])
+SAMPLE_TYPE = 51
+
+
+class TestExperimentDataAccess(object):
+
+    def setup_method(self):
+        from psychopy.iohub.datastore import (ClassTableMappings,
+                                              ExperimentMetaData,
+                                              SessionMetaData)
+        self.tmp_dir = mkdtemp(prefix='psychopy-tests-iohub')
+        self.fileName = 'events.hdf5'
+        hdf = tables.open_file(os.path.join(self.tmp_dir, self.fileName), 'w')
+        dc = hdf.create_group(hdf.root, 'data_collection')
+        hdf.create_group(dc, 'condition_variables')
+        events = hdf.create_group(dc, 'events')
+        mappings = hdf.create_table(hdf.root, 'class_table_mapping',
+                                    ClassTableMappings)
+        mappings.append([(SAMPLE_TYPE, 1, b'SampleEvent',
+                          b'/data_collection/events/samples')])
+        experiments = hdf.create_table(dc, 'experiment_meta_data',
+                                       ExperimentMetaData)
+        experiments.append([(1, b'exp', b'', b'', b'1', 2)])
+        sessions = hdf.create_table(dc, 'session_meta_data', SessionMetaData)
+        sessions.append([(1, 1, b's1', b'', b'', json.dumps({}).encode()),
+                         (2, 1, b's2', b'', b'', json.dumps({}).encode())])
+        cvs = hdf.create_table(dc.condition_variables, 'EXP_CV_1',
+                               np.dtype([('session_id', 'u4'),
+                                         ('trial', 'u4'),
+                                         ('TRIAL_START', 'f8'),
+                                         ('TRIAL_END', 'f8')]))
+        cvs.append([(1, 1, 0.0, 1.0), (1, 2, 1.5, 2.5),
+                    (2, 1, 0.25, 0.5), (2, 2, 3.0, 4.0)])
+        # samples every 10 ms in each session (out of time order in the
+        # table) plus samples of another experiment and a filtered stream
+        times = np.arange(0, 3, 0.01)
+        rows = []
+        for session in (2, 1):
+            for t in times[::-1]:
+                rows.append((1, session, SAMPLE_TYPE, 0, t, t * 10))
+                rows.append((1, session, SAMPLE_TYPE, 1, t, -1))
+            rows.append((2, session, SAMPLE_TYPE, 0, 0.5, -1))
+        samples = hdf.create_table(events, 'samples', SAMPLE_DTYPE)
+        samples.append(rows)
+        hdf.close()
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_trialEventAttributeValues(self):
+        data = ExperimentDataAccessUtility(self.tmp_dir, self.fileName)
+        byTrial = data.getTrialEventAttributeValues(
+            SAMPLE_TYPE, ['time', 'x'], '@TRIAL_START@', 'TRIAL_END',
+            filter_id=0)
+        byQuery = data.getEventAttributeValues(
+            SAMPLE_TYPE, ['time', 'x'], filter_id=0,
+            startConditions={'time': ('>=', '@TRIAL_START@')},
+            endConditions={'time': ('<=', '@TRIAL_END@')})
+        assert len(byTrial) == len(byQuery) == 4
+        for trial, query in zip(byTrial, byQuery):
+            assert trial.condition_set == query.condition_set
+            assert np.allclose(trial.time, np.sort(query.time))
+            assert np.allclose(trial.x, trial.time * 10)
+        # the last trial of session 2 ends after the last sample
+        assert len(byTrial[3].time) == 0
+        with pytest.raises(ExperimentDataAccessException):
+            data.getTrialEventAttributeValues(SAMPLE_TYPE, ['x'],
+                                              'TRIAL_START', 'NOT_A_CV')
+        data.close()
+
+    def test_createEventTableIndexes(self):
+        data = ExperimentDataAccessUtility(self.tmp_dir, self.fileName)
+        with pytest.raises(ExperimentDataAccessException):
+            data.createEventTableIndexes()
+        data.close()
+        data = ExperimentDataAccessUtility(self.tmp_dir, self.fileName,
+                                           mode='a')
+        indexed = data.createEventTableIndexes()
+        assert indexed == {'/data_collection/events/samples':
+                           ['experiment_id', 'session_id', 'type', 'time']}
+        # already there the second time around
+        assert data.createEventTableIndexes() == {}
+        results = data.getEventAttributeValues(SAMPLE_TYPE, ['x'],
+                                               filter_id=1)
+        assert [len(r.x) for r in results] == [300] * 4
+        data.close()
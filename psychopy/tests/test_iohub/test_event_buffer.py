@@ -0,0 +1,74 @@
+""" Test the time ordered event buffer used by ioHub devices and the ioHub
+Server's global event buffer.
+"""
+from psychopy.iohub.devices import DeviceEventBuffer
+
+
+def makeEvent(eventID, eventType, time, filterID=0, deviceID=0):
+    return [0, 0, deviceID, eventID, eventType, time, time, time, 0.0, 0.0,
+            filterID]
+
+
+def eventIDs(events):
+    return [e[3] for e in events]
+
+
+class TestDeviceEventBuffer(object):
+
+    def setup_method(self):
+        self.buffer = DeviceEventBuffer(maxlen=8)
+        # two types of events, interleaved in time, one arriving late, and
+        # filtered events of the first type
+        for i in range(6):
+            self.buffer.append(makeEvent(i, 20, i))
+            self.buffer.append(makeEvent(10 + i, 21, i + 0.5))
+        self.buffer.append(makeEvent(16, 21, 2.25))
+        self.buffer.append(makeEvent(20, 20, 1.75, filterID=3))
+
+    def test_timeOrder(self):
+        assert len(self.buffer) == 14
+        assert eventIDs(self.buffer.get()) == [
+            0, 10, 1, 11, 20, 2, 16, 12, 3, 13, 4, 14, 5, 15]
+        assert eventIDs(self.buffer.get(21)) == [10, 11, 16, 12, 13, 14, 15]
+        assert eventIDs(self.buffer.get(20)) == [0, 1, 20, 2, 3, 4, 5]
+        assert eventIDs(self.buffer.get(20, filter_id=3)) == [20]
+        assert eventIDs(self.buffer.get(filter_id=0)) == [
+            0, 10, 1, 11, 2, 16, 12, 3, 13, 4, 14, 5, 15]
+        assert list(self.buffer) == self.buffer.get()
+        assert set(self.buffer.eventsByType()) == {20, 21}
+        assert eventIDs(self.buffer.eventsByType()[20]) == [0, 1, 20, 2, 3, 4, 5]
+        assert len(self.buffer) == 14
+
+    def test_sinceAndMaxEvents(self):
+        assert eventIDs(self.buffer.get(since=3.5)) == [4, 14, 5, 15]
+        assert eventIDs(self.buffer.get(since=5.5)) == []
+        assert eventIDs(self.buffer.get(21, since=2)) == [16, 12, 13, 14, 15]
+        assert eventIDs(self.buffer.get(since=1, max_events=4)) == [
+            11, 20, 2, 16]
+        assert eventIDs(self.buffer.get(21, max_events=2)) == [10, 11]
+
+    def test_remove(self):
+        # the events returned and older events of the same streams go
+        assert eventIDs(self.buffer.get(since=1, max_events=4,
+                                        remove=True)) == [11, 20, 2, 16]
+        assert eventIDs(self.buffer.get()) == [12, 3, 13, 4, 14, 5, 15]
+        assert eventIDs(self.buffer.get(20, remove=True)) == [3, 4, 5]
+        assert eventIDs(self.buffer.get()) == [12, 13, 14, 15]
+        self.buffer.clear(21)
+        assert len(self.buffer) == 0
+        assert self.buffer.get(remove=True) == []
+
+    def test_dropped(self):
+        assert self.buffer.droppedCount() == 0
+        for i in range(5):
+            self.buffer.append(makeEvent(30 + i, 21, 10 + i))
+        # an event older than all those left in a full stream is still added
+        self.buffer.append(makeEvent(40, 21, 0.1))
+        assert self.buffer.droppedCount() == 5
+        assert self.buffer.droppedCount(20) == 0
+        assert self.buffer.droppedCount(21, filter_id=0) == 5
+        assert eventIDs(self.buffer.get(21)) == [
+            40, 14, 15, 30, 31, 32, 33, 34]
+        # streams are kept for each device too
+        self.buffer.append(makeEvent(50, 21, 20, deviceID=1))
+        assert eventIDs(self.buffer.get(21, since=13)) == [34, 50]
@@ -0,0 +1,98 @@
+""" Test the running statistic moving window filters against the moving
+window filters that calculate their value from the whole window.
+"""
+import numpy as np
+import pytest
+
+from psychopy.iohub.devices.eventfilters import (
+    MovingWindowFilter, MedianFilter, WeightedAverageFilter,
+    RunningMeanFilter, RunningMedianFilter, LinearWeightedAverageFilter,
+    TriangularWeightedAverageFilter)
+
+
+def filteredValues(windowFilter, values):
+    results = []
+    for value in values:
+        result = windowFilter.add(value)
+        results.append(np.nan if result is None else float(np.squeeze(result[1])))
+    return np.array(results)
+
+
+def makeValues(n=3000, seed=1):
+    rng = np.random.RandomState(seed)
+    values = np.cumsum(rng.normal(0, 5, n)) + 500
+    # repeated values, as from an eye tracker with a coarse resolution
+    values[::3] = np.round(values[::3] / 10) * 10
+    return values
+
+
+def assertSameValues(found, expected):
+    assert np.isnan(found).sum() == np.isnan(expected).sum()
+    np.testing.assert_allclose(found, expected, rtol=1e-6, equal_nan=True)
+
+
+def triangle(length):
+    half = (length + 1) // 2
+    return np.concatenate((np.arange(1, half + 1), np.arange(half - 1, 0, -1)))
+
+
+class TestRunningWindowFilters(object):
+
+    @pytest.mark.parametrize('length', [1, 2, 3, 8, 11, 51])
+    def test_mean(self, length):
+        values = makeValues()
+        expected = filteredValues(
+            MovingWindowFilter(length=length, knot_pos='latest'), values)
+        assertSameValues(filteredValues(
+            RunningMeanFilter(length=length, knot_pos='latest'), values),
+            expected)
+
+    @pytest.mark.parametrize('length', [1, 2, 3, 8, 11, 51])
+    def test_median(self, length):
+        values = makeValues()
+        expected = filteredValues(
+            MedianFilter(length=length, knot_pos='latest'), values)
+        assertSameValues(filteredValues(
+            RunningMedianFilter(length=length, knot_pos='latest'), values),
+            expected)
+
+    @pytest.mark.parametrize('length', [1, 3, 8, 51])
+    def test_linearWeights(self, length):
+        values = makeValues()
+        expected = filteredValues(
+            WeightedAverageFilter(weights=np.arange(length, 0, -1),
+                                  knot_pos='latest'), values)
+        assertSameValues(filteredValues(
+            LinearWeightedAverageFilter(length=length, knot_pos='latest'),
+            values), expected)
+
+    @pytest.mark.parametrize('length', [1, 3, 5, 51])
+    def test_triangularWeights(self, length):
+        values = makeValues()
+        expected = filteredValues(
+            WeightedAverageFilter(weights=triangle(length), knot_pos='center'),
+            values)
+        assertSameValues(filteredValues(
+            TriangularWeightedAverageFilter(length=length, knot_pos='center'),
+            values), expected)
+        with pytest.raises(ValueError):
+            TriangularWeightedAverageFilter(length=4, knot_pos=0)
+
+    def test_recalculateAndClear(self):
+        values = makeValues(seed=2)
+        for filterClass, reference in (
+                (RunningMeanFilter, MovingWindowFilter(length=7, knot_pos=0)),
+                (LinearWeightedAverageFilter,
+                 WeightedAverageFilter(weights=np.arange(7, 0, -1),
+                                       knot_pos=0)),
+                (TriangularWeightedAverageFilter,
+                 WeightedAverageFilter(weights=triangle(7), knot_pos=0))):
+            windowFilter = filterClass(length=7, knot_pos=0)
+            windowFilter.RECALCULATE_INTERVAL = 5
+            expected = filteredValues(reference, values)
+            assertSameValues(filteredValues(windowFilter, values), expected)
+            # a cleared filter starts filling its window again
+            windowFilter.clear()
+            reference.clear()
+            assertSameValues(filteredValues(windowFilter, values[::-1]),
+                             filteredValues(reference, values[::-1]))
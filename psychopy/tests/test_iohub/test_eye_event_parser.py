@@ -0,0 +1,161 @@
+""" Test the offline (batch) eye sample event parser against the online
+EyeTrackerEventParser.
+"""
+import os
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+import pytest
+
+from psychopy.iohub.constants import EventConstants
+from psychopy.iohub.devices.eyetracker.eye_events import (
+    MonocularEyeSampleEvent, BinocularEyeSampleEvent)
+from psychopy.iohub.devices.eyetracker.filters.parser import \
+    EyeTrackerEventParser
+from psychopy.iohub.devices.eyetracker.filters.batchparser import (
+    BatchEyeEventParser, EVENT_CLASSES, SAMPLE_TABLE_PATHS)
+
+DISPLAY = dict(mm_size=dict(width=500, height=281), pixel_res=(1920, 1080),
+               eye_distance=550)
+SAMPLING_RATE = 500
+SETTINGS = dict(display_device=DISPLAY, sampling_rate=SAMPLING_RATE,
+                adaptive_vel_thresh_history=0.5)
+
+
+def makeSamples(nFixations=30, seed=1):
+    """Binocular samples of fixations with saccades between them, blinks
+    and samples with data from one eye only."""
+    rng = np.random.RandomState(seed)
+    x, y, status = [], [], []
+    position = np.zeros(2)
+    for _ in range(nFixations):
+        n = rng.randint(75, 200)
+        x.extend(position[0] + rng.normal(0, 0.5, n))
+        y.extend(position[1] + rng.normal(0, 0.5, n))
+        status.extend([0] * n)
+        if rng.rand() < 0.3:
+            # a blink at the end of the fixation
+            gap = rng.randint(20, 50)
+            status[-gap:] = [22] * gap
+        target = rng.uniform(-400, 400, 2)
+        steps = np.linspace(0, 1, rng.randint(8, 15))[1:-1]
+        x.extend(position[0] + (target[0] - position[0]) * steps)
+        y.extend(position[1] + (target[1] - position[1]) * steps)
+        status.extend([0] * len(steps))
+        position = target
+    n = len(x)
+    status = np.array(status)
+    oneEye = (rng.rand(n) < 0.02) & (status == 0)
+    status[oneEye] = rng.choice([2, 20], oneEye.sum())
+
+    samples = np.zeros(n, BinocularEyeSampleEvent.NUMPY_DTYPE)
+    samples['experiment_id'] = 1
+    samples['session_id'] = 1
+    samples['event_id'] = np.arange(n) + 1
+    samples['type'] = EventConstants.BINOCULAR_EYE_SAMPLE
+    samples['time'] = samples['device_time'] = samples['logged_time'] = \
+        np.arange(n) / float(SAMPLING_RATE)
+    for eye in ('left', 'right'):
+        samples['%s_gaze_x' % eye] = np.array(x) + rng.normal(0, 0.2, n)
+        samples['%s_gaze_y' % eye] = np.array(y) + rng.normal(0, 0.2, n)
+        samples['%s_pupil_measure1' % eye] = rng.uniform(3, 4, n)
+    missing = status == 22
+    for name in ('gaze_x', 'gaze_y', 'pupil_measure1'):
+        samples['left_%s' % name][missing | (status == 20)] = 0
+        samples['right_%s' % name][missing | (status == 2)] = 0
+    samples['status'] = status
+    return samples
+
+
+def onlineEvents(samples, **settings):
+    EventConstants.addClassMappings(
+        [EventConstants.MONOCULAR_EYE_SAMPLE,
+         EventConstants.BINOCULAR_EYE_SAMPLE],
+        dict(m=MonocularEyeSampleEvent, b=BinocularEyeSampleEvent))
+    parser = EyeTrackerEventParser(**settings)
+    eventTypes = [c.EVENT_TYPE_ID for c in EVENT_CLASSES]
+    events = []
+    for sample in samples.tolist():
+        parser._addInputEvent(list(sample))
+        events.extend(e for e in parser._removeOutputEvents()
+                      if e[4] in eventTypes)
+    return events
+
+
+def assertEventsEqual(found, expected):
+    assert found.dtype == expected.dtype
+    assert len(found) == len(expected)
+    for name in found.dtype.names:
+        if name != 'event_id':
+            np.testing.assert_allclose(found[name], expected[name],
+                                       rtol=1e-5, atol=1e-6, err_msg=name)
+
+
+class TestBatchEyeEventParser(object):
+
+    def test_sameAsOnline(self):
+        samples = makeSamples()
+        expected = onlineEvents(samples, **dict(SETTINGS))
+        events = BatchEyeEventParser(chunk_size=1000, **SETTINGS).parse(
+            samples)
+
+        # fixations, saccades and blinks are all found
+        for eventClass in EVENT_CLASSES:
+            assert len(events[eventClass.EVENT_TYPE_ID]) > 5
+            online = np.array(
+                [tuple(e) for e in expected
+                 if e[4] == eventClass.EVENT_TYPE_ID],
+                eventClass.NUMPY_DTYPE)
+            assertEventsEqual(events[eventClass.EVENT_TYPE_ID], online)
+
+        # events are numbered in the order the online parser outputs them
+        allEvents = np.concatenate([events[c.EVENT_TYPE_ID][['event_id', 'type']]
+                                    for c in EVENT_CLASSES])
+        allEvents.sort(order='event_id')
+        assert list(allEvents['event_id']) == list(range(1, len(expected) + 1))
+        assert list(allEvents['type']) == [e[4] for e in expected]
+
+    def test_chunkSize(self):
+        samples = makeSamples(seed=2)
+        settings = dict(SETTINGS,
+                        position_filter=dict(name='MedianFilter', length=5,
+                                             knot_pos='center'),
+                        velocity_filter=dict(name='WeightedAverageFilter',
+                                             weights=(1, 2, 4), knot_pos=1))
+        expected = BatchEyeEventParser(chunk_size=len(samples),
+                                       **settings).parse(samples)
+        for chunkSize in (7, 37, 1000):
+            events = BatchEyeEventParser(chunk_size=chunkSize,
+                                         **settings).parse(samples)
+            for eventClass in EVENT_CLASSES:
+                typeID = eventClass.EVENT_TYPE_ID
+                assertEventsEqual(events[typeID], expected[typeID])
+                assert (events[typeID]['event_id'] ==
+                        expected[typeID]['event_id']).all()
+
+    def test_parseFile(self):
+        tables = pytest.importorskip('tables')
+        first, second = makeSamples(seed=3), makeSamples(seed=4)
+        second['session_id'] = 2
+        tmp_dir = mkdtemp(prefix='psychopy-tests-iohub')
+        try:
+            path = os.path.join(tmp_dir, 'events.hdf5')
+            hdf = tables.open_file(path, 'w')
+            group, name = SAMPLE_TABLE_PATHS[0].rsplit('/', 1)
+            hdf.create_table(group, name, np.concatenate((first, second)),
+                             createparents=True)
+            hdf.close()
+
+            parser = BatchEyeEventParser(chunk_size=500, **SETTINGS)
+            events = parser.parse(path)
+            # sessions are parsed separately
+            for session, samples in ((1, first), (2, second)):
+                expected = parser.parse(samples)
+                for eventClass in EVENT_CLASSES:
+                    typeID = eventClass.EVENT_TYPE_ID
+                    found = events[typeID][
+                        events[typeID]['session_id'] == session]
+                    assertEventsEqual(found, expected[typeID])
+        finally:
+            shutil.rmtree(tmp_dir)
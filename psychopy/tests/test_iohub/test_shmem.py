@@ -0,0 +1,74 @@
+""" Test the shared memory ring buffers used to pass events from the ioHub
+Server to the experiment process.
+"""
+import os
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+
+from psychopy.iohub.shmem import SharedEventBuffer
+
+EVENT_DTYPE = np.dtype([('experiment_id', 'u4'), ('session_id', 'u4'),
+                        ('device_id', 'u2'), ('event_id', 'u4'),
+                        ('type', 'u1'), ('device_time', 'f8'),
+                        ('logged_time', 'f8'), ('time', 'f8'),
+                        ('confidence_interval', 'f4'), ('delay', 'f4'),
+                        ('filter_id', 'i2'), ('text', 'S16')])
+
+
+def makeEvent(eventID, eventType, time, text='a'):
+    return [0, 0, 0, eventID, eventType, time, time, time, 0.0, 0.0, 0, text]
+
+
+class TestSharedEventBuffer(object):
+
+    def setup_method(self):
+        self.tmp_dir = mkdtemp(prefix='psychopy-tests-iohub')
+        self.path = os.path.join(self.tmp_dir, 'events.shm')
+        self.writer = SharedEventBuffer.create(self.path, 1024 * 1024, 8)
+        self.reader = SharedEventBuffer.attach(self.path)
+
+    def teardown_method(self):
+        self.reader.close()
+        self.writer.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read(self):
+        assert self.reader.read() == []
+        for i in range(4):
+            assert self.writer.write(makeEvent(i, 20, i, 'key%d' % i),
+                                     EVENT_DTYPE)
+        # a ring for a second event type is picked up by the reader
+        for i in range(3):
+            self.writer.write(makeEvent(10 + i, 21, i + 0.5), EVENT_DTYPE)
+        events = self.reader.read()
+        assert [e[7] for e in events] == [0, 0.5, 1, 1.5, 2, 2.5, 3]
+        assert events[0] == makeEvent(0, 20, 0.0, 'key0')
+        assert self.reader.read() == []
+        assert self.reader.lost == 0
+
+    def test_overwrite(self):
+        for i in range(20):
+            self.writer.write(makeEvent(i, 20, i), EVENT_DTYPE)
+        events = self.reader.read()
+        # the ring holds 8 events; the oldest were overwritten
+        assert [e[3] for e in events] == list(range(12, 20))
+        assert self.reader.lost == 12
+        # a record being rewritten while read is dropped, not returned torn
+        self.writer.write(makeEvent(20, 20, 20), EVENT_DTYPE)
+        self.writer.write(makeEvent(21, 20, 21), EVENT_DTYPE)
+        self.writer._ringList[0]._seq[20 % 8] = 0
+        assert [e[3] for e in self.reader.read()] == [21]
+        assert self.reader.lost == 13
+
+    def test_clearAndFallback(self):
+        self.writer.write(makeEvent(0, 20, 0), EVENT_DTYPE)
+        self.reader.clear()
+        assert self.reader.read() == []
+        assert not self.reader.hasFallbackEvents()
+        # values that don't fit the record can't be written
+        assert not self.writer.write(makeEvent(1, 20, 1, u'\xe9'),
+                                     EVENT_DTYPE)
+        assert self.reader.hasFallbackEvents()
+        assert not self.reader.hasFallbackEvents()
@@ -0,0 +1,153 @@
+"""Tests for psychopy.logging: batched and background writing of flushed
+messages, keeping flushed entries, lazy messages and binary log files.
+"""
+from __future__ import print_function
+
+import io
+import os
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+import pytest
+
+from psychopy import logging
+
+
+class TestLogger(object):
+
+    def setup_method(self):
+        self.logger = logging._Logger()
+        self.stream = io.StringIO()
+        self.target = logging.LogFile(self.stream, level=logging.INFO,
+                                      logger=self.logger)
+        self.nWrites = 0
+        write = self.target.write
+
+        def countedWrite(txt):
+            self.nWrites += 1
+            write(txt)
+        self.target.write = countedWrite
+
+    def teardown_method(self):
+        self.logger.stopBackgroundWriter()
+
+    def test_flush(self):
+        for i in range(5):
+            self.logger.log(u'message %i' % i, logging.EXP, t=i)
+        self.logger.log(u'hidden', logging.DEBUG, t=5)  # below every target
+        self.logger.flush()
+        lines = self.stream.getvalue().splitlines()
+        assert lines == [u'%.4f \tEXP \tmessage %i' % (i, i) for i in range(5)]
+        # the messages are written to the target together
+        assert self.nWrites == 1
+        self.logger.flush()
+        assert self.nWrites == 1
+        assert len(self.logger.flushed) == 5
+
+    def test_backgroundWriter(self):
+        self.logger.startBackgroundWriter(maxPending=2)
+        for i in range(50):
+            self.logger.log(u'message %i' % i, logging.DATA, t=i)
+            self.logger.flush()
+        self.logger.stopBackgroundWriter()
+        lines = self.stream.getvalue().splitlines()
+        assert lines == [u'%.4f \tDATA \tmessage %i' % (i, i)
+                         for i in range(50)]
+        # flushes after the writer stops are written directly
+        self.logger.log(u'after', logging.DATA, t=50)
+        self.logger.flush()
+        assert self.stream.getvalue().endswith(u'after\n')
+
+    def test_keepFlushed(self):
+        self.logger.setKeepFlushed(3)
+        for i in range(10):
+            self.logger.log(u'message %i' % i, logging.EXP, t=i)
+        self.logger.flush()
+        assert [e.message for e in self.logger.flushed] == [
+            u'message 7', u'message 8', u'message 9']
+        self.logger.setKeepFlushed(0)
+        assert len(self.logger.flushed) == 0
+        self.logger.setKeepFlushed(None)
+        self.logger.log(u'kept', logging.EXP, t=10)
+        self.logger.flush()
+        assert len(self.logger.flushed) == 1
+
+    def test_lazyMessage(self):
+        calls = []
+
+        def message():
+            calls.append(1)
+            return u'lazy'
+
+        assert not self.logger.isEnabledFor(logging.DEBUG)
+        assert self.logger.isEnabledFor(logging.INFO)
+        self.logger.log(message, logging.DEBUG, t=0)
+        self.logger.log(message, logging.INFO, t=1)
+        assert calls == []
+        self.logger.flush()
+        assert calls == [1]
+        assert self.stream.getvalue() == u'1.0000 \tINFO \tlazy\n'
+
+
+class TestBinaryLogFile(object):
+
+    def setup_method(self):
+        self.tmp_dir = mkdtemp(prefix='psychopy-tests-logging')
+        self.path = os.path.join(self.tmp_dir, 'test.plog')
+        self.logger = logging._Logger()
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def logMessages(self, target, first, n):
+        for i in range(first, first + n):
+            # repeated messages and objs are only written once
+            self.logger.log(u'stim: autoDraw = %s' % bool(i % 2),
+                            logging.EXP, t=i * 0.01, obj=u'stim')
+            self.logger.log(u'frame %i \u00e9' % i, logging.DATA, t=i * 0.01)
+            self.logger.log(u'not wanted', logging.DEBUG, t=i * 0.01)
+            if i % 10 == 9:
+                self.logger.flush()
+        self.logger.flush()
+        target.stream.close()
+
+    def test_readAndConvert(self):
+        target = logging.BinaryLogFile(self.path, level=logging.INFO,
+                                       filemode='w', logger=self.logger)
+        textStream = io.StringIO()
+        logging.LogFile(textStream, level=logging.INFO, logger=self.logger)
+        self.logMessages(target, 0, 25)
+
+        log = logging.readBinaryLog(self.path)
+        assert len(log['t']) == 50
+        assert log['t'].dtype == np.float64
+        assert list(log['level'][:4]) == [logging.EXP, logging.DATA] * 2
+        assert log['message'][3] == u'frame 1 \u00e9'
+        assert list(log['obj'][:2]) == [u'stim', None]
+        # the text converted from the binary log matches the text log
+        assert logging.binaryLogToText(self.path) == textStream.getvalue()
+        textPath = os.path.join(self.tmp_dir, 'test.log')
+        logging.binaryLogToText(self.path, textPath)
+        with io.open(textPath, encoding='utf8') as f:
+            assert f.read() == textStream.getvalue()
+
+    def test_append(self):
+        target = logging.BinaryLogFile(self.path, level=logging.INFO,
+                                       filemode='w', logger=self.logger)
+        self.logMessages(target, 0, 5)
+        self.logger.removeTarget(target)
+        target = logging.BinaryLogFile(self.path, level=logging.INFO,
+                                       logger=self.logger)
+        self.logMessages(target, 5, 5)
+        log = logging.readBinaryLog(self.path)
+        assert list(log['message'][-2:]) == [u'stim: autoDraw = True',
+                                             u'frame 9 \u00e9']
+        # an incomplete last block is left out
+        with open(self.path, 'ab') as f:
+            f.write(b'\x05\x00\x00\x00\x00')
+        assert len(logging.readBinaryLog(self.path)['t']) == 20
+        pd = pytest.importorskip('pandas')
+        frame = logging.readBinaryLog(self.path, asDataFrame=True)
+        assert isinstance(frame, pd.DataFrame)
+        assert list(frame.columns) == ['t', 'level', 'message', 'obj']
@@ -1,5 +1,6 @@
 from __future__ import division
-from psychopy.sound._base import apodize, HammingWindow
+from psychopy.sound._base import (apodize, HammingWindow, renderTone,
+                                  renderedTones)
 from psychopy.constants import FINISHED
 import numpy as np
 
@@ -40,3 +41,35 @@ def test_HammingSmallBlock():
         plt.subplot(2,1,2)
         plt.plot(t, snd2[0:sampleRate*secs]-snd1)
         plt.show()
+
+
+def test_renderTone():
+    renderedTones.clear()
+    tone = renderTone(thisFreq, secs, sampleRate, hamming=False)
+    assert tone.shape == (nSamples, 1)
+    assert np.allclose(tone[:, 0], sndArray)
+    # tones are rendered once, and shared
+    assert renderTone(thisFreq, secs, sampleRate, hamming=False) is tone
+    assert not tone.flags.writeable
+    ramped = renderTone(thisFreq, secs, sampleRate, hamming=True)
+    window = HammingWindow(winSecs=0.005, soundSecs=secs,
+                           sampleRate=sampleRate)
+    assert np.allclose(ramped[:window.winSamples, 0],
+                       sndArray[:window.winSamples] * window.startWindow)
+    assert np.allclose(ramped[window.winSamples:-window.winSamples],
+                       tone[window.winSamples:-window.winSamples])
+
+
+def test_windowTables():
+    blockSize = 64
+    win1 = HammingWindow(winSecs=0.005, soundSecs=secs, sampleRate=sampleRate)
+    win2 = HammingWindow(winSecs=0.005, soundSecs=1, sampleRate=sampleRate)
+    block1 = win1.nextBlock(0, blockSize)
+    assert block1.shape == (blockSize, 1)
+    assert np.array_equal(block1[:, 0], win1.startWindow[:blockSize])
+    # windows of the same length share their tables
+    assert np.shares_memory(block1, win2.nextBlock(0, blockSize))
+    assert win1.nextBlock(0.1, blockSize) is None
+    lastBlock = win1.nextBlock((nSamples - 9.5) / sampleRate, blockSize)
+    assert np.array_equal(lastBlock[:10, 0], win1.endWindow[-10:])
+    assert np.all(lastBlock[10:] == 1)
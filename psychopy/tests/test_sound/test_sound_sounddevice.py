@@ -74,6 +74,87 @@ class TestSoundDevice(object):
         s4 = sound.Sound(self.testFile, startTime=-1, stopTime=10000)
         assert s4.getDuration() == s3.getDuration()
 
+    def test_decodedAudio(self):
+        from psychopy.sound import backend_sounddevice
+        cache = backend_sounddevice.decodedAudio
+        cache.clear()
+        s1 = sound.Sound(self.testFile, startTime=0.5, stopTime=1.5)
+        hits = cache.hits
+        s2 = sound.Sound(self.testFile, startTime=0.5, stopTime=1.5)
+        assert cache.hits == hits + 1
+        # both sounds play the same (read-only) decoded array
+        assert np.shares_memory(s1.sndArr, s2.sndArr)
+        assert not s1.sndArr.flags.writeable
+        cache.maxBytes = 0  # only the last array is kept
+        sound.Sound(self.testFile)
+        assert sound.Sound(self.testFile, startTime=0.5,
+                           stopTime=1.5).sndArr is not s1.sndArr
+        cache.maxBytes = 256 * 2**20
+
+    def test_streaming(self):
+        preloaded = sound.Sound(self.testFile, stereo=True, blockSize=512)
+        streamed = sound.Sound(self.testFile, stereo=True, blockSize=512,
+                               preBuffer=0.5)
+        blocks = []
+        block = streamed._nextBlock()
+        while len(block) == 512:
+            blocks.append(block)
+            core.wait(0.005)
+            block = streamed._nextBlock()
+        blocks.append(block)
+        assert streamed.underruns == 0
+        assert preloaded.underruns == 0
+        streamedArr = np.concatenate(blocks)
+        assert len(streamedArr) == len(preloaded.sndArr)
+        # both are multiplied by the same hamming window (a mono file is
+        # streamed as one channel, and played on both)
+        hammed = np.concatenate([preloaded._nextBlock()
+                                 for _ in range(len(blocks))])
+        assert np.allclose(streamedArr, hammed[:len(streamedArr)])
+
+    def test_streamingSeek(self):
+        # after a seek (e.g. by stop()) the sound plays again at once
+        preloaded = sound.Sound(self.testFile, stereo=True, blockSize=512)
+        streamed = sound.Sound(self.testFile, stereo=True, blockSize=512,
+                               preBuffer=0.5)
+        for _ in range(10):
+            streamed._nextBlock()
+            core.wait(0.005)
+        core.wait(0.1)  # let the thread fill the buffer and go to sleep
+        underruns = streamed.underruns
+        streamed.seek(0)
+        blocks = [streamed._nextBlock() for _ in range(5)]
+        assert streamed.underruns == underruns == 0
+        hammed = [preloaded._nextBlock() for _ in range(5)]
+        assert np.allclose(np.concatenate(blocks), np.concatenate(hammed))
+
+    def test_mixer(self):
+        from psychopy.sound import backend_sounddevice
+        if not backend_sounddevice.travisCI:
+            pytest.skip("the sound card's callback would mix the sounds too")
+        arr = np.random.RandomState(0).uniform(-1, 1, (2000, 1))
+        kwargs = dict(stereo=True, blockSize=128, sampleRate=44100)
+        sounds = [sound.Sound(arr, volume=0.5, **kwargs),
+                  sound.Sound(440, secs=0.1, **kwargs)]
+        copies = [sound.Sound(arr, volume=0.5, **kwargs),
+                  sound.Sound(440, secs=0.1, **kwargs)]
+        stream = sounds[0].stream
+        stream.resetCallbackStats()
+        for s in sounds:
+            s.play()
+        toSpk = np.zeros((128, 2), np.float32)
+        for _ in range(5):
+            stream.callback(toSpk, 128, None, None)
+            expected = sum(s._nextBlock() * s.volume for s in copies)
+            assert np.allclose(toSpk, expected, atol=1e-6)
+        for s in sounds:
+            s.stop()
+        # the array played is left as it was
+        assert np.array_equal(sounds[0].sndArr, np.repeat(arr, 2, axis=1))
+        stats = stream.getCallbackStats()
+        assert stats['nCallbacks'] == 5
+        assert 0 < stats['mean'] <= stats['max']
+
     def test_methods(self):
         s = sound.Sound(secs=0.1)
         v = s.getVolume()
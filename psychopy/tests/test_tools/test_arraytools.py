@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for psychopy.tools.arraytools
+
+"""
+import numpy
+import pytest
+
+from psychopy.tools.arraytools import ArrayCache
+
+
+class TestArrayCache(object):
+
+    def test_getAndAdd(self):
+        cache = ArrayCache(maxBytes=1000)
+        assert cache.get('a') is None
+        array = cache.add('a', numpy.zeros(10))
+        assert cache.get('a') is array
+        assert (cache.hits, cache.misses) == (1, 1)
+        # cached arrays are shared, so can't be changed
+        with pytest.raises(ValueError):
+            array[0] = 1
+        cache.add('a', numpy.zeros(20))
+        assert cache.nBytes == 160
+        cache.clear()
+        assert cache.get('a') is None
+        assert cache.nBytes == 0
+
+    def test_leastRecentlyUsedDropped(self):
+        cache = ArrayCache(maxBytes=250)
+        for key in 'abc':
+            cache.add(key, numpy.zeros(10))  # 80 bytes each
+        cache.get('a')
+        cache.add('d', numpy.zeros(10))
+        assert cache.get('b') is None
+        assert all(cache.get(key) is not None for key in 'acd')
+        assert cache.nBytes == 240
+        # an array larger than maxBytes is still kept, on its own
+        cache.add('e', numpy.zeros(100))
+        assert cache.get('e') is not None and cache.get('a') is None
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for psychopy.tools.imagetools
+
+"""
+import os
+import shutil
+from tempfile import mkdtemp
+
+import numpy
+import pytest
+from PIL import Image
+
+from psychopy.tools.imagetools import packImages, ImageSet, PackedImage
+
+
+class TestImageSet(object):
+
+    def setup_method(self):
+        self.tmpDir = mkdtemp(prefix='psychopy-tests-imagetools')
+        os.mkdir(os.path.join(self.tmpDir, 'images'))
+        rng = numpy.random.RandomState(0)
+        self.arrays = {
+            'rgb.png': rng.randint(0, 256, (20, 30, 3)).astype(numpy.uint8),
+            'lum.png': rng.randint(0, 256, (10, 5)).astype(numpy.uint8),
+            'rgba.png': rng.randint(0, 256, (7, 9, 4)).astype(numpy.uint8)}
+        for name, array in self.arrays.items():
+            Image.fromarray(array).save(
+                os.path.join(self.tmpDir, 'images', name))
+        self.fileName = os.path.join(self.tmpDir, 'images.npy')
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmpDir)
+
+    def test_packDirectory(self):
+        packImages(os.path.join(self.tmpDir, 'images'), self.fileName)
+        images = ImageSet(self.fileName)
+        assert sorted(images.names) == sorted(self.arrays)
+        for name, array in self.arrays.items():
+            image = images[name]
+            assert isinstance(image, PackedImage)
+            assert image.name == name
+            # stored bottom row first, as uploaded to textures
+            assert numpy.array_equal(image, array[::-1])
+            assert not image.flags.writeable
+        with pytest.raises(KeyError):
+            images['missing.png']
+
+    def test_packFileNames(self):
+        fileNames = [os.path.join(self.tmpDir, 'images', name)
+                     for name in ('lum.png', 'rgb.png', 'lum.png')]
+        images = packImages(fileNames, self.fileName)
+        assert images.names == fileNames[:2]
+        assert images[1].shape == (20, 30, 3)
+        assert fileNames[0] in images
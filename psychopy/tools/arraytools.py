@@ -11,6 +11,8 @@ from __future__ import absolute_import, division, print_function
 
 from builtins import str
 from past.utils import old_div
+import threading
+from collections import OrderedDict
 import numpy
 
 
@@ -183,3 +185,57 @@ def val2array(value, withNone=True, withScalar=True, length=2):
     else:
         msg = 'Invalid parameter. Should be length %s but got length %s.'
         raise ValueError(msg % (str(length), str(len(value))))
+
+
+class ArrayCache(object):
+    """Keeps arrays that are costly to make and shared by many objects
+    (e.g. decoded sounds or procedural textures), dropping the least
+    recently used once they total more than `maxBytes`. The arrays are
+    shared, so they are made read-only.
+
+    Counts of cache `hits` and `misses` are kept.
+    """
+
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.nBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._arrays = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the array stored for this key, or None"""
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is None:
+                self.misses += 1
+                return None
+            self._arrays[key] = self._arrays.pop(key)  # most recently used
+            self.hits += 1
+            return array
+
+    def add(self, key, array):
+        """Stores the array for this key, returning it as a read-only array
+        """
+        array.flags.writeable = False
+        with self._lock:
+            old = self._arrays.pop(key, None)
+            if old is not None:
+                self.nBytes -= old.nbytes
+            self._arrays[key] = array
+            self.nBytes += array.nbytes
+            while self.nBytes > self.maxBytes and len(self._arrays) > 1:
+                _, dropped = self._arrays.popitem(last=False)
+                self.nBytes -= dropped.nbytes
+        return array
+
+    def __contains__(self, key):
+        # without counting a hit or making it the most recently used
+        with self._lock:
+            return key in self._arrays
+
+    def clear(self):
+        with self._lock:
+            self._arrays.clear()
+            self.nBytes = 0
@@ -149,8 +149,10 @@ def logAttrib(obj, log, attrib, value=None):
     """Logs a change of a visual attribute on the next window.flip.
     If value=None, it will take the value of self.attrib.
     """
-    # Default to autoLog if log isn't set explicitly
-    if log or log is None and obj.autoLog:
+    # Default to autoLog if log isn't set explicitly, and don't build the
+    # message if no log target would receive it
+    if ((log or log is None and obj.autoLog) and
+            logging.root.isEnabledFor(logging.EXP)):
         if value is None:
             value = getattr(obj, attrib)
 
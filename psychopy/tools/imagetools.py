@@ -9,6 +9,11 @@
 
 from __future__ import absolute_import, print_function
 
+from builtins import object
+from past.builtins import basestring
+import json
+import os
+
 try:
     from PIL import Image
 except ImportError:
@@ -67,3 +72,152 @@ def makeImageAuto(inarray):
     ie. scales a numeric array from -1:1 to 0:255 and
     converts to PIL image format"""
     return image2array(float_uint8(inarray))
+
+
+class PackedImage(numpy.ndarray):
+    """A uint8 image (rows x cols, or rows x cols x 3 or 4 channels) from an
+    :class:`ImageSet`, stored bottom row first as textures are uploaded.
+
+    These are views into the memory-mapped file, so no copy is made until
+    OpenGL reads the pixels. Setting one as the image of an
+    :class:`~psychopy.visual.ImageStim` uploads it as it is, unlike other
+    numpy arrays which are treated as -1:1 intensities.
+    """
+
+    def __array_finalize__(self, obj):
+        self.name = getattr(obj, 'name', None)
+
+
+def packImages(images, fileName):
+    """Decode image files into a single uint8 array file, which can then be
+    memory-mapped as an :class:`ImageSet`, without holding all the decoded
+    images in memory at once.
+
+    :parameters:
+
+        - images:
+            a directory (every image file within it is packed, and named by
+            its path relative to the directory) or a list of file names
+            (e.g. an image column of `data.importConditions()`, as
+            `[trial['image'] for trial in conditions]`), which are kept as
+            the names of the images
+
+        - fileName:
+            the .npy file to write; the index of the images (their names,
+            shapes and positions in the array) is written to
+            `fileName + '.json'`
+
+    Luminance images are stored with one channel, images with transparency
+    as RGBA, and all others as RGB.
+
+    Returns the :class:`ImageSet`.
+    """
+    if isinstance(images, basestring):
+        directory = images
+        names = []
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                try:
+                    Image.open(path).close()
+                except IOError:
+                    continue  # not an image
+                names.append(os.path.relpath(path, directory))
+        paths = [os.path.join(directory, name) for name in names]
+    else:
+        names = []
+        for name in images:
+            if name not in names:  # e.g. an image in several conditions
+                names.append(name)
+        paths = names
+
+    # find the shapes first (PIL only reads the image headers for this) so
+    # that each image can be decoded straight into the file
+    index = []
+    offset = 0
+    for name, path in zip(names, paths):
+        im = Image.open(path)
+        if im.mode == 'L':
+            mode = 'L'
+        elif 'A' in im.mode or 'transparency' in im.info:
+            mode = 'RGBA'
+        else:
+            mode = 'RGB'
+        shape = [im.size[1], im.size[0]]
+        if mode != 'L':
+            shape.append(len(mode))
+        nBytes = int(numpy.prod(shape))
+        index.append({'name': name, 'mode': mode, 'shape': shape,
+                      'offset': offset})
+        offset += nBytes
+        im.close()
+
+    data = numpy.lib.format.open_memmap(fileName, mode='w+',
+                                        dtype=numpy.uint8,
+                                        shape=(max(offset, 1),))
+    for entry, path in zip(index, paths):
+        im = Image.open(path).convert(entry['mode'])
+        im = im.transpose(Image.FLIP_TOP_BOTTOM)
+        start = entry['offset']
+        stop = start + int(numpy.prod(entry['shape']))
+        data[start:stop] = numpy.asarray(im).ravel()
+    data.flush()
+    del data
+
+    with open(fileName + '.json', 'w') as f:
+        json.dump(index, f)
+    return ImageSet(fileName)
+
+
+class ImageSet(object):
+    """Images packed into one file by :func:`packImages`, memory-mapped so
+    that only those in use are read from disk (by the operating system, as
+    needed).
+
+    Images are got by name or by position, as :class:`PackedImage`
+    arrays::
+
+        images = ImageSet('rsvpImages.npy')
+        stim = visual.ImageStim(win, image=images['faces/01.jpg'])
+        for name in trialNames:
+            stim.image = images[name]
+
+    """
+
+    def __init__(self, fileName):
+        super(ImageSet, self).__init__()
+        self.fileName = fileName
+        with open(fileName + '.json') as f:
+            self.index = json.load(f)
+        self._positions = dict((entry['name'], i)
+                               for i, entry in enumerate(self.index))
+        self._data = numpy.load(fileName, mmap_mode='r')
+
+    @property
+    def names(self):
+        return [entry['name'] for entry in self.index]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __iter__(self):
+        for i in range(len(self.index)):
+            yield self[i]
+
+    def __getitem__(self, key):
+        if isinstance(key, basestring):
+            if key not in self._positions:
+                raise KeyError("No image named %s in %s" %
+                               (key, self.fileName))
+            key = self._positions[key]
+        entry = self.index[key]
+        start = entry['offset']
+        stop = start + int(numpy.prod(entry['shape']))
+        image = self._data[start:stop].reshape(entry['shape'])
+        image = image.view(PackedImage)
+        image.name = entry['name']
+        return image
@@ -22,7 +22,7 @@ from psychopy.visual.backends import gamma
 from .basevisual import BaseVisualStim
 # non-private helpers
 from .helpers import pointInPolygon, polygonsOverlap
-from .image import ImageStim
+from .image import ImageStim, ImagePreloader
 from .text import TextStim
 # window, should always be loaded first
 from .window import Window, getMsPerFrame, openWindows
@@ -79,6 +79,9 @@ from psychopy.visual.textbox import TextBox
 
 # rift support 
 from psychopy.visual.rift import Rift
+
+from psychopy.visual.frameprofiler import FrameProfiler
+from psychopy.visual.frameintervals import FrameIntervalRecorder
 """
 try:
     from psychopy.contrib.lazy_import import lazy_import
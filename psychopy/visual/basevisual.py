@@ -44,7 +44,8 @@ from psychopy.tools.monitorunittools import (cm2pix, deg2pix, pix2cm,
 from psychopy.visual.helpers import (pointInPolygon, polygonsOverlap,
                                      setColor, findImageFile)
 from psychopy.tools.typetools import float_uint8
-from psychopy.tools.arraytools import makeRadialMatrix
+from psychopy.tools.imagetools import PackedImage
+from psychopy.tools.arraytools import makeRadialMatrix, ArrayCache
 from . import globalVars
 
 import numpy
@@ -54,6 +55,17 @@ from psychopy.constants import NOT_STARTED, STARTED, STOPPED
 
 reportNImageResizes = 5  # permitted number of resizes
 
+# the intensity arrays (float32, -1:1) of procedural textures, shared by all
+# stimuli with the same texture, res and mask parameters
+textureCache = ArrayCache(maxBytes=128 * 2**20)
+_proceduralTextures = ('sin', 'sqr', 'saw', 'tri', 'sinXsin', 'sqrXsqr',
+                       'circle', 'gauss', 'cross', 'radRamp', 'raisedCos')
+
+# image files decoded ahead of use by an ImagePreloader, and threading.Events
+# for those still being decoded, keyed by _imageKey()
+preloadedImages = ArrayCache(maxBytes=512 * 2**20)
+_pendingImages = {}
+
 """
 There are several base and mix-in visual classes for multiple inheritance:
   - MinimalStim:       non-visual house-keeping code common to all visual stim
@@ -608,6 +620,109 @@ class ContainerMixin(object):
         return polygonsOverlap(self, polygon)
 
 
+def _decodeImage(tex, pixFormat, forcePOW2, useShaders, dataType):
+    """Decodes an image (a file name or PIL image) into the intensity array
+    uploaded by TextureMixin._createTexture.
+
+    Returns (intensity, origSize, wasLum, dataType)
+    """
+    if isinstance(tex, basestring):
+        # maybe tex is the name of a file:
+        filename = findImageFile(tex)
+        if not filename:
+            msg = "Couldn't find image %s; check path? (tried: %s)"
+            logging.error(msg % (tex, os.path.abspath(tex)))
+            logging.flush()
+            raise IOError(msg % (tex, os.path.abspath(tex)))
+        try:
+            im = Image.open(filename)
+            im = im.transpose(Image.FLIP_TOP_BOTTOM)
+        except IOError:
+            msg = "Found file '%s', failed to load as an image"
+            logging.error(msg % (filename))
+            logging.flush()
+            msg = "Found file '%s' [= %s], failed to load as an image"
+            raise IOError(msg % (tex, os.path.abspath(tex)))
+    else:
+        # can't be a file; maybe its an image already in memory?
+        try:
+            im = tex.copy().transpose(Image.FLIP_TOP_BOTTOM)
+        except AttributeError:  # nope, not an image in memory
+            msg = "Couldn't make sense of requested image."
+            logging.error(msg)
+            logging.flush()
+            raise AttributeError(msg)
+    # at this point we have a valid im
+    origSize = im.size
+    # is it 1D?
+    if im.size[0] == 1 or im.size[1] == 1:
+        logging.error("Only 2D textures are supported at the moment")
+    else:
+        maxDim = max(im.size)
+        powerOf2 = int(2**numpy.ceil(numpy.log2(maxDim)))
+        if forcePOW2 and (im.size[0] != powerOf2 or
+                          im.size[1] != powerOf2):
+            if globalVars.nImageResizes < reportNImageResizes:
+                msg = ("Image '%s' was not a square power-of-two ' "
+                       "'image. Linearly interpolating to be %ix%i")
+                logging.warning(msg % (tex, powerOf2, powerOf2))
+                globalVars.nImageResizes += 1
+                im = im.resize([powerOf2, powerOf2], Image.BILINEAR)
+            elif globalVars.nImageResizes == reportNImageResizes:
+                logging.warning("Multiple images have needed resizing"
+                                " - I'll stop bothering you!")
+                im = im.resize([powerOf2, powerOf2], Image.BILINEAR)
+    # is it Luminance or RGB?
+    if pixFormat == GL.GL_ALPHA and im.mode != 'L':
+        # we have RGB and need Lum
+        wasLum = True
+        im = im.convert("L")  # force to intensity (need if was rgb)
+    elif im.mode == 'L':  # we have lum and no need to change
+        wasLum = True
+        if useShaders:
+            dataType = GL.GL_FLOAT
+    elif pixFormat == GL.GL_RGB:
+        # we want RGB and might need to convert from CMYK or Lm
+        # texture = im.tostring("raw", "RGB", 0, -1)
+        im = im.convert("RGBA")
+        wasLum = False
+    if dataType == GL.GL_FLOAT:
+        # convert from ubyte to float
+        # much faster to avoid division 2/255
+        intensity = numpy.array(im).astype(
+            numpy.float32) * 0.0078431372549019607 - 1.0
+    else:
+        intensity = numpy.array(im)
+    return intensity, origSize, wasLum, dataType
+
+
+def _imageKey(fileName, pixFormat, useShaders, dataType):
+    # key of an image file decoded for these arguments in preloadedImages
+    return (os.path.abspath(fileName), os.path.getmtime(fileName),
+            pixFormat, bool(useShaders), dataType)
+
+
+def _loadImage(tex, pixFormat, forcePOW2, useShaders, dataType):
+    """As _decodeImage, but image files are taken from preloadedImages if
+    they have been decoded already (see ImagePreloader).
+    """
+    if isinstance(tex, basestring) and not forcePOW2:
+        fileName = findImageFile(tex)
+        if fileName:
+            key = _imageKey(fileName, pixFormat, useShaders, dataType)
+            pending = _pendingImages.get(key)
+            if pending is not None:
+                pending.wait()
+            intensity = preloadedImages.get(key)
+            if intensity is not None:
+                # as decoded, without resizing; float if converted
+                origSize = (intensity.shape[1], intensity.shape[0])
+                if intensity.dtype == numpy.float32:
+                    dataType = GL.GL_FLOAT
+                return intensity, origSize, intensity.ndim == 2, dataType
+    return _decodeImage(tex, pixFormat, forcePOW2, useShaders, dataType)
+
+
 class TextureMixin(object):
     """Mixin class for visual stim that have textures.
 
@@ -643,7 +758,6 @@ class TextureMixin(object):
         """
 
         # Create an intensity texture, ranging -1:1.0
-        notSqr = False  # most of the options will be creating a sqr texture
         wasImage = False  # change this if image loading works
         useShaders = stim.useShaders
         interpolate = stim.interpolate
@@ -661,8 +775,36 @@ class TextureMixin(object):
         allMaskParams = {'fringeWidth': 0.2, 'sd': 3}
         allMaskParams.update(maskParams)
 
+        # procedural textures are only made once for each set of parameters
+        cacheKey = cached = None
+        if isinstance(tex, basestring) and tex in _proceduralTextures:
+            cacheKey = (tex, res)
+            if tex == 'gauss':
+                cacheKey += (float(allMaskParams['sd']),)
+            elif tex == 'raisedCos':
+                cacheKey += (float(allMaskParams['fringeWidth']),)
+            cached = textureCache.get(cacheKey)
+
         sin = numpy.sin
-        if type(tex) == numpy.ndarray:
+        if cached is not None:
+            intensity = cached
+            wasLum = True
+        elif isinstance(tex, PackedImage):
+            # already decoded (and flipped) as uint8 in an ImageSet, so it
+            # is uploaded straight from the memory-mapped file
+            intensity = tex
+            stim._origSize = (tex.shape[1], tex.shape[0])
+            wasLum = tex.ndim == 2
+            dataType = GL.GL_UNSIGNED_BYTE
+            if pixFormat == GL.GL_ALPHA and not wasLum:
+                intensity = numpy.asarray(Image.fromarray(tex).convert('L'))
+                wasLum = True
+            elif pixFormat == GL.GL_RGB and wasLum and useShaders:
+                # the shader for lum images wants -1:1, as for an 'L' file
+                intensity = numpy.asarray(tex) * numpy.float32(2 / 255.0) - 1.0
+                dataType = GL.GL_FLOAT
+            wasImage = True
+        elif type(tex) == numpy.ndarray:
             # handle a numpy array
             # for now this needs to be an NxN intensity array
             intensity = tex.astype(numpy.float32)
@@ -804,75 +946,12 @@ class TextureMixin(object):
             intensity[artifactIdx] = 0
 
         else:
-            if isinstance(tex, basestring):
-                # maybe tex is the name of a file:
-                filename = findImageFile(tex)
-                if not filename:
-                    msg = "Couldn't find image %s; check path? (tried: %s)"
-                    logging.error(msg % (tex, os.path.abspath(tex)))
-                    logging.flush()
-                    raise IOError(msg % (tex, os.path.abspath(tex)))
-                try:
-                    im = Image.open(filename)
-                    im = im.transpose(Image.FLIP_TOP_BOTTOM)
-                except IOError:
-                    msg = "Found file '%s', failed to load as an image"
-                    logging.error(msg % (filename))
-                    logging.flush()
-                    msg = "Found file '%s' [= %s], failed to load as an image"
-                    raise IOError(msg % (tex, os.path.abspath(tex)))
-            else:
-                # can't be a file; maybe its an image already in memory?
-                try:
-                    im = tex.copy().transpose(Image.FLIP_TOP_BOTTOM)
-                except AttributeError:  # nope, not an image in memory
-                    msg = "Couldn't make sense of requested image."
-                    logging.error(msg)
-                    logging.flush()
-                    raise AttributeError(msg)
-            # at this point we have a valid im
-            stim._origSize = im.size
+            intensity, stim._origSize, wasLum, dataType = _loadImage(
+                tex, pixFormat, forcePOW2, useShaders, dataType)
             wasImage = True
-            # is it 1D?
-            if im.size[0] == 1 or im.size[1] == 1:
-                logging.error("Only 2D textures are supported at the moment")
-            else:
-                maxDim = max(im.size)
-                powerOf2 = int(2**numpy.ceil(numpy.log2(maxDim)))
-                if im.size[0] != powerOf2 or im.size[1] != powerOf2:
-                    if not forcePOW2:
-                        notSqr = True
-                    elif globalVars.nImageResizes < reportNImageResizes:
-                        msg = ("Image '%s' was not a square power-of-two ' "
-                               "'image. Linearly interpolating to be %ix%i")
-                        logging.warning(msg % (tex, powerOf2, powerOf2))
-                        globalVars.nImageResizes += 1
-                        im = im.resize([powerOf2, powerOf2], Image.BILINEAR)
-                    elif globalVars.nImageResizes == reportNImageResizes:
-                        logging.warning("Multiple images have needed resizing"
-                                        " - I'll stop bothering you!")
-                        im = im.resize([powerOf2, powerOf2], Image.BILINEAR)
-            # is it Luminance or RGB?
-            if pixFormat == GL.GL_ALPHA and im.mode != 'L':
-                # we have RGB and need Lum
-                wasLum = True
-                im = im.convert("L")  # force to intensity (need if was rgb)
-            elif im.mode == 'L':  # we have lum and no need to change
-                wasLum = True
-                if useShaders:
-                    dataType = GL.GL_FLOAT
-            elif pixFormat == GL.GL_RGB:
-                # we want RGB and might need to convert from CMYK or Lm
-                # texture = im.tostring("raw", "RGB", 0, -1)
-                im = im.convert("RGBA")
-                wasLum = False
-            if dataType == GL.GL_FLOAT:
-                # convert from ubyte to float
-                # much faster to avoid division 2/255
-                intensity = numpy.array(im).astype(
-                    numpy.float32) * 0.0078431372549019607 - 1.0
-            else:
-                intensity = numpy.array(im)
+        if cacheKey is not None and cached is None:
+            intensity = textureCache.add(
+                cacheKey, numpy.asarray(intensity, numpy.float32))
         if pixFormat == GL.GL_RGB and wasLum and dataType == GL.GL_FLOAT:
             # grating stim on good machine
             # keep as float32 -1:1
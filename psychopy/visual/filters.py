@@ -13,13 +13,18 @@ from __future__ import absolute_import, division, print_function
 
 from past.utils import old_div
 import numpy
-from numpy.fft import fft2, ifft2, fftshift, ifftshift
+from numpy.fft import fft2, ifft2, fftshift, ifftshift, rfft2, irfft2
 from psychopy import logging
+from psychopy.tools.arraytools import ArrayCache
 try:
     from PIL import Image
 except ImportError:
     import Image
 
+# Butterworth filters, keyed by their size and parameters. They are
+# returned as copies (or new arrays) so callers can still change them.
+filterCache = ArrayCache(maxBytes=128 * 2**20)
+
 
 def makeGrating(res,
                 ori=0.0,  # in degrees
@@ -263,11 +268,16 @@ def conv2d(smaller, larger):
     Actually right now the matrices must be the same size (will sort out
     padding issues another day!)
     """
-    smallerFFT = fft2(smaller)
-    largerFFT = fft2(larger)
+    if numpy.iscomplexobj(smaller) or numpy.iscomplexobj(larger):
+        smallerFFT = fft2(smaller)
+        largerFFT = fft2(larger)
 
-    invFFT = ifft2(smallerFFT * largerFFT)
-    return invFFT.real
+        invFFT = ifft2(smallerFFT * largerFFT)
+        return invFFT.real
+    # the real part of the full transforms is what the half (real)
+    # transforms give
+    shape = numpy.shape(larger)
+    return irfft2(rfft2(smaller) * rfft2(larger), shape)
 
 
 def imfft(X):
@@ -282,6 +292,67 @@ def imifft(X):
     return numpy.abs(ifft2(ifftshift(X)))
 
 
+def _halfSpectrumFilter(filt):
+    """Returns the half of a centred filter (see butter2d_lp) that rfft2
+    gives spectra for, made symmetric so that filtering with it gives the
+    real part of filtering with the full filter.
+    """
+    filt = ifftshift(filt, axes=(-2, -1))
+    # the filter at the negative of each frequency, filt(-k)
+    flipped = numpy.roll(filt[..., ::-1, ::-1], 1, axis=(-2, -1))
+    half = filt.shape[-1] // 2 + 1
+    return (filt[..., :half] + numpy.conj(flipped[..., :half])) / 2.0
+
+
+def filterImage(image, filt):
+    """Filter an image with a centred filter in the frequency domain
+    (e.g. from butter2d_lp) and return the real filtered image.
+
+    This is `numpy.real(ifft2(ifftshift(imfft(image) * filt)))`, but uses
+    the real transforms (rfft2) for real images, which take about half the
+    time and memory.
+    """
+    if numpy.iscomplexobj(image):
+        return numpy.real(ifft2(ifftshift(imfft(image) * filt)))
+    return irfft2(rfft2(image) * _halfSpectrumFilter(filt),
+                  numpy.shape(image))
+
+
+def filterImages(images, filt):
+    """Filter a stack of images (N x rows x cols) with the same centred
+    filter (rows x cols) in one call, as filterImage does for each image.
+    """
+    images = numpy.asarray(images)
+    if numpy.iscomplexobj(images):
+        spectra = fftshift(fft2(images), axes=(-2, -1))
+        return numpy.real(ifft2(ifftshift(spectra * filt, axes=(-2, -1))))
+    return irfft2(rfft2(images) * _halfSpectrumFilter(filt),
+                  images.shape[-2:])
+
+
+def _radius(rows, cols):
+    # an array with every pixel = radius relative to center
+    key = ('radius', rows, cols)
+    radius = filterCache.get(key)
+    if radius is None:
+        x = numpy.linspace(-0.5, 0.5, cols)
+        y = numpy.linspace(-0.5, 0.5, rows)
+        radius = filterCache.add(
+            key, numpy.sqrt((x**2)[numpy.newaxis] + (y**2)[:, numpy.newaxis]))
+    return radius
+
+
+def _butter2d_lp(size, cutoff, n):
+    # the (shared, read-only) lowpass filter
+    rows, cols = size
+    key = ('lp', rows, cols, cutoff, n)
+    f = filterCache.get(key)
+    if f is None:
+        radius = _radius(rows, cols)
+        f = filterCache.add(key, 1 / (1.0 + (radius/cutoff)**(2 * n)))
+    return f
+
+
 def butter2d_lp(size, cutoff, n=3):
     """Create lowpass 2D Butterworth filter.
 
@@ -304,16 +375,7 @@ def butter2d_lp(size, cutoff, n=3):
     if not isinstance(n, int):
         raise ValueError('n must be an integer >= 1')
 
-    rows, cols = size
-
-    x = numpy.linspace(-0.5, 0.5, cols)
-    y = numpy.linspace(-0.5, 0.5, rows)
-
-    # An array with every pixel = radius relative to center
-    radius = numpy.sqrt((x**2)[numpy.newaxis] + (y**2)[:, numpy.newaxis])
-
-    f = 1 / (1.0 + (radius/cutoff)**(2 * n))   # The filter
-    return f
+    return _butter2d_lp(size, cutoff, n).copy()
 
 
 def butter2d_bp(size, cutin, cutoff, n):
@@ -336,7 +398,7 @@ def butter2d_bp(size, cutin, cutoff, n):
 
     """
 
-    return butter2d_lp(size, cutoff, n) - butter2d_lp(size, cutin, n)
+    return _butter2d_lp(size, cutoff, n) - _butter2d_lp(size, cutin, n)
 
 
 def butter2d_hp(size, cutoff, n=3):
@@ -356,7 +418,7 @@ def butter2d_hp(size, cutoff, n=3):
             filter kernel in 2D centered
 
     """
-    return 1.0 - butter2d_lp(size, cutoff, n)
+    return 1.0 - _butter2d_lp(size, cutoff, n)
 
 
 def butter2d_lp_elliptic(size, cutoff_x, cutoff_y, n=3,
@@ -388,14 +450,18 @@ def butter2d_lp_elliptic(size, cutoff_x, cutoff_y, n=3,
         raise ValueError('cutoff_y frequency must be between 0 and 1')
 
     rows, cols = size
+    key = ('elliptic', rows, cols, cutoff_x, cutoff_y, n, alpha,
+           offset_x, offset_y)
+    f = filterCache.get(key)
+    if f is None:
+        # this time we start up with 2D arrays for easy broadcasting
+        x = (numpy.linspace(-0.5, 0.5, cols) - offset_x)[numpy.newaxis]
+        y = (numpy.linspace(-0.5, 0.5, rows) - offset_y)[:, numpy.newaxis]
 
-    # this time we start up with 2D arrays for easy broadcasting
-    x = (numpy.linspace(-0.5, 0.5, cols) - offset_x)[numpy.newaxis]
-    y = (numpy.linspace(-0.5, 0.5, rows) - offset_y)[:, numpy.newaxis]
+        x2 = (x * numpy.cos(alpha) - y * numpy.sin(-alpha))
+        y2 = (x * numpy.sin(-alpha) + y * numpy.cos(alpha))
 
-    x2 = (x * numpy.cos(alpha) - y * numpy.sin(-alpha))
-    y2 = (x * numpy.sin(-alpha) + y * numpy.cos(alpha))
+        f = filterCache.add(
+            key, 1 / (1+((x2/(cutoff_x))**2+(y2/(cutoff_y))**2)**n))
 
-    f = 1 / (1+((x2/(cutoff_x))**2+(y2/(cutoff_y))**2)**n)
-
-    return f
+    return f.copy()
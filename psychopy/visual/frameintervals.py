@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""An array backed store for the frame intervals recorded by a Window"""
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+from __future__ import absolute_import, division, print_function
+
+from bisect import bisect_left
+
+import numpy
+
+# intervals are counted in bins of HIST_BIN sec, up to HIST_MAX sec, to
+# estimate percentiles without keeping the intervals sorted
+HIST_BIN = 0.0001
+HIST_MAX = 1.0
+
+
+class FrameIntervalRecorder(object):
+    """Stores frame intervals (in sec) in blocks of float64 arrays, keeping
+    running statistics as they are added.
+
+    It behaves as the list of intervals it replaces: intervals are added
+    with append(), extend() or +=, removed with pop() or del, and it
+    supports len(), indexing (slices are returned as lists), iteration,
+    + (giving a list), comparison with lists and numpy.array(recorder).
+    It is not a list, though: item assignment, insert(), sort() etc. are
+    not supported (use tolist() for a list copy).
+
+    If spillFile is given, each block is written to that file once full,
+    and the intervals are read back from it through a memory map, so long
+    sessions only keep one block in memory.
+
+    Markers (see addMarker()) divide the intervals into segments, e.g. one
+    for each routine, which can be summarised separately.
+
+    :parameters:
+
+        - blockSize:
+            the number of intervals in each block
+
+        - spillFile:
+            path of a file to write full blocks to (it is overwritten)
+
+    """
+
+    def __init__(self, blockSize=4096, spillFile=None):
+        super(FrameIntervalRecorder, self).__init__()
+        self.blockSize = blockSize
+        self.spillFile = spillFile
+        self._spillStream = None
+        self._spilled = None  # memory map of the spilled blocks
+        self.clear()
+
+    def clear(self):
+        """Remove all intervals and markers"""
+        self._blocks = []
+        self._nBlocksSpilled = 0
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0  # sum of squared differences from the mean
+        self.min = self.max = None
+        self._hist = numpy.zeros(int(round(HIST_MAX / HIST_BIN)) + 1,
+                                 numpy.int64)
+        self.markers = []  # (index of first interval, label)
+        self._spilled = None
+        if self.spillFile is not None:
+            if self._spillStream is not None:
+                self._spillStream.close()
+            self._spillStream = open(self.spillFile, 'wb')
+
+    def append(self, interval):
+        """Add the interval (sec) between the last two frames"""
+        n = self._n
+        i = n % self.blockSize
+        if i == 0:
+            self._newBlock()
+        self._blocks[-1][i] = interval
+        self._n = n + 1
+        # running mean and variance (Welford's method)
+        delta = interval - self._mean
+        self._mean += delta / (n + 1)
+        self._m2 += delta * (interval - self._mean)
+        if n == 0:
+            self.min = self.max = interval
+        elif interval < self.min:
+            self.min = interval
+        elif interval > self.max:
+            self.max = interval
+        self._hist[min(int(interval / HIST_BIN), len(self._hist) - 1)] += 1
+
+    def extend(self, intervals):
+        for interval in intervals:
+            self.append(interval)
+
+    def pop(self, index=-1):
+        """Remove the interval at index (the last, by default) and return
+        it. Markers after it move back by one.
+
+        Unlike list.pop() this rebuilds the recorder, so it takes time in
+        proportion to the number of intervals.
+        """
+        interval = self[index]
+        self._remove([index % self._n])
+        return interval
+
+    def _remove(self, indices):
+        # rebuild the recorder without the intervals at these indices
+        removed = sorted(set(indices))
+        if not removed:
+            return
+        keep = numpy.ones(self._n, bool)
+        keep[removed] = False
+        intervals = self.toArray()[keep].tolist()
+        markers = [(index - bisect_left(removed, index), label)
+                   for index, label in self.markers]
+        self.clear()
+        self.extend(intervals)
+        self.markers = markers
+
+    def _newBlock(self):
+        if self._spillStream is not None and self._blocks:
+            # the last block is full; write it out and reuse its array
+            block = self._blocks.pop()
+            self._spillStream.write(block.tobytes())
+            self._spillStream.flush()
+            self._nBlocksSpilled += 1
+            self._spilled = None
+            self._blocks.append(block)
+        else:
+            self._blocks.append(numpy.empty(self.blockSize))
+
+    def _arrays(self):
+        # the intervals, as a list of arrays in order
+        arrays = []
+        if self._nBlocksSpilled:
+            if self._spilled is None:
+                self._spilled = numpy.memmap(
+                    self.spillFile, numpy.float64, 'r',
+                    shape=(self._nBlocksSpilled * self.blockSize,))
+            arrays.append(self._spilled)
+        inMemory = self._n - self._nBlocksSpilled * self.blockSize
+        for block in self._blocks:
+            arrays.append(block[:min(inMemory, self.blockSize)])
+            inMemory -= self.blockSize
+        return arrays
+
+    def toArray(self, start=None, stop=None):
+        """Return a copy of the intervals (or a slice of them) as an array"""
+        start, stop, _ = slice(start, stop).indices(self._n)
+        parts = []
+        offset = 0
+        for array in self._arrays():
+            end = offset + len(array)
+            if end > start and offset < stop:
+                parts.append(array[max(start - offset, 0):
+                                   min(stop - offset, len(array))])
+            offset = end
+        if not parts:
+            return numpy.empty(0)
+        return numpy.concatenate(parts)
+
+    def tolist(self):
+        return self.toArray().tolist()
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._n)
+            if step < 0:
+                return self.tolist()[index]
+            return self.toArray(start, stop)[::step].tolist()
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError('frame interval index out of range')
+        spilled = self._nBlocksSpilled * self.blockSize
+        if index < spilled:
+            return float(self._arrays()[0][index])
+        index -= spilled
+        return float(self._blocks[index // self.blockSize]
+                     [index % self.blockSize])
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            self._remove(range(self._n)[index])
+        else:
+            self.pop(index)
+
+    def __iadd__(self, intervals):
+        self.extend(intervals)
+        return self
+
+    def __add__(self, other):
+        return self.tolist() + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self.tolist()
+
+    def __iter__(self):
+        for array in self._arrays():
+            for interval in array.tolist():
+                yield interval
+
+    def __array__(self, dtype=None):
+        array = self.toArray()
+        return array if dtype is None else array.astype(dtype)
+
+    def __eq__(self, other):
+        if isinstance(other, FrameIntervalRecorder):
+            other = other.tolist()
+        return self.tolist() == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    @property
+    def mean(self):
+        """Mean of all the intervals (None if there are none)"""
+        return self._mean if self._n else None
+
+    @property
+    def sd(self):
+        """Standard deviation of all the intervals"""
+        if self._n < 2:
+            return None
+        return (self._m2 / (self._n - 1)) ** 0.5
+
+    def percentile(self, q):
+        """Estimate the q'th percentile of all the intervals, to within
+        HIST_BIN sec, without sorting them
+        """
+        if not self._n:
+            return None
+        cumulative = numpy.cumsum(self._hist)
+        rank = q / 100.0 * self._n
+        i = int(numpy.searchsorted(cumulative, rank))
+        i = min(i, len(cumulative) - 1)
+        below = cumulative[i - 1] if i else 0
+        fraction = (rank - below) / max(self._hist[i], 1)
+        estimate = (i + min(max(fraction, 0.0), 1.0)) * HIST_BIN
+        return min(max(estimate, self.min), self.max)
+
+    def countAbove(self, threshold):
+        """Number of intervals longer than threshold (sec), such as dropped
+        frames. Only the intervals in the same histogram bin as the
+        threshold need to be compared with it."""
+        if threshold >= HIST_MAX:
+            return int((self.toArray() > threshold).sum())
+        i = int(threshold / HIST_BIN)
+        n = int(self._hist[i + 1:].sum())
+        if self._hist[i]:
+            # the bin holding the threshold has to be checked one by one
+            array = self.toArray()
+            inBin = array[(array >= i * HIST_BIN) &
+                          (array < (i + 1) * HIST_BIN)]
+            n += int((inBin > threshold).sum())
+        return n
+
+    def addMarker(self, label):
+        """Start a new segment of intervals (e.g. for a routine or trial)
+        with the next interval added"""
+        self.markers.append((self._n, label))
+
+    def segments(self):
+        """Return a list of (label, start, stop) for each segment, where
+        intervals[start:stop] are those of the segment. Intervals before
+        the first marker are in a segment labelled None.
+        """
+        bounds = list(self.markers)
+        if not bounds or bounds[0][0] > 0:
+            bounds.insert(0, (0, None))
+        return [(label, start, end) for (start, label), (end, _) in
+                zip(bounds, bounds[1:] + [(self._n, None)])]
+
+    def segmentStats(self, threshold=None, percentiles=(50, 95, 99)):
+        """Summarise the intervals of each segment.
+
+        Returns a list with a dict for each segment: label, n, mean, sd,
+        min and max (sec), the given percentiles (as 'p50' etc.) and, if
+        threshold is given, nAbove, the number of intervals longer than it.
+        """
+        stats = []
+        for label, start, stop in self.segments():
+            values = self.toArray(start, stop)
+            segment = dict(label=label, n=len(values))
+            if len(values):
+                segment.update(mean=values.mean(), sd=values.std(ddof=1)
+                               if len(values) > 1 else None,
+                               min=values.min(), max=values.max())
+                for p in percentiles:
+                    segment['p%g' % p] = numpy.percentile(values, p)
+                if threshold is not None:
+                    segment['nAbove'] = int((values > threshold).sum())
+            stats.append(segment)
+        return stats
+
+    def save(self, fileName):
+        """Save the intervals and markers in numpy's binary .npz format"""
+        labels = [u'' if label is None else u'%s' % label
+                  for _, label in self.markers]
+        numpy.savez(fileName, intervals=self.toArray(),
+                    markerIndices=numpy.array(
+                        [i for i, _ in self.markers], numpy.int64),
+                    markerLabels=numpy.array(labels, dtype=numpy.str_))
+
+    @classmethod
+    def load(cls, fileName, **kwargs):
+        """Create a recorder holding the intervals and markers saved with
+        save()"""
+        recorder = cls(**kwargs)
+        with numpy.load(fileName) as data:
+            indices = data['markerIndices'].tolist()
+            labels = data['markerLabels'].tolist()
+            intervals = data['intervals']
+            start = 0
+            for index, label in zip(indices, labels):
+                recorder.extend(intervals[start:index].tolist())
+                recorder.addMarker(label)
+                start = index
+            recorder.extend(intervals[start:].tolist())
+        return recorder
+
+    def close(self):
+        """Close the spill file (if any); the intervals can still be read"""
+        if self._spillStream is not None:
+            self._spillStream.close()
+            self._spillStream = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Records where the time goes in each call to Window.flip()"""
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import weakref
+from collections import OrderedDict
+
+import numpy
+
+from psychopy import clock
+
+# the phases of Window.flip(), in the order they happen
+PHASES = ('draw', 'fbo', 'swap', 'clear', 'waitBlanking', 'callOnFlip',
+          'logging')
+DRAW, FBO, SWAP, CLEAR, WAIT_BLANKING, CALL_ON_FLIP, LOGGING = range(
+    len(PHASES))
+
+
+class FrameProfiler(object):
+    """Times the phases of each Window.flip(), and the draw() of each
+    autoDraw stimulus, into arrays allocated up front.
+
+    The phases are:
+
+        - draw: drawing the autoDraw stimuli
+        - fbo: copying the framebuffer object to the back buffer (if useFBO)
+        - swap: swapping the front and back buffers
+        - clear: resetting the view and clearing the buffer for the next
+          frame
+        - waitBlanking: waiting for the flip to complete (if waitBlanking)
+        - callOnFlip: functions given to Window.callOnFlip()
+        - logging: frame interval bookkeeping and logOnFlip() messages
+
+    The last nFrames frames are kept, and the first maxStimuli autoDraw
+    stimuli of each frame are timed separately. Times are taken on the CPU;
+    as OpenGL queues drawing commands, GPU work mostly shows up in the swap
+    and waitBlanking phases rather than in the stimulus draws.
+
+    Usually created with Window.startFrameProfiler()::
+
+        profiler = win.startFrameProfiler()
+        ...  # run some trials
+        profiler.printSummary()
+        profiler.saveChromeTrace('frames.json')  # for chrome://tracing
+    """
+
+    def __init__(self, nFrames=3600, maxStimuli=64):
+        super(FrameProfiler, self).__init__()
+        self.nFrames = nFrames
+        self.maxStimuli = maxStimuli
+        self.frameStart = numpy.zeros(nFrames)
+        self.phaseDurations = numpy.zeros((nFrames, len(PHASES)))
+        self.stimIndices = numpy.zeros((nFrames, maxStimuli), numpy.int32)
+        self.stimDurations = numpy.zeros((nFrames, maxStimuli))
+        self.nStimDrawn = numpy.zeros(nFrames, numpy.int32)
+        self.stimNames = []  # name of each stimulus, by index
+        # stim: index (weak, as a new stim may reuse a deleted one's id)
+        self._stimIndex = weakref.WeakKeyDictionary()
+        self.frameCount = 0  # frames recorded, including those overwritten
+        self._row = 0
+        self._last = 0.0
+        self._getTime = clock.getTime
+
+    def clear(self):
+        """Forget all recorded frames and stimuli"""
+        self.frameCount = 0
+        self.stimNames = []
+        self._stimIndex = weakref.WeakKeyDictionary()
+
+    def beginFrame(self):
+        """Called as Window.flip() starts"""
+        self._row = row = self.frameCount % self.nFrames
+        self._last = self.frameStart[row] = self._getTime()
+        self.nStimDrawn[row] = 0
+
+    def drawStim(self, stim):
+        """Draw an autoDraw stimulus, timing its draw()"""
+        t0 = self._getTime()
+        stim.draw()
+        t1 = self._getTime()
+        row = self._row
+        n = self.nStimDrawn[row]
+        if n < self.maxStimuli:
+            index = self._stimIndex.get(stim)
+            if index is None:
+                index = self._stimIndex[stim] = len(self.stimNames)
+                self.stimNames.append(getattr(stim, 'name', None) or
+                                      type(stim).__name__)
+            self.stimIndices[row, n] = index
+            self.stimDurations[row, n] = t1 - t0
+            self.nStimDrawn[row] = n + 1
+
+    def endPhase(self, phase):
+        """Called at the end of each phase of Window.flip(), with its index
+        in PHASES"""
+        t = self._getTime()
+        self.phaseDurations[self._row, phase] = t - self._last
+        self._last = t
+
+    def endFrame(self):
+        """Called as Window.flip() returns"""
+        self.frameCount += 1
+
+    def _rows(self):
+        # the rows of the recorded frames, oldest first
+        if self.frameCount <= self.nFrames:
+            return numpy.arange(self.frameCount)
+        return (numpy.arange(self.nFrames) + self.frameCount) % self.nFrames
+
+    def summary(self, percentiles=(50, 90, 99), topN=10):
+        """Summarise the recorded frames.
+
+        Returns a dict with:
+
+            - nFrames: the number of frames summarised
+            - phases: an OrderedDict of phase name: dict of the mean and
+              the given percentiles of the phase duration (as 'p50' etc.),
+              in ms, with 'total' for the whole of flip()
+            - stimuli: a list of the topN stimuli taking the most time to
+              draw, each a dict of name, nDraws, and the total, mean and
+              max draw time in ms
+        """
+        rows = self._rows()
+        phases = OrderedDict()
+        durations = self.phaseDurations[rows] * 1000
+        columns = [durations[:, i] for i in range(len(PHASES))]
+        for name, values in zip(PHASES + ('total',),
+                                columns + [durations.sum(axis=1)]):
+            stats = OrderedDict(mean=float(values.mean()) if len(values)
+                                else 0.0)
+            for p in percentiles:
+                stats['p%g' % p] = (float(numpy.percentile(values, p))
+                                    if len(values) else 0.0)
+            phases[name] = stats
+
+        drawn = (numpy.arange(self.maxStimuli) <
+                 self.nStimDrawn[rows][:, None])
+        indices = self.stimIndices[rows][drawn]
+        times = self.stimDurations[rows][drawn] * 1000
+        nStim = len(self.stimNames)
+        totals = numpy.bincount(indices, weights=times, minlength=nStim)
+        counts = numpy.bincount(indices, minlength=nStim)
+        maxima = numpy.zeros(nStim)
+        numpy.maximum.at(maxima, indices, times)
+        stimuli = []
+        for index in numpy.argsort(-totals, kind='mergesort')[:topN]:
+            if counts[index]:
+                stimuli.append(OrderedDict(
+                    name=self.stimNames[index], nDraws=int(counts[index]),
+                    total=float(totals[index]),
+                    mean=float(totals[index] / counts[index]),
+                    max=float(maxima[index])))
+        return dict(nFrames=len(rows), phases=phases, stimuli=stimuli)
+
+    def printSummary(self, percentiles=(50, 90, 99), topN=10):
+        """Print the summary() as tables of phase and stimulus draw times"""
+        summary = self.summary(percentiles, topN)
+        print('Window.flip() phase times (ms) over %i frames'
+              % summary['nFrames'])
+        names = list(summary['phases']['total'].keys())
+        print('%-14s' % 'phase' + ''.join('%10s' % n for n in names))
+        for phase, stats in summary['phases'].items():
+            print('%-14s' % phase +
+                  ''.join('%10.3f' % stats[n] for n in names))
+        if summary['stimuli']:
+            print('\nslowest autoDraw stimuli (ms)')
+            print('%-24s%10s%10s%10s%10s' % ('stimulus', 'draws', 'total',
+                                             'mean', 'max'))
+            for stim in summary['stimuli']:
+                print('%-24s%10i%10.2f%10.3f%10.3f' % (
+                    stim['name'][:23], stim['nDraws'], stim['total'],
+                    stim['mean'], stim['max']))
+
+    def saveChromeTrace(self, fileName):
+        """Save the recorded frames in the Chrome trace event format, to be
+        viewed with chrome://tracing or https://ui.perfetto.dev
+
+        Each flip() is an event containing an event for each phase, and the
+        draw phase an event for each stimulus drawn.
+        """
+        events = []
+        rows = self._rows()
+        first = self.frameCount - len(rows)
+        for frame, row in enumerate(rows, first):
+            start = self.frameStart[row] * 1e6
+            durations = self.phaseDurations[row] * 1e6
+            events.append(dict(name='flip', cat='frame', ph='X', pid=0,
+                               tid=0, ts=start, dur=durations.sum(),
+                               args=dict(frame=frame)))
+            ts = start
+            for phase, duration in zip(PHASES, durations.tolist()):
+                events.append(dict(name=phase, cat='phase', ph='X', pid=0,
+                                   tid=0, ts=ts, dur=duration))
+                ts += duration
+            ts = start
+            for n in range(self.nStimDrawn[row]):
+                duration = self.stimDurations[row, n] * 1e6
+                events.append(dict(
+                    name=self.stimNames[self.stimIndices[row, n]],
+                    cat='stim', ph='X', pid=0, tid=0, ts=ts, dur=duration))
+                ts += duration
+        with open(fileName, 'w') as f:
+            json.dump(dict(traceEvents=events, displayTimeUnit='ms'), f)
@@ -10,6 +10,7 @@
 from __future__ import absolute_import, division, print_function
 
 from builtins import str
+from past.builtins import basestring
 
 # Ensure setting pyglet.options['debug_gl'] to False is done prior to any
 # other calls to pyglet or pyglet submodules, otherwise it may not get picked
@@ -21,12 +22,18 @@ import ctypes
 GL = pyglet.gl
 
 import numpy
+import threading
+import time
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 
 import psychopy  # so we can get the __path__
 from psychopy import logging
 
 from psychopy.tools.attributetools import attributeSetter, setAttribute
 from psychopy.tools.arraytools import val2array
+from psychopy.visual import basevisual
+from psychopy.visual.helpers import findImageFile
 from psychopy.visual.basevisual import BaseVisualStim
 from psychopy.visual.basevisual import (ContainerMixin, ColorMixin,
                                         TextureMixin)
@@ -268,16 +275,18 @@ class ImageStim(BaseVisualStim, ContainerMixin, ColorMixin, TextureMixin):
 
     @attributeSetter
     def image(self, value):
-        """The image file to be presented (most formats supported).
+        """The image file to be presented (most formats supported), or an
+        image from a :class:`psychopy.tools.imagetools.ImageSet`.
         """
         self.__dict__['image'] = self._imName = value
 
         wasLumImage = self.isLumImage
-        if type(value) != numpy.ndarray and value == "color":
+        isArray = isinstance(value, numpy.ndarray)
+        if not isArray and value == "color":
             datatype = GL.GL_FLOAT
         else:
             datatype = GL.GL_UNSIGNED_BYTE
-        if type(value) != numpy.ndarray and value in (None, "None", "none"):
+        if not isArray and value in (None, "None", "none"):
             self.isLumImage = True
         else:
             self.isLumImage = self._createTexture(value, id=self._texID,
@@ -322,3 +331,122 @@ class ImageStim(BaseVisualStim, ContainerMixin, ColorMixin, TextureMixin):
         but use this method if you need to suppress the log message.
         """
         setAttribute(self, 'mask', value, log)
+
+
+class ImagePreloader(object):
+    """Decodes image files on a pool of threads, ahead of their use by
+    :class:`ImageStim`, so that setting `stim.image` to one of them needs no
+    decoding (only the upload of the texture).
+
+    The decoded arrays are kept in `psychopy.visual.basevisual.preloadedImages`
+    (limited to its `maxBytes`, the least recently used being dropped first).
+    An image that is still being decoded when it is set on a stimulus is
+    waited for, rather than decoded again.
+
+    Typical use, with the image files named in a conditions file::
+
+        trials = data.importConditions('conditions.xlsx')
+        preloader = visual.ImagePreloader(win)
+        preloader.preloadConditions(trials)
+        ...
+        stim.image = thisTrial['image']  # already decoded
+
+    :parameters:
+
+        - win:
+            the Window the images will be shown in (whether it uses shaders
+            affects how images are decoded)
+
+        - nThreads:
+            the number of images decoded at the same time (defaults to the
+            number of CPUs, up to 4)
+
+    """
+
+    def __init__(self, win=None, nThreads=None):
+        super(ImagePreloader, self).__init__()
+        if win is None:
+            self.useShaders = True
+        else:
+            self.useShaders = win._haveShaders
+        if nThreads is None:
+            nThreads = min(cpu_count(), 4)
+        self._pool = ThreadPool(nThreads)
+        self._results = []
+
+    def _key(self, fileName):
+        # ImageStim decodes files as RGB(A) bytes, without resizing
+        return basevisual._imageKey(fileName, GL.GL_RGB, self.useShaders,
+                                    GL.GL_UNSIGNED_BYTE)
+
+    def preload(self, fileNames):
+        """Start decoding the image files (a file name or a list of them).
+        Returns immediately; files already decoded are skipped.
+        """
+        if isinstance(fileNames, basestring):
+            fileNames = [fileNames]
+        for name in fileNames:
+            fileName = findImageFile(name)
+            if not fileName:
+                logging.warning("ImagePreloader couldn't find image %s" % name)
+                continue
+            key = self._key(fileName)
+            if (key in basevisual._pendingImages or
+                    key in basevisual.preloadedImages):
+                continue
+            event = threading.Event()
+            basevisual._pendingImages[key] = event
+            self._results.append(self._pool.apply_async(
+                self._decode, (fileName, key, event)))
+
+    def preloadConditions(self, conditions):
+        """Preload every value in a list of conditions (as returned by
+        `data.importConditions()`) that is the name of an image file.
+        """
+        fileNames = []
+        for condition in conditions:
+            for value in condition.values():
+                if (isinstance(value, basestring) and value not in fileNames
+                        and findImageFile(value)):
+                    fileNames.append(value)
+        self.preload(fileNames)
+
+    def _decode(self, fileName, key, event):
+        try:
+            intensity = basevisual._decodeImage(
+                fileName, GL.GL_RGB, False, self.useShaders,
+                GL.GL_UNSIGNED_BYTE)[0]
+            basevisual.preloadedImages.add(key, intensity)
+        except Exception as err:
+            logging.error("ImagePreloader failed to decode %s: %s" %
+                          (fileName, err))
+        finally:
+            del basevisual._pendingImages[key]
+            event.set()
+
+    def isReady(self, fileName):
+        """True if the image file has been decoded (and is still cached)"""
+        fileName = findImageFile(fileName)
+        return bool(fileName) and self._key(fileName) in \
+            basevisual.preloadedImages
+
+    def wait(self, timeout=None):
+        """Wait for all the images requested so far to be decoded. Returns
+        False if the timeout (sec) ran out first.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+        for result in self._results:
+            if timeout is None:
+                result.wait()
+            else:
+                result.wait(max(deadline - time.time(), 0))
+            if not result.ready():
+                break
+        self._results = [r for r in self._results if not r.ready()]
+        return not self._results
+
+    def close(self):
+        """Stop the threads once the images requested have been decoded"""
+        self._pool.close()
+        self._pool.join()
@@ -34,10 +34,20 @@ from psychopy.tools.attributetools import attributeSetter
 from .grating import GratingStim
 import numpy
 from numpy import exp, sin, cos
-from numpy.fft import fft2, ifft2, fftshift, ifftshift
+from numpy.fft import fft2, ifft2, fftshift, ifftshift, irfft2
+import os
+
+from psychopy.tools.arraytools import ArrayCache
 
 from . import shaders as _shaders
 
+# the amplitude spectra of the noise types made by filtering random phases,
+# keyed by their parameters (see NoiseStim.buildNoise)
+noiseFilters = ArrayCache(maxBytes=64 * 2**20)
+_spectralNoiseTypes = ['White','white','Isotropic','isotropic','Gabor',
+                       'gabor','Image','image','filtered','Filtered']
+_pixelNoiseTypes = ['binary','Binary','normal','Normal','uniform','Uniform']
+
 
 class NoiseStim(GratingStim):
     """A stimulus with 2 textures: a radom noise sample and a mask
@@ -96,6 +106,7 @@ class NoiseStim(GratingStim):
     A rebuild can also be forced at any time using the buildNoise() function.
     The updateNoise() function can be used at any time to produce a new random saple of noise without doing a full build. ie it is quicker than a full build.
     Both buildNoise and updateNoise can be slow for large samples. 
+    To update dynamic noise on every frame, makeNoiseBank() makes a set of samples at once that updateNoise() then cycles through (in order or at random) without making new ones.
     Samples of Binary, Normal or Uniform noise can usually be made at frame rate using noiseUpdate. 
     Updating or building other noise types at frame rate may result in dropped frames. 
     An alternative is to build a large sample of noise at the start of the routien and place it off the screen then cut a samples out of this at random locations and feed that as a numpy array into the texture of a visible gratingStim.
@@ -229,6 +240,9 @@ class NoiseStim(GratingStim):
         #self._calcEnvCyclesPerStim()
         self._sideLength=1.0   
         self._size=512         # in unlikely case where it does not get set anywehre else before use.
+        self._noiseBank = None  # see makeNoiseBank()
+        self._noiseBankOrder = 'sequential'
+        self._noiseBankIndex = -1
         self.buildNoise()
         self._needBuild = False
         #self._needNoiseUpdate = False
@@ -447,9 +461,22 @@ class NoiseStim(GratingStim):
     def updateNoise(self):
         """Updates the noise sample. Does not change any of the noise parameters 
             but choses a new random sample given the previously set parameters.
+            If a noise bank has been made (see makeNoiseBank) the next sample
+            is taken from it instead.
         """
 
-        if not(self.noiseType in ['binary','Binary','normal','Normal','uniform','Uniform']):
+        if self._noiseBank is not None:
+            nFrames = len(self._noiseBank)
+            if self._noiseBankOrder == 'random' and nFrames > 1:
+                # any frame but the one shown last
+                i = numpy.random.randint(nFrames - 1)
+                if i >= self._noiseBankIndex:
+                    i += 1
+            else:
+                i = (self._noiseBankIndex + 1) % nFrames
+            self._noiseBankIndex = i
+            self.tex = self._noiseBank[i]
+        elif not(self.noiseType in ['binary','Binary','normal','Normal','uniform','Uniform']):
             Ph = numpy.random.uniform(0,2*numpy.pi,int(self._size**2))
             Ph = numpy.reshape(Ph,(int(self._size),int(self._size)))
             In = self.noiseTex*exp(1j*Ph)
@@ -501,15 +528,107 @@ class NoiseStim(GratingStim):
             totalSamples = self._sideLength[0]*self._sideLength[1]
             if self.noiseType in ['binary','Binary']:
                 self.noiseTex=numpy.append(numpy.ones(int(numpy.round(totalSamples/2.0))),-1*numpy.ones(int(numpy.round(totalSamples/2.0))))
-        elif self.noiseType in ['White','white']:
-            self.noiseTex = numpy.ones((int(mysize),int(mysize)))
-            self.noiseTex[0][0] = 0
+        elif self.noiseType in _spectralNoiseTypes:
+            # the amplitude spectrum only depends on these parameters, so is
+            # shared by all stimuli (and builds) with the same ones
+            key = (self.noiseType.lower(), float(mysize), float(mysf),
+                   float(lowsf), float(upsf), self.noiseBW, self.noiseBWO,
+                   self.noiseFractalPower, self.noiseFilterOrder)
+            if self.noiseType in ['Image','image']:
+                noiseImage = self.noiseImage
+                if noiseImage not in ['None','none']:
+                    noiseImage = (noiseImage, os.path.getmtime(noiseImage))
+                key = ('image', float(mysize), noiseImage)
+            self.noiseTex = noiseFilters.get(key)
+            if self.noiseTex is None:
+                self.noiseTex = noiseFilters.add(key, self._makeNoiseFilter(
+                    self.noiseType, mysize, mysf, lowsf, upsf))
+        else:
+            raise ValueError('Noise type not recognised.')
+        self._needBuild = False # prevent noise from being re-built at next draw() unless a parameter is chnaged in the mean time.
+        if self._noiseBank is not None:
+            # remake the bank for the new parameters
+            self._noiseBank = self._makeNoiseFrames(len(self._noiseBank))
+            self._noiseBankIndex = -1
+        self.updateNoise()  # now choose the initial random sample.
+
+    def makeNoiseBank(self, nFrames, order='sequential'):
+        """Makes nFrames noise samples at once (with the current noise
+            parameters), which updateNoise() then takes in turn
+            (order='sequential', looping back to the first) or at random
+            (order='random', never the same sample twice in a row), so
+            dynamic noise can be updated on every frame without making a new
+            sample each time.
+
+            The samples of spectral noise types are made in batches from
+            the half spectrum of real images (rfft), and all are stored as
+            float32 (nFrames x side x side x 4 bytes in total).
+
+            The bank is remade, with the same number of samples, whenever
+            the noise is rebuilt (e.g. after a noise parameter changes).
+            Use clearNoiseBank() to go back to making a new sample each time.
+        """
+        if order not in ('sequential', 'random'):
+            raise ValueError("order should be 'sequential' or 'random'")
+        self._noiseBankOrder = order
+        if self._needBuild:
+            self._noiseBank = None
+            self.buildNoise()
+        self._noiseBank = self._makeNoiseFrames(int(nFrames))
+        self._noiseBankIndex = -1
+        self.updateNoise()
+
+    def clearNoiseBank(self):
+        """Removes the noise bank made by makeNoiseBank()"""
+        self._noiseBank = None
+
+    def _makeNoiseFrames(self, nFrames):
+        """Returns nFrames noise samples (as updateNoise makes) as a float32
+            array.
+        """
+        if self.noiseType in _pixelNoiseTypes:
+            rows, cols = int(self._sideLength[1]), int(self._sideLength[0])
+            frames = numpy.empty((nFrames, rows, cols), numpy.float32)
+            if self.noiseType in ['normal','Normal']:
+                frames[:] = numpy.random.randn(nFrames, rows, cols)/self.noiseClip
+            elif self.noiseType in ['uniform','Uniform']:
+                frames[:] = 2.0*numpy.random.rand(nFrames, rows, cols)-1.0
+            else:
+                # a random permutation of the binary values for each frame
+                order = numpy.random.rand(nFrames, self.noiseTex.size).argsort(axis=1)
+                frames[:] = self.noiseTex[order].reshape(nFrames, rows, cols)
+            return frames
+
+        rows, cols = self.noiseTex.shape
+        # the spectrum of a real image is symmetric, so only half is needed
+        halfTex = self.noiseTex[:, :cols//2 + 1]
+        frames = numpy.empty((nFrames, rows, cols), numpy.float32)
+        # transform batches of frames at once, of ~32MB of complex spectra
+        batchSize = max(1, 2**25 // (halfTex.size*16))
+        for start in range(0, nFrames, batchSize):
+            n = min(batchSize, nFrames - start)
+            Ph = numpy.random.uniform(0, 2*numpy.pi, (n,) + halfTex.shape)
+            Im = irfft2(halfTex*exp(1j*Ph), s=(rows, cols))
+            Im = ifftshift(Im, axes=(1, 2))
+            factor = Im.std(axis=(1, 2))*self.noiseClip
+            factor = factor[:, numpy.newaxis, numpy.newaxis]
+            numpy.clip(Im, -factor, factor, Im)
+            frames[start:start + n] = Im/factor
+        return frames
+
+    def _makeNoiseFilter(self, noiseType, mysize, mysf, lowsf, upsf):
+        """Returns the amplitude spectrum (unshifted, with zero DC) of the
+        spectral noise types.
+        """
+        if noiseType in ['White','white']:
+            noiseTex = numpy.ones((int(mysize),int(mysize)))
+            noiseTex[0][0] = 0
         #elif self.noiseType in ['Coloured','coloured']:
         #    pin=filters.makeRadialMatrix(matrixSize=mysize, center=(0,0), radius=1.0)
         #    self.noiseTex=numpy.multiply(numpy.ones((int(mysize),int(mysize))),(pin)**self.noiseFractalPower) 
         #    self.noiseTex=fftshift(self.noiseTex)
         #    self.noiseTex[0][0]=0
-        elif self.noiseType in ['Isotropic','isotropic']:
+        elif noiseType in ['Isotropic','isotropic']:
             if mysf > mysize/2:
                 msg = ('Base frequency for isotropic '
                       'noise is definitely too high.')
@@ -520,13 +639,13 @@ class NoiseStim(GratingStim):
             highf = linbw*lowf
             FWF = highf-lowf
             sigmaF = FWF/(2*numpy.sqrt(2*numpy.log(2)))
-            self.noiseTex = numpy.zeros(int(mysize**2))
-            self.noiseTex = numpy.reshape(self.noiseTex,(int(mysize),int(mysize)))
+            noiseTex = numpy.zeros(int(mysize**2))
+            noiseTex = numpy.reshape(noiseTex,(int(mysize),int(mysize)))
             pin = filters.makeRadialMatrix(matrixSize=mysize, center=(0,0), radius=2)
-            self.noiseTex = filters.makeGauss(pin, mean=localf, sd=sigmaF)
-            self.noiseTex = fftshift(self.noiseTex)
-            self.noiseTex[0][0] = 0
-        elif self.noiseType in ['Gabor','gabor']:
+            noiseTex = filters.makeGauss(pin, mean=localf, sd=sigmaF)
+            noiseTex = fftshift(noiseTex)
+            noiseTex[0][0] = 0
+        elif noiseType in ['Gabor','gabor']:
             if mysf > mysize/2:
                 msg = ('Base frequency for Gabor '
                       'noise is definitely too high.')
@@ -539,29 +658,29 @@ class NoiseStim(GratingStim):
             sigmaF = FWF/(2*numpy.sqrt(2*numpy.log(2)))
             FWO = 2.0*localf*numpy.tan(numpy.pi*self.noiseBWO/360.0)
             sigmaO = FWO/(2*numpy.sqrt(2*numpy.log(2)))
-            self.noiseTex=numpy.zeros(int(mysize**2))
-            self.noiseTex=numpy.reshape(self.noiseTex,(int(mysize),int(mysize)))
+            noiseTex=numpy.zeros(int(mysize**2))
+            noiseTex=numpy.reshape(noiseTex,(int(mysize),int(mysize)))
             yy, xx = numpy.mgrid[0:mysize, 0:mysize]
             xx = (0.5 - 1.0 / mysize * xx) 
             yy = (0.5 - 1.0 / mysize * yy) 
-            self.noiseTex=filters.make2DGauss(xx,yy,mean=(localf,0), sd=(sigmaF,sigmaO))
-            self.noiseTex=self.noiseTex+filters.make2DGauss(xx,yy, mean=(-localf,0), sd=(sigmaF,sigmaO))
-            self.noiseTex=fftshift(self.noiseTex)
-            self.noiseTex[0][0]=0
-        elif self.noiseType in ['Image','image']:
+            noiseTex=filters.make2DGauss(xx,yy,mean=(localf,0), sd=(sigmaF,sigmaO))
+            noiseTex=noiseTex+filters.make2DGauss(xx,yy, mean=(-localf,0), sd=(sigmaF,sigmaO))
+            noiseTex=fftshift(noiseTex)
+            noiseTex[0][0]=0
+        elif noiseType in ['Image','image']:
             if not(self.noiseImage in ['None','none']):  
                 im = Image.open(self.noiseImage)
                 im = im.transpose(Image.FLIP_TOP_BOTTOM)
                 im = im.convert("L")  # FORCE TO LUMINANCE
                 intensity = numpy.array(im).astype(
                         numpy.float32) * 0.0078431372549019607 - 1.0
-                self.noiseTex =  numpy.absolute(fft2(intensity))
+                noiseTex =  numpy.absolute(fft2(intensity))
             else:
-                self.noiseTex = numpy.ones((int(mysize),int(mysize)))  # if image is 'None' will make white noise as tempary measure
-            self.noiseTex[0][0]=0
-        elif self.noiseType in ['filtered','Filtered']:
+                noiseTex = numpy.ones((int(mysize),int(mysize)))  # if image is 'None' will make white noise as tempary measure
+            noiseTex[0][0]=0
+        elif noiseType in ['filtered','Filtered']:
             pin=filters.makeRadialMatrix(matrixSize=mysize, center=(0,0), radius=1.0)
-            self.noiseTex = numpy.multiply(numpy.ones((int(mysize),int(mysize))),(pin)**self.noiseFractalPower)
+            noiseTex = numpy.multiply(numpy.ones((int(mysize),int(mysize))),(pin)**self.noiseFractalPower)
             if lowsf > mysize/2:
                 msg = ('Lower cut off frequency for filtered '
                       'noise is definitely too high.')
@@ -573,13 +692,10 @@ class NoiseStim(GratingStim):
                     filter = numpy.ones((int(mysize),int(mysize)))
                 if lowsf>0:
                     filter = filter-filters.butter2d_lp_elliptic(size=[mysize,mysize], cutoff_x=lowsf/mysize, cutoff_y=lowsf/mysize, n=self.noiseFilterOrder, alpha=0, offset_x=2/(mysize-1),offset_y=2/(mysize-1))
-                self.noiseTex = self.noiseTex*filter
-            self.noiseTex = fftshift(self.noiseTex)
-            self.noiseTex[0][0] = 0
-        else:
-            raise ValueError('Noise type not recognised.')
-        self._needBuild = False # prevent noise from being re-built at next draw() unless a parameter is chnaged in the mean time.
-        self.updateNoise()  # now choose the initial random sample.
+                noiseTex = noiseTex*filter
+            noiseTex = fftshift(noiseTex)
+            noiseTex[0][0] = 0
+        return noiseTex
         
  
 
@@ -71,6 +71,8 @@ import psychopy  # so we can get the __path__
 from psychopy import core, platform_specific, logging, prefs, monitors
 import psychopy.event
 from . import backends
+from . import frameprofiler
+from .frameintervals import FrameIntervalRecorder
 
 # tools must only be imported *after* event or MovieStim breaks on win32
 # (JWP has no idea why!)
@@ -436,10 +438,11 @@ class Window(object):
         # Be able to omit the long timegap that follows each time turn it off
         self.recordFrameIntervalsJustTurnedOn = False
         self.nDroppedFrames = 0
-        self.frameIntervals = []
+        self._frameIntervals = FrameIntervalRecorder()
 
         self._toDraw = []
         self._toDrawDepths = []
+        self.frameProfiler = None
         self._eventDispatchers = []
 
         self.lastFrameT = core.getTime()
@@ -579,6 +582,35 @@ class Window(object):
         self.__dict__['recordFrameIntervals'] = value
         self.frameClock.reset()
 
+    @property
+    def frameIntervals(self):
+        """The frame intervals (sec) recorded while `recordFrameIntervals`
+        is True, as a
+        :class:`~psychopy.visual.frameintervals.FrameIntervalRecorder`.
+
+        This behaves as a list of the intervals for append(), extend(),
+        `+=`, `+` (giving a list), pop(), `del`, len(), indexing, iteration
+        and comparison. It is not a list, though: `isinstance()` checks for
+        a list fail, and other list methods such as insert(), sort() and
+        item assignment are missing (use `.tolist()` for a list copy).
+
+        It also keeps running statistics (`.mean`, `.sd`, `.percentile()`),
+        and can divide the intervals into segments with `.addMarker()`,
+        e.g. one for each routine. Setting it to a list (e.g.
+        `win.frameIntervals = []`) replaces the recorded intervals, and
+        setting it to a new FrameIntervalRecorder (e.g. one with a
+        `spillFile`) replaces the recorder.
+        """
+        return self._frameIntervals
+
+    @frameIntervals.setter
+    def frameIntervals(self, value):
+        if isinstance(value, FrameIntervalRecorder):
+            self._frameIntervals = value
+        else:
+            self._frameIntervals.clear()
+            self._frameIntervals.extend(value)
+
     def setRecordFrameIntervals(self, value=True, log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
         but use this method if you need to suppress the log message.
@@ -587,7 +619,9 @@ class Window(object):
 
     def saveFrameIntervals(self, fileName=None, clear=True):
         """Save recorded screen frame intervals to disk, as comma-separated
-        values.
+        values, or in binary form (with any markers) if the fileName ends
+        in '.npz'. Binary files can be read with
+        `FrameIntervalRecorder.load(fileName)`.
 
         :Parameters:
 
@@ -599,14 +633,38 @@ class Window(object):
         if not fileName:
             fileName = 'lastFrameIntervals.log'
         if len(self.frameIntervals):
-            intervalStr = str(self.frameIntervals)[1:-1]
-            f = open(fileName, 'w')
-            f.write(intervalStr)
-            f.close()
+            if fileName.endswith('.npz'):
+                self.frameIntervals.save(fileName)
+            else:
+                intervalStr = str(self.frameIntervals)[1:-1]
+                f = open(fileName, 'w')
+                f.write(intervalStr)
+                f.close()
         if clear:
-            self.frameIntervals = []
+            self.frameIntervals.clear()
             self.frameClock.reset()
 
+    def startFrameProfiler(self, nFrames=3600, maxStimuli=64):
+        """Start timing the phases of each flip(), and the drawing of each
+        autoDraw stimulus, for the last `nFrames` frames.
+
+        Returns the :class:`~psychopy.visual.frameprofiler.FrameProfiler`,
+        which can summarise the frames or save them as a Chrome trace.
+
+        see also:
+            Window.stopFrameProfiler()
+        """
+        self.frameProfiler = frameprofiler.FrameProfiler(nFrames, maxStimuli)
+        return self.frameProfiler
+
+    def stopFrameProfiler(self):
+        """Stop timing flip() phases; returns the FrameProfiler, still
+        holding the frames it recorded.
+        """
+        profiler = self.frameProfiler
+        self.frameProfiler = None
+        return profiler
+
     def _setCurrent(self):
         """Make this window current. If useFBO=True, the framebuffer is bound
         after the context switch.
@@ -680,8 +738,15 @@ class Window(object):
         win.flip(clearBuffer=False)  # the screen is not cleared (so represent
                                      # the previous screen)
         """
-        for thisStim in self._toDraw:
-            thisStim.draw()
+        profiler = self.frameProfiler
+        if profiler is None:
+            for thisStim in self._toDraw:
+                thisStim.draw()
+        else:
+            profiler.beginFrame()
+            for thisStim in self._toDraw:
+                profiler.drawStim(thisStim)
+            profiler.endPhase(frameprofiler.DRAW)
 
         flipThisFrame = self._startOfFlip()
         if self.useFBO:
@@ -713,8 +778,12 @@ class Window(object):
 
         # call this before flip() whether FBO was used or not
         self._afterFBOrender()
+        if profiler is not None:
+            profiler.endPhase(frameprofiler.FBO)
 
         self.backend.swapBuffers(flipThisFrame)
+        if profiler is not None:
+            profiler.endPhase(frameprofiler.SWAP)
 
         if self.useFBO:
             if flipThisFrame:
@@ -759,6 +828,8 @@ class Window(object):
 
         # reset returned buffer for next frame
         self._endOfFlip(clearBuffer)
+        if profiler is not None:
+            profiler.endPhase(frameprofiler.CLEAR)
 
         # waitBlanking
         if self.waitBlanking and flipThisFrame:
@@ -771,6 +842,8 @@ class Window(object):
                 GL.glVertex2i(10, 10)
             GL.glEnd()
             GL.glFinish()
+        if profiler is not None:
+            profiler.endPhase(frameprofiler.WAIT_BLANKING)
 
         # get timestamp
         now = logging.defaultClock.getTime()
@@ -779,6 +852,8 @@ class Window(object):
         for callEntry in self._toCall:
             callEntry['function'](*callEntry['args'], **callEntry['kwargs'])
         del self._toCall[:]
+        if profiler is not None:
+            profiler.endPhase(frameprofiler.CALL_ON_FLIP)
 
         # do bookkeeping
         if self.recordFrameIntervals:
@@ -811,6 +886,9 @@ class Window(object):
 
         # keep the system awake (prevent screen-saver or sleep)
         platform_specific.sendStayAwake()
+        if profiler is not None:
+            profiler.endPhase(frameprofiler.LOGGING)
+            profiler.endFrame()
 
         #    If self.waitBlanking is True, then return the time that
         # GL.glFinish() returned, set as the 'now' variable. Otherwise
@@ -1604,7 +1682,7 @@ class Window(object):
                     msg = 'Screen%s actual frame rate measured at %.2f'
                     logging.debug(msg % (scrStr, rate))
                 self.recordFrameIntervals = recordFrmIntsOrig
-                self.frameIntervals = []
+                self.frameIntervals.clear()
                 return rate
         # if we got here we reached end of maxFrames with no consistent value
         msg = ("Couldn't measure a consistent frame rate.\n"